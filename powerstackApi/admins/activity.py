@@ -0,0 +1,59 @@
+import logging
+
+from utils.sketch_utils import *
+
+
+#Configure Logs
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Daily active-user sketches, fed from the users table stream.
+
+    user_check (users/functions.py) stamps lastLogin / lastLoginEpochMs on every login and
+    returns; the users table stream (NEW_AND_OLD_IMAGES) feeds `lambda_handler` below,
+    which adds each login to that day's HyperLogLog sketches (utils/sketch_utils.py).
+    The sketch writes are off the login path, so a slow or throttled activity table
+    never shows up in dashboard latency.
+
+    A register write only ever raises a register, so a redelivered batch or a retried
+    record changes nothing and no applied-marker is needed (compare rollups.py).
+"""
+
+
+def login_of(record):
+    """
+    The login a users-table stream record carries, if any.
+
+    Args:
+        record (dict): DynamoDB stream record (low-level attribute values).
+
+    Returns:
+        tuple: (userID, userType, lastLoginEpochMs), or None when the record doesn't
+               move lastLoginEpochMs (profile edits, wallet credits, deletes).
+    """
+    if record.get('eventName') not in ('INSERT', 'MODIFY'):
+        return None
+    images = record.get('dynamodb', {})
+    new_image = deserialize_item(images.get('NewImage', {}))
+    old_image = deserialize_item(images.get('OldImage', {}))
+
+    epoch_ms = to_epoch_ms(new_image.get('lastLoginEpochMs'))
+    if epoch_ms is None or epoch_ms == to_epoch_ms(old_image.get('lastLoginEpochMs')):
+        return None
+    return new_image.get('userID'), new_image.get('userType'), epoch_ms
+
+
+def lambda_handler(event, context):
+    """
+    Users stream consumer. record_active_user never raises, so one bad record can't hold
+    back the rest of the batch.
+    """
+    logins = 0
+    for record in event.get('Records', []):
+        login = login_of(record)
+        if login and login[0]:
+            record_active_user(*login)
+            logins += 1
+    logger.info(f"Recorded {logins} logins from {len(event.get('Records', []))} stream records")
+    return {'batchItemFailures': []}
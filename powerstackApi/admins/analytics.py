@@ -1,43 +1,140 @@
 from functions import *
+from rollups import sales_rollup_by_day, sales_totals, SALES_TOTALS_REPORT, ROLLUPS_TABLE
+from utils.report_cache import *
+from utils.sketch_utils import *
 
 
 # ---------- SECTION 1: ANALYTICS ----------
 
-def transactions_by_date_range(id_token, data):
+def transactions_by_date_range(decoded_token, data):
     # Number of transactions by type ( Wallet funds, Regular purchases) (Simple, Wallet, Merchant) ALlow disco to only see (Merchant and Simple payment types)
     # List out transactions
     # Naira amt, unit amt sold, commission paid out
-    decoded_token = decode_token(id_token)
+    """
+    Totals come from the pre-aggregated rollup table (see rollups.py), so the cost no longer
+    grows with the number of purchases in the range.
+    With `group_by` (txnType, paymentMethod, location, ...) the totals are computed per
+    group in one pass over the window (`type` becomes optional). With `include_purchases`
+    the purchase list and its totals come from the same single pass.
+    Totals and groups are cached per UTC day, closed days for good and open ones briefly
+    (see utils/report_cache.py); only the purchase list is always read live.
+    """
     user_type = decoded_token.get('custom:userType')
 
     start_date = data.get('start_date')
     end_date = data.get('end_date')
     type = data.get('type')
-    transaction_list = {}
+    group_by = data.get('group_by')
+    mode = data.get('mode', 'totals')
     try:
         if user_type == "OWNER":
-            data = analytics(PURCHASE_TABLE, 'txnType', type, 'purchaseDate', start_date, end_date)
-            transaction_list['purchases'] = data.get('Items', [])
-            transaction_list['purchase_count'] = len(transaction_list['purchases'])
-            transaction_list['naira_amount'] = sum(float(item["amount"]) for item in data['Items']) if data['Items'] else 0
-            
-            units_sold = sum_attribute_by_date_range(PURCHASE_TABLE,'txnType', type, 'purchaseDate', 'units', start_date, end_date)
-            if type == 'Merchant':
-                
-                commission_paid_out = sum_attribute_by_date_range(PURCHASE_TABLE,'txnType', type, 'purchaseDate', 'commission', start_date, end_date)
-                transaction_list['units_sold'] = units_sold
-                transaction_list['commission_paid_out'] = commission_paid_out
+            if mode == 'timeseries':
+                return transactions_timeseries(data)
+            if mode == 'percentiles':
+                return transaction_size_percentiles(data)
+            if mode != 'totals':
+                raise InvalidAnalyticsQueryException("mode must be one of totals, timeseries, percentiles")
+            _report_window(data)
+
+            if group_by:
+                groups = cached_by_day(
+                    'purchaseGroups', {'type': type, 'group_by': group_by}, start_date, end_date,
+                    lambda spans: aggregate_by_day(
+                        PURCHASE_TABLE, 'purchaseDate', spans, group_by=group_by,
+                        attribute_name='txnType' if type else None, attribute_value=type
+                    )
+                )
+                return {'group_by': group_by, 'groups': groups or {}}
+
+            if data.get('include_purchases'):
+                purchases = analytics(PURCHASE_TABLE, 'txnType', type, 'purchaseDate', start_date, end_date).get('Items', [])
+                transaction_list = aggregate_items(purchases).get(UNGROUPED) or dict.fromkeys([COUNT_FIELD, *PURCHASE_METRICS.values()], 0)
+                transaction_list['purchases'] = purchases
             else:
-                transaction_list['units_sold'] = sum_attribute_by_date_range(PURCHASE_TABLE,'txnType', type, 'purchaseDate', 'units', start_date, end_date)
+                transaction_list = cached_by_day(
+                    SALES_TOTALS_REPORT, {'type': type}, start_date, end_date,
+                    lambda spans: sales_rollup_by_day(type, spans)
+                ) or sales_totals()
 
+            if type != 'Merchant':
+                transaction_list.pop('commission_paid_out')
             return transaction_list
         else:
             raise UnauthorizedUser
     except Exception as e:
        error_format(e)
     
-def active_users_by_date_range(id_token, data):
-    decoded_token = decode_token(id_token)
+def _report_window(data):
+    try:
+        return epoch_ms_range(data.get('start_date'), data.get('end_date'))
+    except TypeError:
+        raise InvalidAnalyticsQueryException("start_date and end_date must be given as 'YYYY-MM-DD HH:MM'")
+
+
+def transactions_timeseries(data):
+    """
+    Bucketed purchase count, naira amount, units and commission for charts.
+
+    Args:
+        data (JSON): start_date, end_date, type (optional), granularity (hour | day | week),
+                     moving_average (optional window, in buckets), by_type (optional)
+
+    Returns:
+        JSON: buckets (ISO UTC bucket starts) and one series per metric
+    """
+    # NumPy is only loaded for the chart modes, not on every admin cold start
+    from utils import timeseries
+
+    start_ms, end_ms = _report_window(data)
+    granularity = data.get('granularity', 'day')
+    by_type = bool(data.get('by_type'))
+    window = int(data.get('moving_average') or 0)
+    txn_type = data.get('type')
+
+    def compute(start_date, end_date):
+        columns = timeseries.load_purchase_columns(PURCHASE_TABLE, start_date, end_date, txn_type=txn_type)
+        series = timeseries.histogram(columns, start_ms, end_ms, granularity=granularity, by_type=by_type)
+        if window > 1 and not by_type:
+            series['naira_amount_moving_average'] = timeseries.moving_average(series['naira_amount'], window)
+        result = timeseries.to_json_series(series)
+        result['granularity'] = granularity
+        return result
+
+    params = {'type': txn_type, 'granularity': granularity, 'by_type': by_type, 'moving_average': window}
+    return cached_report('purchaseTimeseries', params, data.get('start_date'), data.get('end_date'), compute)
+
+
+def transaction_size_percentiles(data):
+    """
+    Percentile purchase amounts over a window.
+
+    Args:
+        data (JSON): start_date, end_date, type (optional), percentiles (optional list, default 50/90/95/99)
+
+    Returns:
+        JSON: {'purchase_count', 'percentiles': {'p50': ..., ...}}
+    """
+    from utils import timeseries
+
+    qs = data.get('percentiles') or timeseries.DEFAULT_PERCENTILES
+    try:
+        qs = [float(q) for q in qs]
+    except (TypeError, ValueError):
+        raise InvalidAnalyticsQueryException("percentiles must be a list of numbers between 0 and 100")
+    if not all(0 <= q <= 100 for q in qs):
+        raise InvalidAnalyticsQueryException("percentiles must be a list of numbers between 0 and 100")
+
+    _report_window(data)
+    txn_type = data.get('type')
+
+    def compute(start_date, end_date):
+        columns = timeseries.load_purchase_columns(PURCHASE_TABLE, start_date, end_date, txn_type=txn_type)
+        return {'purchase_count': len(columns['amount']), 'percentiles': timeseries.percentiles(columns['amount'], qs)}
+
+    return cached_report('purchasePercentiles', {'type': txn_type, 'percentiles': qs}, data.get('start_date'), data.get('end_date'), compute)
+
+
+def active_users_by_date_range(decoded_token, data):
     user_type = decoded_token.get('custom:userType')
 
     start_date = data.get('start_date')
@@ -45,14 +142,22 @@ def active_users_by_date_range(id_token, data):
     type = data.get('user_type')
     try:
         if user_type == "OWNER":
-            data = analytics(USERS_TABLE, 'userType', type, 'lastLogin', start_date, end_date)
-            user_count = len(data.get('Items', []))
+            _report_window(data)
+            if not data.get('include_users'):
+                # approximate distinct users from the per-day login sketches, no table scan
+                return active_user_counts(start_date, end_date, user_type=type)
 
-            return {'users': data.get('Items', []), 'user_count': user_count}
+            # lastLogin moves with every login, so the list is always read live over the
+            # whole window: a per-day cache would list the same user on each login day
+            users = analytics(USERS_TABLE, 'userType', type, 'lastLogin', start_date, end_date).get('Items', [])
+            return {'users': users, 'user_count': len(users)}
         else:
             raise UnauthorizedUser
     except Exception as e:
         error_format(e)
 
 
-    
\ No newline at end of file
+# ---------- PREWARM ----------
+def prewarm_analytics(open_connections=False):
+    """ Tables behind the analytics reports (rollups, report cache, activity sketches). """
+    prewarm_dynamodb([ROLLUPS_TABLE, REPORT_CACHE_TABLE, ACTIVITY_TABLE])
@@ -1,212 +1,74 @@
-import json
 import logging
-from decimal import Decimal
 
-from functions import * 
-from analytics import *
-from transfers import *
-from utils.general_utils import *
-from utils.exception_handler import *
+from utils.router_utils import *
 
 
 # ---------- LOGS ----------
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return json.JSONEncoder.default(self, obj)
-    
-# ---------- ADMIN LAMBDA FUNCTION ----------
-def lambda_handler(event, context):
-    logger.info(f"event {event}")
-    response_body = {"error": "Invalid request"}
-    status_code = 400
-
-    if "httpMethod" in event:
-        try:
-            http_method = event["httpMethod"]
-            path = event["path"]
-
-            # ---------- SECTION 1: AUTH HEADER ----------
-            if 'headers' in event and 'Authorization' in event['headers']:
-                id_token = event['headers']['Authorization'].split()[1]
-
-                decoded_token = decode_token(id_token)
-                if decoded_token == "Expired":
-                    return {
-                        "statusCode": 403,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'ExpiredToken',
-                            'message':'Session expired, log in again'
-                            })
-                    }
-            
-            # ---------- SECTION 2: OPTIONS REQUESTS ----------
-            if http_method == "OPTIONS":
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    'body': json.dumps('Options, PASS.')
-                }
-            # ---------- SECTION 3: GET REQUESTS ----------
-            if http_method == "GET":
-                if path == "/admin/hello":
-                    message = "Hello World!"
-
-                elif path == "/admin/greet":
-                    message = "Hi There"
-                     
-                elif path == "/admin/users" and "queryStringParameters" in event:
-                    """ 
-                    Gets list of users by type
-                    Param: 'type' [REGULAR, MERCHANT]
-                    Add functionality for owners to get admin list as well
-                    """
-                    query_params = event['queryStringParameters']
-                    message = get_users_by_type(id_token, query_params=query_params)
-                     
-                elif path == "/admin/user" and "queryStringParameters" in event:
-                    """
-                    Gets a specific user by email
-                    Param: 'user_email'
-                    """
-                    query_params = event['queryStringParameters']
-                    message = get_specific_user(id_token, query_params=query_params)
-
-                elif path == "/admin/purchase" and "queryStringParameters" in event:
-                    """
-                    Gets specific purchase by reference
-                    Param: 'reference'
-                    """
-                    query_params = event['queryStringParameters']
-                    message = get_purchase_by_reference(id_token, query_params=query_params)
-
-                elif path == "/admin/tickets":
-                    message = ticket_list(id_token)  
-                
-                elif path == "/admin/ticketsFiltered":
-                    query_params = event['queryStringParameters']
-                    message = get_tickets_by_status(id_token, query_params=query_params)
-                
-                elif "/admin/ticket":
-                    query_params = event['queryStringParameters']
-                    message = get_specific_ticket(id_token, query_params=query_params)
-                
-                else:
-                # If the path is not recognized, return an error response
-                    return {
-                        "statusCode": 404,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'InvalidPath',
-                            'message': f'Invalid path: {path}'
-                        })
-                    }
-                
-                logging.info(message)
-                status_code = 200
-                response_body = {'message': message}
+# ---------- ROUTES ----------
+# (httpMethod, path) -> handler; route modules are imported on first use (utils/router_utils.py)
+ROUTES = {
+    # ---------- GET ----------
+    ('GET', '/admin/hello'): static_route("Hello World!"),
+    ('GET', '/admin/greet'): static_route("Hi There"),
+    # Gets a page of users by type
+    # Param: 'type' [REGULAR, MERCHANT], 'limit', 'nextToken'
+    # Add functionality for owners to get admin list as well
+    ('GET', '/admin/users'): route('functions', 'get_users_by_type', auth=True, query='required'),
+    # Gets a specific user by email
+    # Param: 'user_email'
+    ('GET', '/admin/user'): route('functions', 'get_specific_user', auth=True, query='required'),
+    # Gets specific purchase(s) by reference
+    # Param: 'reference' (comma separated for several)
+    ('GET', '/admin/purchase'): route('functions', 'get_purchase_by_reference', auth=True, query='required'),
+    # Paginated list of all tickets
+    # Param: 'limit', 'nextToken'
+    ('GET', '/admin/tickets'): route('functions', 'ticket_list', auth=True, query='optional'),
+    # Gets a page of tickets by status
+    # Param: 'status', 'limit', 'nextToken'
+    ('GET', '/admin/ticketsFiltered'): route('functions', 'get_tickets_by_status', auth=True, query='required'),
+    # Gets a specific ticket
+    # Param: 'ticket'
+    ('GET', '/admin/ticket'): route('functions', 'get_specific_ticket', auth=True, query='required'),
+
+    # ---------- POST ----------
+    # For updating user status Active / Inactive
+    # Body : {'email', 'status'}
+    ('POST', '/admin/status'): route('functions', 'update_user_status', auth=True, body=True),
+    # Purchase totals by date and txnType (from the rollup table)
+    # Body: {'start_date', 'end_date', 'type', 'group_by' (optional), 'include_purchases' (optional)}
+    # Charts: 'mode': 'timeseries' + {'granularity', 'moving_average', 'by_type'}
+    #         'mode': 'percentiles' + {'percentiles'}
+    ('POST', '/admin/analytics'): route('analytics', 'transactions_by_date_range', auth=True, body=True),
+    # Distinct active users by date range (approximate, with daily counts)
+    # Body: {'start_date', 'end_date', 'user_type', 'include_users' (optional, full list)}
+    ('POST', '/admin/activeUsers'): route('analytics', 'active_users_by_date_range', auth=True, body=True),
+    # Updating ticket status
+    # Body: {'ticket', 'status'}
+    ('POST', '/admin/ticketStatus'): route('functions', 'update_ticket_status', auth=True, body=True),
+    # Body: {'ticket', 'comments'}
+    ('POST', '/admin/addComments'): route('functions', 'add_comments_to_ticket', auth=True, body=True),
+}
+
+
+# ---------- PREWARM ----------
+# (module, function) run during init when PREWARM_ON_INIT is set, and on {"warmup": true} pings
+WARMERS = [
+    ('functions', 'prewarm_clients'),
+    ('analytics', 'prewarm_analytics'),
+    ('utils.token_utils', 'prewarm_jwks'),
+]
+
+if PREWARM_ON_INIT:
+    prewarm(ROUTES, WARMERS)
 
-            if http_method == "POST":
-                data = json.loads(event['body'])
 
-                if path == "/admin/status":
-                    """
-                    For updating user status Active / Inactive
-                    Body : {'email', 'status'}
-                    """
-                    message = update_user_status(id_token, data=data)
-
-                elif path == "/admin/analytics":
-                    """
-                    List of all purchases by date and txnType
-                    Body: {'start_date', 'end_date', 'txnType'}
-                    """
-                    message = transactions_by_date_range(id_token, data=data)
-
-                elif path == "/admin/activeUsers":
-                    """
-                    List of active users by date range
-                    Body: {'start_date', 'end_date', 'user_type'}
-                    """
-                    message = active_users_by_date_range(id_token, data=data)
-                
-                elif path == "/admin/ticketStatus":
-                    """
-                    Updating ticket status
-                    Body: {'ticket', 'status'}
-                    """
-
-                    message = update_ticket_status(id_token, data=data)
-
-                elif path == "/admin/addComments":
-                    message = add_comments_to_ticket(id_token, data=data)
-                
-                
-
-                else:
-                # If the path is not recognized, return an error response
-                    return {
-                        "statusCode": 404,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'InvalidPath',
-                            'message': f'Invalid path: {path}'
-                        })
-                    }
-                
-                logging.info(message)
-                status_code = 200
-                response_body = {'message': message}
-
-        except CustomException as e:
-        # Handle your custom exception and return the custom error response
-            logger.error(f"Custom Exception {e}")
-            status_code=400
-            response_body = {"code": e.code, "message": e.message}
-        
-        except Exception as e:
-            logger.error(f"Unhandled Exception {e}")
-            status_code = 400
-            response_body = {"error": str(e)}
-    else:
-        logger.error("httpMethod not present in request.")
-        status_code = 400
-        response_body = {"error": "httpMethod not present in request."}
-    
-    response = {
-        "statusCode": status_code,
-        "headers": {
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-            "Content-type": 'application/json'
-        },
-        "body": json.dumps(response_body, cls=DecimalEncoder)
-    }
+# ---------- ADMIN LAMBDA FUNCTION ----------
+def lambda_handler(event, context):
+    if is_warm_ping(event):
+        return warm_ping_response(ROUTES, WARMERS, event)
 
-    return response
-    
+    logger.info(f"event {event}")
+    return handle_request(ROUTES, event, wrap_message=True)
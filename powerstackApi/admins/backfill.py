@@ -0,0 +1,185 @@
+import sys
+import logging
+
+from functions import *
+from rollups import ROLLUPS_TABLE, CONFIRMED, DAY, ALL_TYPES, SALES_TOTALS_REPORT, rollup_deltas, apply_once
+from utils.report_cache import forget_cached
+
+
+#Configure Logs
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    One-off backfills for attributes added after rows were already being written.
+    Run from the admins directory with credentials for the target account:
+
+        powerstackApi/admins$ python backfill.py [--dry-run] [--rollups-before 'YYYY-MM-DD HH:MM'
+                                                 [--rollup-types ALL]] [--indexes]
+
+    Purchases are re-put whole with batch_write_items. Only rows with a purchaseDate are
+    touched: Initialized purchases have none until confirm_pay_with_platform overwrites
+    them, and a Confirmed purchase is never written again, so the put can't clobber a
+    concurrent update. Users are live rows (wallet, meters), so they get a conditional
+    UpdateItem that only sets lastLoginEpochMs if a login hasn't already written it.
+
+    Rollups: the purchases stream only counts confirmations made after it was enabled.
+    --rollups-before (UTC, the time the stream consumer went live) counts every earlier
+    Confirmed purchase into the rollup rows. It must run before transactions_by_date_range
+    serves totals from the rollups, otherwise every earlier window reports zero. Each
+    rollup row is written together with a BACKFILL#<rollupKey> marker, so a rerun (or a
+    run picked up after a crash) never adds a row twice. --rollup-types limits the run to
+    some rollup rows, e.g. ALL to fill the every-type rows of a table that was backfilled
+    before they existed.
+
+    --indexes makes one index change per table towards TABLE_INDEXES (see
+    ensure_table_indexes): the epoch-ms GSIs are created first, then indexes no longer
+    listed, like the txnType-purchaseTime-index the epoch-ms one replaced, are deleted.
+    Rerun it once the previous change is ACTIVE until nothing is pending; the epoch-ms
+    backfills above must have run before the new indexes serve reports.
+"""
+
+
+def _epoch_ms_for(item, date_attribute, key_name):
+    epoch_ms = to_epoch_ms(item.get(date_attribute))
+    if epoch_ms is None:
+        logger.warning(f"Unreadable {date_attribute} on {item.get(key_name)}: {item.get(date_attribute)}")
+    return epoch_ms
+
+
+def backfill_purchase_epoch_ms(dry_run=False):
+    """
+    Adds purchaseEpochMs to purchases written before it existed, so they show up in
+    TXN_TYPE_TIME_INDEX range reports. Each scan page is written back as it arrives.
+
+    Returns:
+        dict: rows updated and rows skipped for an unreadable purchaseDate
+    """
+    updated, skipped = 0, 0
+    pages = parallel_scan_pages(
+        PURCHASE_TABLE,
+        FilterExpression=Attr('purchaseDate').exists() & Attr('purchaseEpochMs').not_exists()
+    )
+    for page in pages:
+        page_updates = []
+        for purchase in page:
+            epoch_ms = _epoch_ms_for(purchase, 'purchaseDate', 'purchaseID')
+            if epoch_ms is None:
+                skipped += 1
+                continue
+            purchase['purchaseEpochMs'] = epoch_ms
+            page_updates.append(purchase)
+
+        if page_updates and not dry_run:
+            batch_write_items(PURCHASE_TABLE, put_items=page_updates)
+        updated += len(page_updates)
+    return {'updated': updated, 'skipped': skipped}
+
+
+def _set_login_epoch_ms(users):
+    table = get_table(USERS_TABLE)
+    for user_id, epoch_ms in users:
+        try:
+            table.update_item(
+                Key={'userID': user_id},
+                UpdateExpression='SET lastLoginEpochMs = :epoch_ms',
+                ConditionExpression=Attr('lastLoginEpochMs').not_exists(),
+                ExpressionAttributeValues={':epoch_ms': epoch_ms}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+def backfill_login_epoch_ms(dry_run=False):
+    """
+    Adds lastLoginEpochMs to users who haven't logged in since it was introduced, so they
+    show up in USER_TYPE_LOGIN_INDEX range reports. Each scan page is updated as it arrives.
+
+    Returns:
+        dict: rows updated and rows skipped for an unreadable lastLogin
+    """
+    updated, skipped = 0, 0
+    scan_kwargs = {'FilterExpression': Attr('lastLogin').exists() & Attr('lastLoginEpochMs').not_exists()}
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        for page in parallel_scan_pages(USERS_TABLE, **with_projection(scan_kwargs, ['userID', 'lastLogin'])):
+            page_updates = []
+            for user in page:
+                epoch_ms = _epoch_ms_for(user, 'lastLogin', 'userID')
+                if epoch_ms is None:
+                    skipped += 1
+                    continue
+                page_updates.append((user['userID'], epoch_ms))
+
+            if not dry_run:
+                chunks = [page_updates[start:start + BATCH_WRITE_LIMIT]
+                          for start in range(0, len(page_updates), BATCH_WRITE_LIMIT)]
+                list(executor.map(_set_login_epoch_ms, chunks))
+            updated += len(page_updates)
+    return {'updated': updated, 'skipped': skipped}
+
+
+def backfill_rollups(before, dry_run=False, table_name=ROLLUPS_TABLE, txn_types=None):
+    """
+    Counts Confirmed purchases made before the stream consumer went live into the HOUR
+    and DAY rollup rows, through the same record_deltas the stream uses. Each scan page
+    is folded into per-row totals and dropped; the rows are written after the scan, as
+    a row's BACKFILL marker stands for its whole total. Cached per-day sales totals of
+    the days it writes are dropped, so reports read the new rows.
+
+    Args:
+        before (string): '%Y-%m-%d %H:%M' UTC; purchases from then on are left to the stream
+        txn_types (list): only write the rows of these types (ALL for the every-type rows)
+
+    Returns:
+        dict: purchases counted, rollup rows written and rows already backfilled
+    """
+    cutoff_ms = to_epoch_ms(before)
+    if cutoff_ms is None:
+        raise ValueError(f"Unreadable --rollups-before: {before}")
+
+    # running totals per rollup row: bounded by the number of hours and days, not purchases
+    deltas = collections.defaultdict(lambda: collections.defaultdict(decimal.Decimal))
+    purchases = 0
+    for page in parallel_scan_pages(PURCHASE_TABLE, FilterExpression=Attr('status').eq(CONFIRMED)):
+        records = []
+        for purchase in page:
+            epoch_ms = to_epoch_ms(purchase.get('purchaseEpochMs'))
+            if epoch_ms is None:
+                epoch_ms = _epoch_ms_for(purchase, 'purchaseDate', 'purchaseID')
+            if epoch_ms is not None and epoch_ms < cutoff_ms:
+                # shaped like the stream INSERT that would have counted it
+                records.append({'eventName': 'INSERT', 'dynamodb': {'NewImage': serialize_item(purchase)}})
+
+        for row, counters in rollup_deltas(records).items():
+            if txn_types and row[0].split('#', 1)[1] not in txn_types:
+                continue
+            for counter, value in counters.items():
+                deltas[row][counter] += value
+        purchases += len(records)
+
+    written = 0
+    changed_days = collections.defaultdict(set)
+    if not dry_run:
+        for (key, bucket), counters in deltas.items():
+            marker = {'rollupKey': f'BACKFILL#{key}', 'bucket': bucket}
+            if apply_once(marker, [(key, bucket, dict(counters))], table_name):
+                written += 1
+                granularity, txn_type = key.split('#', 1)
+                if granularity == DAY:
+                    changed_days[txn_type].add(bucket)
+        # totals cached for these days before the backfill counted them as empty
+        for txn_type, days in changed_days.items():
+            forget_cached(SALES_TOTALS_REPORT, {'type': None if txn_type == ALL_TYPES else txn_type}, days)
+    return {'purchases': purchases, 'rows': written, 'already_backfilled': 0 if dry_run else len(deltas) - written}
+
+if __name__ == '__main__':
+    dry_run = '--dry-run' in sys.argv
+    print('purchases', backfill_purchase_epoch_ms(dry_run=dry_run))
+    print('users', backfill_login_epoch_ms(dry_run=dry_run))
+    if '--rollups-before' in sys.argv:
+        txn_types = sys.argv[sys.argv.index('--rollup-types') + 1].split(',') if '--rollup-types' in sys.argv else None
+        print('rollups', backfill_rollups(sys.argv[sys.argv.index('--rollups-before') + 1], dry_run=dry_run, txn_types=txn_types))
+    if '--indexes' in sys.argv and not dry_run:
+        for table_name in TABLE_INDEXES:
+            print('indexes pending', table_name, ensure_table_indexes(table_name))
@@ -53,27 +53,31 @@ TICKETS_TABLE = 'powerstackTickets'
 
 # ---------- SECTION 1: USER MANAGEMENT ----------
 
-def get_users_by_type(id_token, query_params):
-    decoded_token = decode_token(id_token)
+def get_users_by_type(decoded_token, query_params):
 
 
     type = query_params.get('type')
     try:
         if admin_or_owner(decoded_token):
-            user_list = get_items_by_attribute(USERS_TABLE, 'userType', type)
-            return {'message': 'users retrieved', 'users': user_list}
+            user_list, next_token = get_items_by_attribute_page(
+                USERS_TABLE, 'userType', type,
+                limit=query_params.get('limit'),
+                next_token=query_params.get('nextToken')
+            )
+            return {'message': 'users retrieved', 'users': user_list, 'nextToken': next_token}
         else:
             raise UnauthorizedUser
     except Exception as e:
         error_format(e)
     
 
-def get_specific_user(id_token,  query_params):
-    decoded_token = decode_token(id_token)
+def get_specific_user(decoded_token, query_params):
     user_email = query_params.get('user_email')         
     try:
         if admin_or_owner(decoded_token):
-            user = get_items_by_attribute(USERS_TABLE, 'email', user_email)[0]
+            user = get_user_by_email_index(USERS_TABLE, user_email)
+            if user is None:
+                raise UserNotFoundException
             purchases = get_items_by_attribute(PURCHASE_TABLE, 'email', user_email)
             return {'user info': f'{user}','purchases': purchases, 'message': 'User info retrieved.'}
         else:
@@ -82,12 +86,12 @@ def get_specific_user(id_token,  query_params):
        error_format(e)
     
 
-def get_purchase_by_reference(id_token, query_params):
-    decoded_token = decode_token(id_token)
-    reference = query_params.get('reference') 
+def get_purchase_by_reference(decoded_token, query_params):
+    references = query_params.get('reference') or ''
     try:
         if admin_or_owner(decoded_token):
-            purchase = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', reference)
+            keys = [{'purchaseID': ref.strip()} for ref in references.split(',') if ref.strip()]
+            purchase = batch_get_items(PURCHASE_TABLE, keys)
             return {'purchase': purchase}
         else:
             raise UnauthorizedUser
@@ -95,14 +99,14 @@ def get_purchase_by_reference(id_token, query_params):
         error_format(e)
     
 
-def update_user_status(id_token, data):
-    decoded_token = decode_token(id_token)
+def update_user_status(decoded_token, data):
     user_email = data.get('email')
     status = data.get('status')
     try:
         if admin_or_owner(decoded_token):
-            user = get_items_by_attribute(USERS_TABLE, 'email', user_email)[0]
-            user_id = user.get('userID')
+            user_id = get_user_id_by_email(USERS_TABLE, user_email)
+            if user_id is None:
+                raise UserNotFoundException
             update_table_item(USERS_TABLE, 'userID', user_id, 'isActive', status)
             return {'message': f'User status - {user_email} - has been updated'}
         else:
@@ -112,43 +116,37 @@ def update_user_status(id_token, data):
 
 # ---------- SECTION 2: TICKET SUPPORT ----------
         
-def update_ticket_status(id_token, query_params):
+def update_ticket_status(decoded_token, data):
     """Update ticket status to In progress when first working on it. Then update to Done when admin is done with the ticket.
     All correspondence can be done through email / phone.
 
     Args:
-        id_token (_type_): _description_
+        decoded_token (dict): verified token claims
         data (_type_): _description_
 
     Returns:
         _type_: _description_
     """
-    decoded_token = decode_token(id_token)
-
-
-    ticket = query_params.get('ticket')
-    new_status = query_params.get('status')
+    ticket = data.get('ticket')
+    new_status = data.get('status')
     try:
         if admin_or_owner(decoded_token): 
             status_update = update_table_item(TICKETS_TABLE, 'ticketID', ticket, 'ticketStatus', new_status)
-            return {
-                {'message': f'Ticket {ticket} status updated'}
-            }
+            return {'message': f'Ticket {ticket} status updated'}
         else:
             raise UnauthorizedUser
     except Exception as e:
         error_format(e)
 
 
-def add_comments_to_ticket(id_token, data):
+def add_comments_to_ticket(decoded_token, data):
     """After status update, then call the update status endpont to close the ticket. if ready to be closed.
     FOr subsequent comments, allow the function to append on past comments. on UI
 
     Args:
-        id_token (_type_): _description_
+        decoded_token (dict): verified token claims
         data (_type_): _description_
     """
-    decoded_token = decode_token(id_token)
     comments = data.get('comments')
     ticket_id = data.get('ticket')
     try:
@@ -162,28 +160,28 @@ def add_comments_to_ticket(id_token, data):
 
 
 
-def get_tickets_by_status(id_token, query_params):
-    decoded_token = decode_token(id_token)
+def get_tickets_by_status(decoded_token, query_params):
     status = query_params.get('status')
     try:
         if admin_or_owner(decoded_token):
-            ticket_list = get_items_by_attribute(TICKETS_TABLE, 'ticketStatus', status)
-            return {'message': 'Tickets retrieved', 'tickets': ticket_list}
+            ticket_list, next_token = get_items_by_attribute_page(
+                TICKETS_TABLE, 'ticketStatus', status,
+                limit=query_params.get('limit'),
+                next_token=query_params.get('nextToken')
+            )
+            return {'message': 'Tickets retrieved', 'tickets': ticket_list, 'nextToken': next_token}
         else:
             raise UnauthorizedUser
     except Exception as e:
         error_format(e)
 
 
-def get_specific_ticket(id_token, query_params):
-    decoded_token = decode_token(id_token)
+def get_specific_ticket(decoded_token, query_params):
     ticket_id = query_params.get('ticket')
     try:
         if admin_or_owner(decoded_token):
-            ticket_list = get_items_by_attribute(TICKETS_TABLE, 'ticketID', ticket_id)
-            if (ticket_list):
-                ticket = ticket_list[0]
-            else:
+            ticket = get_item(TICKETS_TABLE, {'ticketID': ticket_id})
+            if ticket is None:
                 raise InvalidReferenceException
             return {'message': 'Ticket retrieved', 'ticket': ticket}
         else:
@@ -191,17 +189,37 @@ def get_specific_ticket(id_token, query_params):
     except Exception as e:
         error_format(e)
 
-def ticket_list(id_token):
-    decoded_token = decode_token(id_token)
+def ticket_list(decoded_token, query_params):
+    """
+    Pages through all tickets.
+
+    Args:
+        decoded_token (dict): verified token claims
+        query_params (dict): limit, nextToken (from the previous page)
+
+    Returns:
+        JSON : tickets on this page and nextToken (None on the last page)
+    """
+    limit = query_params.get('limit')
+    next_token = query_params.get('nextToken')
    
     try:
         if admin_or_owner(decoded_token): 
-            tickets = get_all_items(TICKETS_TABLE)
+            tickets, next_token = scan_page(TICKETS_TABLE, limit=limit, next_token=next_token)
             return {
-                'message': tickets
+                'message': tickets,
+                'nextToken': next_token
             }
         else:
             raise UnauthorizedUser
     except Exception as e:
         error_format(e)
-    
\ No newline at end of file
+
+
+# ---------- PREWARM ----------
+def prewarm_clients(open_connections=False):
+    """ DynamoDB client, resource and Tables for this Lambda, built ahead of the first request. """
+    prewarm_dynamodb(
+        [USERS_TABLE, PURCHASE_TABLE, TICKETS_TABLE],
+        ping_key=(USERS_TABLE, 'userID') if open_connections else None
+    )
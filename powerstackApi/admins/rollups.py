@@ -0,0 +1,323 @@
+import sys
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+
+from functions import *
+
+
+#Configure Logs
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Pre-aggregated sales rollups.
+
+    The purchases table stream (NEW_AND_OLD_IMAGES) feeds `lambda_handler` below, which keeps
+    one counter row per (granularity, txnType, bucket) in ROLLUPS_TABLE:
+
+        rollupKey (hash) : "HOUR#Simple" / "DAY#Wallet"
+        bucket    (range): "2024-01-05T13" (HOUR) / "2024-01-05" (DAY), UTC
+
+    Every purchase is also counted into the "HOUR#ALL" / "DAY#ALL" rows, which answer
+    reports that don't ask for a txnType.
+
+    A purchase is counted once, on the write that first makes it Confirmed (a Confirmed
+    INSERT from pay_with_wallet, or the Initialized -> Confirmed overwrite from
+    confirm_pay_with_platform). Re-saves of an already Confirmed purchase add nothing.
+
+    Each record's HOUR and DAY increments are written in one TransactWriteItems together
+    with an APPLIED#<eventID> marker row (expiring after APPLIED_TTL_SECONDS through the
+    table's expiresAt TTL), so a record retried after a partial failure or a redelivered
+    batch is counted exactly once.
+
+    Date ranges are answered from DAY rows for whole days and HOUR rows for the partial
+    days at either end, so a report reads a few dozen rows whatever the purchase volume.
+    Resolution is one hour: a range starting at 10:20 includes the whole 10:00 hour.
+
+    The stream only sees purchases confirmed after it was enabled. Run
+    backfill.backfill_rollups (admins/backfill.py --rollups-before) once, before reports
+    are served from the rollups, or every earlier window reports zero (it also drops
+    any per-day totals already cached for the days it fills). Rollup tables
+    filled before the ALL rows existed need one `--rollups-before <ALL rows went live>
+    --rollup-types ALL` run to count the earlier purchases into the ALL rows only.
+"""
+
+# ---------- ROLLUP TABLE ----------
+ROLLUPS_TABLE = 'powerstackRollups'
+HOUR = 'HOUR'
+DAY = 'DAY'
+HOUR_FORMAT = '%Y-%m-%dT%H'
+DAY_FORMAT = '%Y-%m-%d'
+CONFIRMED = 'Confirmed'
+APPLIED = 'APPLIED'
+APPLIED_TTL_SECONDS = 2 * 24 * 3600  # stream records are kept for 24h
+ALL_TYPES = 'ALL'
+SALES_TOTALS_REPORT = 'purchaseTotals'  # report_cache name of the per-day totals
+
+# purchase attribute -> rollup counter
+ROLLUP_METRICS = {
+    'amount': 'nairaAmount',
+    'units': 'unitsSold',
+    'commission': 'commissionPaidOut',
+    'serviceFee': 'serviceFees',
+    'platformFees': 'platformFees',
+}
+COUNT_METRIC = 'purchaseCount'
+
+
+def rollup_key(granularity, txn_type):
+    """ txn_type None is the row every purchase is counted into. """
+    return f'{granularity}#{txn_type or ALL_TYPES}'
+
+
+def purchase_hour(purchase):
+    """
+    UTC hour a purchase falls in, from purchaseEpochMs. Rows written before that field
+    existed fall back to parsing purchaseDate (see time_utils).
+
+    Returns:
+        datetime truncated to the hour, or None when neither field can be read.
+    """
+    epoch_ms = to_epoch_ms(purchase.get('purchaseEpochMs'))
+    if epoch_ms is None:
+        epoch_ms = to_epoch_ms(purchase.get('purchaseDate'))
+    if epoch_ms is None:
+        return None
+    return epoch_ms_to_datetime(epoch_ms - epoch_ms % HOUR_MS)
+
+
+def _to_decimal(value):
+    try:
+        return decimal.Decimal(str(value))
+    except (decimal.InvalidOperation, TypeError, ValueError):
+        return decimal.Decimal(0)
+
+
+# ---------- STREAM CONSUMER ----------
+
+def record_deltas(record):
+    """
+    Counter increments for one purchases-table stream record.
+
+    Args:
+        record (dict): DynamoDB stream record (low-level attribute values).
+
+    Returns:
+        list: (rollupKey, bucket, {counter: Decimal}) for the HOUR and DAY rows of the
+              purchase's txnType and of ALL, or [] when the record isn't a purchase
+              becoming Confirmed.
+    """
+    if record.get('eventName') not in ('INSERT', 'MODIFY'):
+        return []
+    images = record.get('dynamodb', {})
+    new_image = deserialize_item(images.get('NewImage', {}))
+    old_image = deserialize_item(images.get('OldImage', {}))
+    if new_image.get('status') != CONFIRMED or old_image.get('status') == CONFIRMED:
+        return []
+
+    hour = purchase_hour(new_image)
+    txn_type = new_image.get('txnType')
+    if hour is None or not txn_type:
+        logger.warning("Skipping purchase %s: no usable txnType/purchaseEpochMs", new_image.get('purchaseID'))
+        return []
+
+    counters = {COUNT_METRIC: decimal.Decimal(1)}
+    for attribute, counter in ROLLUP_METRICS.items():
+        if attribute in new_image:
+            counters[counter] = _to_decimal(new_image[attribute])
+    return [
+        (rollup_key(granularity, row_type), hour.strftime(bucket_format), counters)
+        for row_type in (txn_type, ALL_TYPES)
+        for granularity, bucket_format in ((HOUR, HOUR_FORMAT), (DAY, DAY_FORMAT))
+    ]
+
+
+def rollup_deltas(records):
+    """
+    Merge the increments of a batch of stream records per rollup row. Pure, so a saved
+    stream event can be replayed locally without touching DynamoDB.
+
+    Returns:
+        dict: {(rollupKey, bucket): {counter: Decimal}}
+    """
+    merged = collections.defaultdict(lambda: collections.defaultdict(decimal.Decimal))
+    for record in records:
+        for key, bucket, counters in record_deltas(record):
+            for counter, value in counters.items():
+                merged[(key, bucket)][counter] += value
+    return {row: dict(counters) for row, counters in merged.items()}
+
+
+def rollup_update(key, bucket, counters):
+    """ UpdateItem parameters that ADD the counters onto one rollup row (created on first write). """
+    return {
+        'Key': {'rollupKey': key, 'bucket': bucket},
+        'UpdateExpression': 'ADD ' + ', '.join(f'#c{i} :c{i}' for i in range(len(counters))),
+        'ExpressionAttributeNames': {f'#c{i}': counter for i, counter in enumerate(counters)},
+        'ExpressionAttributeValues': {f':c{i}': value for i, value in enumerate(counters.values())}
+    }
+
+
+def apply_rollup_delta(key, bucket, counters, table_name=ROLLUPS_TABLE):
+    """
+    ADD the counters onto one rollup row (created on first write).
+    """
+    get_table(table_name).update_item(**rollup_update(key, bucket, counters))
+
+
+def apply_once(marker, deltas, table_name=ROLLUPS_TABLE):
+    """
+    Writes a marker row and ADDs every delta in a single TransactWriteItems: either every
+    row changes or none does, and nothing changes if the marker is already there.
+
+    Args:
+        marker (dict): marker item, keyed like a rollup row
+        deltas (list): (rollupKey, bucket, {counter: Decimal})
+
+    Returns:
+        bool: False if the marker existed
+    """
+    transact_items = [{'Put': {
+        'TableName': table_name,
+        'Item': marker,
+        'ConditionExpression': 'attribute_not_exists(rollupKey)'
+    }}]
+    for key, bucket, counters in deltas:
+        transact_items.append({'Update': dict(rollup_update(key, bucket, counters), TableName=table_name)})
+
+    try:
+        get_dynamodb_resource().meta.client.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        if e.response['Error']['Code'] == 'TransactionCanceledException' and reasons[:1] == ['ConditionalCheckFailed']:
+            return False
+        raise
+    return True
+
+
+def apply_record(record, table_name=ROLLUPS_TABLE):
+    """
+    Applies one stream record's HOUR and DAY increments, guarded by an APPLIED#<eventID> marker.
+
+    Returns:
+        bool: False if the record adds nothing or was applied before
+    """
+    deltas = record_deltas(record)
+    if not deltas:
+        return False
+
+    marker = {
+        'rollupKey': f"{APPLIED}#{record['eventID']}",
+        'bucket': APPLIED,
+        'expiresAt': int(time.time()) + APPLIED_TTL_SECONDS
+    }
+    if not apply_once(marker, deltas, table_name):
+        logger.info(f"Stream record {record['eventID']} already applied")
+        return False
+    return True
+
+
+def lambda_handler(event, context):
+    """
+    Purchases stream consumer. Records are applied one at a time, in order, and the first
+    failure is reported through ReportBatchItemFailures so Lambda retries from that record.
+    A record that was applied before (batch redelivered after a timeout) is skipped.
+    """
+    for record in event.get('Records', []):
+        try:
+            apply_record(record)
+        except Exception as e:
+            logger.error(f"Rollup update failed at {record.get('eventID')}: {e}")
+            sequence_number = record.get('dynamodb', {}).get('SequenceNumber')
+            return {'batchItemFailures': [{'itemIdentifier': sequence_number}]}
+    return {'batchItemFailures': []}
+
+
+# ---------- ROLLUP READS ----------
+
+def rollup_ranges(start, end):
+    """
+    Split [start, end] into the rollup rows that cover it.
+
+    Args:
+        start, end (datetime): range bounds, both inclusive to the hour.
+
+    Returns:
+        list: (granularity, first_bucket, last_bucket) - HOUR rows for partial days at the
+              edges, one DAY span for the whole days between them.
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+    end = end.replace(minute=0, second=0, microsecond=0)
+    if end < start:
+        return []
+    if start.date() == end.date():
+        return [(HOUR, start.strftime(HOUR_FORMAT), end.strftime(HOUR_FORMAT))]
+
+    ranges = []
+    first_day = start.date()
+    last_day = end.date()
+    if start.hour:
+        day_end = datetime.combine(first_day, datetime.min.time()) + timedelta(hours=23)
+        ranges.append((HOUR, start.strftime(HOUR_FORMAT), day_end.strftime(HOUR_FORMAT)))
+        first_day += timedelta(days=1)
+    if end.hour != 23:
+        day_start = datetime.combine(last_day, datetime.min.time())
+        ranges.append((HOUR, day_start.strftime(HOUR_FORMAT), end.strftime(HOUR_FORMAT)))
+        last_day -= timedelta(days=1)
+    if first_day <= last_day:
+        ranges.append((DAY, first_day.strftime(DAY_FORMAT), last_day.strftime(DAY_FORMAT)))
+    return ranges
+
+
+def sales_totals(counters=None):
+    """ Report totals from summed rollup counters; all zero for no counters. """
+    counters = counters or {}
+    return {
+        'purchase_count': int(counters.get(COUNT_METRIC, 0)),
+        'naira_amount': float(counters.get('nairaAmount', 0)),
+        'units_sold': float(counters.get('unitsSold', 0)),
+        'commission_paid_out': float(counters.get('commissionPaidOut', 0)),
+        'service_fees': float(counters.get('serviceFees', 0)),
+        'platform_fees': float(counters.get('platformFees', 0)),
+    }
+
+
+def sales_rollup_by_day(txn_type, spans, table_name=ROLLUPS_TABLE):
+    """
+    Per-day sales totals for one txnType (None: every type) over '%Y-%m-%d %H:%M' spans,
+    from the rollup rows. Shaped for report_cache.cached_by_day.
+
+    Returns:
+        dict: {'YYYY-MM-DD': sales_totals} for the days that have rollup rows
+    """
+    days = collections.defaultdict(lambda: collections.defaultdict(decimal.Decimal))
+    table = get_table(table_name)
+    for start_date, end_date in spans:
+        start = datetime.strptime(start_date, LEGACY_DATE_FORMAT)
+        end = datetime.strptime(end_date, LEGACY_DATE_FORMAT)
+        for granularity, first_bucket, last_bucket in rollup_ranges(start, end):
+            query_kwargs = {
+                'KeyConditionExpression': Key('rollupKey').eq(rollup_key(granularity, txn_type))
+                    & Key('bucket').between(first_bucket, last_bucket)
+            }
+            while True:
+                response = table.query(**query_kwargs)
+                for row in response.get('Items', []):
+                    # HOUR buckets ("2024-01-05T13") and DAY buckets both start with the day
+                    day = days[row['bucket'][:10]]
+                    for counter in (COUNT_METRIC, *ROLLUP_METRICS.values()):
+                        day[counter] += row.get(counter, 0)
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return {day: sales_totals(counters) for day, counters in days.items()}
+
+if __name__ == '__main__':
+    # Local replay: python admins/rollups.py events/purchase_stream.json
+    with open(sys.argv[1]) as f:
+        stream_event = json.load(f)
+    for (key, bucket), counters in sorted(rollup_deltas(stream_event['Records']).items()):
+        print(key, bucket, {counter: str(value) for counter, value in counters.items()})
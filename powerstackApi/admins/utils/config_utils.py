@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import boto3
+import logging
+import threading
+
+from botocore.config import Config
+from utils.exception_handler import *
+
+# ---------- LOGS ----------
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Secrets, loaded on first use and cached for the life of the container.
+
+    Nothing is fetched at import, so routes that never need a secret (hello, receipts,
+    ...) don't pay a Secrets Manager round trip on a cold start. A secret is cached for
+    SECRET_TTL_SECONDS; in the last SECRET_REFRESH_AHEAD_SECONDS of that a request gets the
+    cached value straight away while one background thread fetches the new one, so a warm
+    container never waits on a refresh. Concurrent first loads of the same secret share one
+    fetch. If a refresh fails the last good value keeps being served.
+
+    Secrets (JSON in Secrets Manager):
+        POOL_SECRET_NAME     powerstack_pool_id, powerstack_client_id, powerstack_client_secret
+        PAYMENT_SECRET_NAME  paystack_secret_key, flutterwave_public_key, flutterwave_secret_key
+"""
+
+# ---------- SECRETS CONFIG ----------
+SECRETS_REGION = os.environ.get('SECRETS_REGION', 'us-east-2')
+POOL_SECRET_NAME = os.environ.get('POOL_SECRET_NAME', 'powerstack_pool')
+PAYMENT_SECRET_NAME = os.environ.get('PAYMENT_SECRET_NAME', 'powerstack_payments')
+SECRET_TTL_SECONDS = int(os.environ.get('SECRET_TTL_SECONDS', '900'))
+SECRET_REFRESH_AHEAD_SECONDS = int(os.environ.get('SECRET_REFRESH_AHEAD_SECONDS', '60'))
+
+SECRETS_CLIENT_CONFIG = Config(connect_timeout=2, read_timeout=5, retries={'max_attempts': 3, 'mode': 'standard'})
+
+_SECRETS_CLIENT = None
+# secret name -> (expires_at (monotonic), raw string, parsed JSON or None)
+_SECRETS = {}
+_SECRETS_LOCK = threading.Lock()
+_LOAD_LOCKS = {}
+_REFRESHING = set()
+
+
+def get_secrets_client():
+    global _SECRETS_CLIENT
+    if _SECRETS_CLIENT is None:
+        with _SECRETS_LOCK:
+            if _SECRETS_CLIENT is None:
+                _SECRETS_CLIENT = boto3.session.Session().client(
+                    service_name='secretsmanager',
+                    region_name=SECRETS_REGION,
+                    config=SECRETS_CLIENT_CONFIG
+                )
+    return _SECRETS_CLIENT
+
+
+def _fetch_secret(secret_name):
+    return get_secrets_client().get_secret_value(SecretId=secret_name)['SecretString']
+
+
+def _load_lock(secret_name):
+    with _SECRETS_LOCK:
+        return _LOAD_LOCKS.setdefault(secret_name, threading.Lock())
+
+
+def _store(secret_name, value):
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = None
+    entry = (time.monotonic() + SECRET_TTL_SECONDS, value, parsed)
+    with _SECRETS_LOCK:
+        _SECRETS[secret_name] = entry
+    return entry
+
+
+def _load(secret_name, stale_before):
+    """
+    Single-flight fetch: whoever holds the lock fetches, anyone queued behind it reuses
+    the result if it expires after stale_before.
+    """
+    with _load_lock(secret_name):
+        entry = _SECRETS.get(secret_name)
+        if entry is not None and entry[0] > stale_before:
+            return entry
+        try:
+            return _store(secret_name, _fetch_secret(secret_name))
+        except Exception as e:
+            if entry is not None:
+                logger.error(f"Refreshing secret {secret_name} failed, serving the cached value: {e}")
+                return entry
+            error_format(e)
+
+
+def _refresh_in_background(secret_name, seen_expiry):
+    with _SECRETS_LOCK:
+        if secret_name in _REFRESHING:
+            return
+        _REFRESHING.add(secret_name)
+
+    def refresh():
+        try:
+            _load(secret_name, seen_expiry)
+        except Exception as e:
+            logger.error(f"Background refresh of secret {secret_name} failed: {e}")
+        finally:
+            with _SECRETS_LOCK:
+                _REFRESHING.discard(secret_name)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def _cached_entry(secret_name):
+    now = time.monotonic()
+    entry = _SECRETS.get(secret_name)
+    if entry is None or entry[0] <= now:
+        return _load(secret_name, now)
+    if entry[0] - now <= SECRET_REFRESH_AHEAD_SECONDS:
+        _refresh_in_background(secret_name, entry[0])
+    return entry
+
+
+def get_secret(secret_name):
+    """
+    Returns:
+        string : the secret's SecretString, read from SECRETS_REGION
+    """
+    return _cached_entry(secret_name)[1]
+
+
+def get_secret_json(secret_name):
+    """
+    Returns:
+        dict : the secret's SecretString parsed as JSON
+    """
+    parsed = _cached_entry(secret_name)[2]
+    if parsed is None:
+        raise CustomException(code='InvalidSecret', message=f'Secret {secret_name} is not valid JSON')
+    return parsed
+
+
+def pool_config():
+    """ Cognito pool id, app client id and app client secret. """
+    secret = get_secret_json(POOL_SECRET_NAME)
+    return secret['powerstack_pool_id'], secret['powerstack_client_id'], secret['powerstack_client_secret']
+
+
+def payment_key(name):
+    """ One of the payment platform keys in PAYMENT_SECRET_NAME, e.g. 'paystack_secret_key'. """
+    return get_secret_json(PAYMENT_SECRET_NAME)[name]
@@ -31,15 +31,27 @@ class IncompleteSignupException(CustomException):
 
 class InvalidReferenceException(CustomException):
     def __init__(self, message='The given transaction reference is invalid.'):
-        super().__init__(code='InvalidReference')
+        super().__init__(code='InvalidReference', message=message)
 
 class InsufficientBalanceException(CustomException):
     def __init__(self, message='Insufficient wallet balance, please fund wallet.'):
-        super().__init__(code='InsufficientBalance')
+        super().__init__(code='InsufficientBalance', message=message)
+
+class InvalidCursorException(CustomException):
+    def __init__(self, message='The given nextToken is invalid, start again from the first page.'):
+        super().__init__(code='InvalidCursor', message=message)
+
+class InvalidTokenException(CustomException):
+    def __init__(self, message='Invalid session token, log in again.'):
+        super().__init__(code='InvalidToken', message=message)
+
+class InvalidAnalyticsQueryException(CustomException):
+    def __init__(self, message='Invalid analytics query.'):
+        super().__init__(code='InvalidAnalyticsQuery', message=message)
 
 class UnauthorizedUser(CustomException):
-    def __init(self, message='Unauthorized user.'):
-        super().__init__(code='UnauthorizedUser')
+    def __init__(self, message='Unauthorized user.'):
+        super().__init__(code='UnauthorizedUser', message=message)
 
 # ---------- SECTION 2: EXCEPTION FORMATTING ----------
 def error_format(e):
@@ -8,6 +8,8 @@ import hashlib, hmac, base64
 
 from datetime import datetime, timezone
 from utils.exception_handler import *
+from utils.token_utils import *
+from utils.config_utils import *
 from botocore.exceptions import ClientError
 
 # ---------- LOGS ----------
@@ -21,36 +23,6 @@ def format_date_time(timezone_id):
     return local_time.strftime('%Y-%m-%d %H:%M')
 
 
-def decode_token(id_token):
-    decoded_token = jwt.decode(id_token, algorithms="RS256", options={"verify_signature": False})
-   
-    current_time = datetime.now(timezone.utc).timestamp()
-    expiration_time = decoded_token['exp']
-    if current_time < expiration_time:
-        return decoded_token
-    else:
-        return "Expired"
-
-
-def get_secret(secret_name, region_name):
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
-
-    try:
-        get_secret_value_response = client.get_secret_value(
-            SecretId=secret_name
-        )
-    except Exception as e:
-        error_format(e)
-
-    # Decrypts secret using the associated KMS key.
-    secret = get_secret_value_response['SecretString']
-    return secret
-
 def calculate_secret_hash(username, client_id, client_secret):
     message = username + client_id
     dig = hmac.new(str(client_secret).encode('utf-8'), 
@@ -61,6 +33,14 @@ def calculate_secret_hash(username, client_id, client_secret):
     return secret_hash
 
 def get_user_by_email(email, client, pool_id):
+    """
+    One user by username or email. admin_get_user resolves usernames and verified email
+    aliases; an email that was never verified (an UNCONFIRMED signup) is only found by
+    filtering list_users on it, so that is tried when admin_get_user misses.
+
+    Returns:
+        dict : username, user_status, user_attributes (a CONFIRMED match first), or None
+    """
     try:
         response = client.admin_get_user(
             UserPoolId=pool_id,
@@ -77,21 +57,63 @@ def get_user_by_email(email, client, pool_id):
             'user_attributes': user_attributes
             }
     except client.exceptions.UserNotFoundException:
-        return None
+        if '@' not in email:
+            return None
+    except Exception as e:
+        error_format(e)
+
+    users = list_users_by_email(email, client, pool_id)
+    users.sort(key=lambda user: user['user_status'] != 'CONFIRMED')
+    return users[0] if users else None
+
+
+def list_users_by_email(email, client, pool_id):
+    """
+    Every user whose email attribute is `email`, verified or not.
+
+    Returns:
+        list : {'username', 'user_status', 'user_attributes'}
+    """
+    try:
+        escaped = email.replace('\\', '\\\\').replace('"', '\\"')
+        response = client.list_users(UserPoolId=pool_id, Filter=f'email = "{escaped}"')
+        return [{
+            'username': user['Username'],
+            'user_status': user.get('UserStatus'),
+            'user_attributes': user.get('Attributes')
+        } for user in response['Users']]
     except Exception as e:
         error_format(e)
     
 
 def get_unconfirmed_users(user_pool_id, client):
+    """
+    Every UNCONFIRMED user in the pool, following PaginationToken. This walks the whole
+    pool, so it belongs in offline jobs (users/maintenance.py), never in a request path.
+
+    Returns:
+        list : {'Username', 'Email', 'UserCreateDate'}
+    """
     try:
-        response = client.list_users(
-            UserPoolId=user_pool_id,
-            AttributesToGet=['email'],
-            Filter="cognito:user_status = \"UNCONFIRMED\""
-        )
-        logger.info(response)
-        unconfirmed_users = [{'Username': user['Username'], 'Email': user['Attributes'][0]['Value']} for user in response['Users']]
-        logger.info(unconfirmed_users)
+        unconfirmed_users = []
+        list_params = {
+            'UserPoolId': user_pool_id,
+            'AttributesToGet': ['email'],
+            'Filter': "cognito:user_status = \"UNCONFIRMED\""
+        }
+        while True:
+            response = client.list_users(**list_params)
+            for user in response['Users']:
+                attributes = {attribute['Name']: attribute['Value'] for attribute in user.get('Attributes', [])}
+                unconfirmed_users.append({
+                    'Username': user['Username'],
+                    'Email': attributes.get('email'),
+                    'UserCreateDate': user.get('UserCreateDate')
+                })
+            if not response.get('PaginationToken'):
+                break
+            list_params['PaginationToken'] = response['PaginationToken']
+        logger.info(f"{len(unconfirmed_users)} unconfirmed users")
         return unconfirmed_users
     except Exception as e:
         error_format(e)
@@ -109,7 +131,7 @@ def delete_user(user_pool_id, username, client):
 
 
 def admin_or_owner(decoded_token):
-    user_type = decode_token.get('custom:userType')
+    user_type = decoded_token.get('custom:userType')
 
     if user_type == 'ADMIN' or user_type == 'OWNER':
         return True
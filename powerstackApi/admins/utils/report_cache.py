@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import logging
+import threading
+import collections
+
+from utils.db_utils import *
+
+# ---------- LOGS ----------
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Analytics result cache.
+
+    A report over a period that has ended can't change, so its result is stored once and
+    served from then on: first from this container's memory, then from REPORT_CACHE_TABLE
+    (hash key cacheKey). Results for periods still open are kept for REPORT_CACHE_OPEN_TTL
+    seconds (expiresAt is the table's TTL attribute).
+
+    Additive reports (counts, sums, per-group totals) are assembled from whole UTC days:
+    every full day in the window is its own cache entry, fetched with one batch read. What
+    isn't cached (the partial days at either end and any missing days) is computed in one
+    pass and split by day. A year-long dashboard reload is a batch read plus a live pass
+    over the two edges. Only reports over immutable rows belong here: a row whose
+    date moves (lastLogin) would be counted again on its new day.
+
+    A period counts as closed REPORT_CACHE_SETTLE_SECONDS after it ends, leaving time for
+    late confirmations and the rollup stream to land. A closed result only changes when a
+    backfill rewrites the rows behind it; the backfill then drops those days with
+    forget_cached, and the in-memory copy is re-read from the table after at most
+    REPORT_CACHE_MEMORY_TTL seconds.
+"""
+
+# ---------- CACHE CONFIG ----------
+REPORT_CACHE_TABLE = 'powerstackReportCache'
+REPORT_CACHE_OPEN_TTL = int(os.environ.get('REPORT_CACHE_OPEN_TTL', '60'))
+REPORT_CACHE_SETTLE_SECONDS = int(os.environ.get('REPORT_CACHE_SETTLE_SECONDS', '300'))
+REPORT_CACHE_MEMORY_TTL = int(os.environ.get('REPORT_CACHE_MEMORY_TTL', '900'))
+MEMORY_CACHE_SIZE = 1024
+MAX_CACHED_BYTES = 350 * 1024  # DynamoDB items cap at 400 KB
+
+_MEMORY_CACHE = collections.OrderedDict()
+_MEMORY_CACHE_LOCK = threading.Lock()
+
+
+def cache_key(report, params, start_date, end_date):
+    return '#'.join([report, json.dumps(params, sort_keys=True, default=str), start_date, end_date])
+
+
+def is_closed(end_date):
+    return to_epoch_ms(end_date) + MINUTE_MS + REPORT_CACHE_SETTLE_SECONDS * 1000 <= epoch_ms_now()
+
+
+def _remember(key, body, expires_at):
+    # the serialized body is kept, so callers can't mutate a cached result
+    memory_expires_at = int(time.time()) + REPORT_CACHE_MEMORY_TTL
+    if expires_at is not None:
+        memory_expires_at = min(memory_expires_at, expires_at)
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE[key] = (memory_expires_at, body)
+        _MEMORY_CACHE.move_to_end(key)
+        while len(_MEMORY_CACHE) > MEMORY_CACHE_SIZE:
+            _MEMORY_CACHE.popitem(last=False)
+
+
+def _recall(key, now):
+    with _MEMORY_CACHE_LOCK:
+        entry = _MEMORY_CACHE.get(key)
+        if entry is None:
+            return None
+        expires_at, body = entry
+        if expires_at <= now:
+            del _MEMORY_CACHE[key]
+            return None
+        _MEMORY_CACHE.move_to_end(key)
+        return entry
+
+
+def load_cached(keys):
+    """
+    Cached results for the given keys, memory first, then one batch read for the rest.
+    Expired table rows are ignored (TTL deletion runs lazily).
+
+    Returns:
+        dict: {key: result} for the keys that were found
+    """
+    now = int(time.time())
+    found, missing = {}, []
+    for key in keys:
+        entry = _recall(key, now)
+        if entry is None:
+            missing.append(key)
+        else:
+            found[key] = json.loads(entry[1])
+
+    if missing:
+        rows = batch_get_items(REPORT_CACHE_TABLE, [{'cacheKey': key} for key in missing], projection=['cacheKey', 'result', 'expiresAt'])
+        for row in rows:
+            expires_at = int(row['expiresAt']) if 'expiresAt' in row else None
+            if expires_at is not None and expires_at <= now:
+                continue
+            _remember(row['cacheKey'], row['result'], expires_at)
+            found[row['cacheKey']] = json.loads(row['result'])
+    return found
+
+
+def store_cached(entries):
+    """
+    Args:
+        entries (list): (key, result, closed) tuples; open results get the short TTL
+    """
+    now = int(time.time())
+    rows = []
+    for key, result, closed in entries:
+        expires_at = None if closed else now + REPORT_CACHE_OPEN_TTL
+        body = json.dumps(result, default=str)
+        _remember(key, body, expires_at)
+        if len(body) > MAX_CACHED_BYTES:
+            logger.info(f"Report {key} too large to cache in table ({len(body)} bytes)")
+            continue
+        row = {'cacheKey': key, 'result': body}
+        if expires_at is not None:
+            row['expiresAt'] = expires_at
+        rows.append(row)
+    if rows:
+        batch_write_items(REPORT_CACHE_TABLE, put_items=rows)
+
+
+def forget_cached(report, params, days):
+    """
+    Drops the whole-day entries of an additive report (see cached_by_day), e.g. after a
+    backfill changed the rows they were computed from.
+
+    Args:
+        days (iterable): 'YYYY-MM-DD' UTC days
+    """
+    keys = [cache_key(report, params, f'{day} 00:00', f'{day} 23:59') for day in days]
+    with _MEMORY_CACHE_LOCK:
+        for key in keys:
+            _MEMORY_CACHE.pop(key, None)
+    if keys:
+        batch_write_items(REPORT_CACHE_TABLE, delete_keys=[{'cacheKey': key} for key in keys])
+
+
+# ---------- CACHED REPORTS ----------
+
+def cached_report(report, params, start_date, end_date, compute):
+    """
+    Whole-window cache for reports that can't be split into days (percentiles, charts).
+
+    Args:
+        report (string): report name, part of the key
+        params (dict): every other input that changes the result
+        start_date, end_date (string): '%Y-%m-%d %H:%M' window
+        compute (function): compute(start_date, end_date) -> JSON-serializable result
+    """
+    key = cache_key(report, params, start_date, end_date)
+    found = load_cached([key])
+    if key in found:
+        return found[key]
+    result = compute(start_date, end_date)
+    store_cached([(key, result, is_closed(end_date))])
+    return result
+
+
+def day_pieces(start_date, end_date):
+    """
+    Split a '%Y-%m-%d %H:%M' window into partial-day edges and whole UTC days.
+
+    Returns:
+        list: (start_date, end_date, whole_day) in time order
+    """
+    start_ms, end_ms = epoch_ms_range(start_date, end_date)
+    first_day = start_ms - start_ms % DAY_MS
+    pieces = []
+    day = first_day
+    while day <= end_ms:
+        piece_start = max(day, start_ms)
+        piece_end = min(day + DAY_MS - 1, end_ms)
+        whole_day = piece_start == day and piece_end == day + DAY_MS - 1
+        pieces.append((
+            epoch_ms_to_datetime(piece_start).strftime(LEGACY_DATE_FORMAT),
+            epoch_ms_to_datetime(piece_end).strftime(LEGACY_DATE_FORMAT),
+            whole_day
+        ))
+        day += DAY_MS
+    return pieces
+
+
+def merge_results(total, part):
+    """
+    Adds one piece of an additive report onto the running total: numbers are summed,
+    dicts merged key by key, lists concatenated.
+    """
+    if total is None:
+        return part
+    if isinstance(total, dict):
+        merged = dict(total)
+        for key, value in part.items():
+            merged[key] = merge_results(merged.get(key), value)
+        return merged
+    if isinstance(total, list):
+        return total + part
+    if isinstance(total, (int, float)) and isinstance(part, (int, float)):
+        return total + part
+    return part
+
+
+def uncached_spans(pieces):
+    """ Runs of consecutive pieces, as (start_date, end_date) spans. """
+    spans = []
+    for start_date, end_date, _ in pieces:
+        if spans and to_epoch_ms(start_date) == to_epoch_ms(spans[-1][1]) + MINUTE_MS:
+            spans[-1] = (spans[-1][0], end_date)
+        else:
+            spans.append((start_date, end_date))
+    return spans
+
+
+def cached_by_day(report, params, start_date, end_date, compute_days):
+    """
+    Additive report over an arbitrary window: whole days come from the cache, everything
+    else is computed by a single compute_days call, and the whole days it returns are
+    stored.
+
+    Args:
+        see cached_report; compute_days(spans) -> {'YYYY-MM-DD': result} for the days of
+        the (start_date, end_date) spans that have data, each something merge_results can
+        add up
+    """
+    pieces = day_pieces(start_date, end_date)
+    day_keys = {piece: cache_key(report, params, piece[0], piece[1]) for piece in pieces if piece[2]}
+    found = load_cached(list(day_keys.values()))
+
+    to_compute = [piece for piece in pieces if day_keys.get(piece) not in found]
+    computed = {}
+    if to_compute:
+        by_day = compute_days(uncached_spans(to_compute))
+        # days with no rows are stored as None, so they aren't recomputed either
+        computed = {piece: by_day.get(piece[0][:10]) for piece in to_compute}
+
+    store_cached([
+        (day_keys[piece], result, is_closed(piece[1]))
+        for piece, result in computed.items()
+        if piece in day_keys
+    ])
+
+    total = None
+    for piece in pieces:
+        result = computed[piece] if piece in computed else found[day_keys[piece]]
+        if result is not None:
+            total = merge_results(total, result)
+    return total
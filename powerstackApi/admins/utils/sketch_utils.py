@@ -0,0 +1,160 @@
+import math
+import hashlib
+import logging
+import threading
+
+from utils.db_utils import *
+
+# ---------- LOGS ----------
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Distinct active users per day as HyperLogLog sketches.
+
+    Logins reach the sketches through the users table stream (admins/activity.py), not
+    the login request itself. Each login hashes the userID to one of HLL_REGISTERS
+    registers and a rank (leading zeros + 1). A day's sketch is stored in ACTIVITY_TABLE
+    as HLL_SHARDS items (hash key sketchKey = "DAU#<userType>#<YYYY-MM-DD>#<shard>", plus
+    "DAU#ALL#..." for every user) whose attributes r<index> are the registers. Sharding keeps each item under 1 KB, so a
+    register write costs one WCU rather than one per KB of the whole sketch. A login is a
+    conditional SET of a single register that only succeeds if it raises it (atomic max),
+    so concurrent logins never lose an update and a repeat login is a no-op.
+
+    Any window is answered by batch-reading its day items and taking the register-wise
+    max: ~8 KB per day and ~3% standard error for DAU/WAU/MAU.
+    Counting starts when sketches start being written; past logins can't be recovered
+    from lastLogin, which only holds the latest one.
+"""
+
+# ---------- SKETCH CONFIG ----------
+ACTIVITY_TABLE = 'powerstackActivity'
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+REGISTERS_PER_SHARD = 64
+HLL_SHARDS = HLL_REGISTERS // REGISTERS_PER_SHARD
+ALL_USERS = 'ALL'
+DAY_KEY_FORMAT = '%Y-%m-%d'
+
+# (sketchKey, register) -> highest rank this container has already written
+_WRITTEN_RANKS = {}
+_WRITTEN_RANKS_LOCK = threading.Lock()
+WRITTEN_RANKS_SIZE = 20000
+
+
+def sketch_key(user_type, day, shard):
+    return f'DAU#{user_type}#{day}#{shard}'
+
+
+def hll_register(member):
+    """
+    Returns:
+        tuple: (register index, rank) for one member
+    """
+    digest = hashlib.blake2b(str(member).encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, 'big')
+    remaining_bits = 64 - HLL_PRECISION
+    index = value >> remaining_bits
+    rest = value & ((1 << remaining_bits) - 1)
+    return index, remaining_bits - rest.bit_length() + 1
+
+
+def _already_written(key, index, rank):
+    with _WRITTEN_RANKS_LOCK:
+        return _WRITTEN_RANKS.get((key, index), 0) >= rank
+
+
+def _remember_written(key, index, rank):
+    with _WRITTEN_RANKS_LOCK:
+        if len(_WRITTEN_RANKS) >= WRITTEN_RANKS_SIZE:
+            _WRITTEN_RANKS.clear()
+        _WRITTEN_RANKS[(key, index)] = max(rank, _WRITTEN_RANKS.get((key, index), 0))
+
+
+def record_active_user(user_id, user_type=None, epoch_ms=None):
+    """
+    Adds a user to the day's sketches (ALL and their userType). Never raises: a failed
+    sketch update is logged and the rest of the stream batch carries on.
+    """
+    day = epoch_ms_to_datetime(epoch_ms or epoch_ms_now()).strftime(DAY_KEY_FORMAT)
+    index, rank = hll_register(user_id)
+    table = get_table(ACTIVITY_TABLE)
+
+    for group in {ALL_USERS, user_type or ALL_USERS}:
+        key = sketch_key(group, day, index // REGISTERS_PER_SHARD)
+        if _already_written(key, index, rank):
+            continue
+        try:
+            table.update_item(
+                Key={'sketchKey': key},
+                UpdateExpression='SET #register = :rank',
+                ConditionExpression='attribute_not_exists(#register) OR #register < :rank',
+                ExpressionAttributeNames={'#register': f'r{index}'},
+                ExpressionAttributeValues={':rank': rank}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                logger.error(f"Activity sketch update failed for {key}: {e}")
+                continue
+        except Exception as e:
+            logger.error(f"Activity sketch update failed for {key}: {e}")
+            continue
+        _remember_written(key, index, rank)
+
+
+def merge_sketches(items):
+    """
+    Register-wise max of any number of sketch items.
+
+    Returns:
+        list: HLL_REGISTERS ranks
+    """
+    registers = [0] * HLL_REGISTERS
+    for item in items:
+        for name, rank in item.items():
+            if name[0] == 'r' and name[1:].isdigit():
+                index = int(name[1:])
+                if rank > registers[index]:
+                    registers[index] = int(rank)
+    return registers
+
+
+def estimate_distinct(registers):
+    """ HyperLogLog estimate with the small-range (linear counting) correction. """
+    estimate = HLL_ALPHA * HLL_REGISTERS ** 2 / sum(2.0 ** -rank for rank in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+    return int(round(estimate))
+
+
+def days_in_window(start_date, end_date):
+    """ UTC days touched by a '%Y-%m-%d %H:%M' window; partial days count whole. """
+    start_ms, end_ms = epoch_ms_range(start_date, end_date)
+    day = start_ms - start_ms % DAY_MS
+    days = []
+    while day <= end_ms:
+        days.append(epoch_ms_to_datetime(day).strftime(DAY_KEY_FORMAT))
+        day += DAY_MS
+    return days
+
+
+def active_user_counts(start_date, end_date, user_type=None):
+    """
+    Approximate distinct users who logged in during a window, and per day.
+
+    Returns:
+        dict: {'user_count': int, 'daily_active_users': {day: int}}
+    """
+    group = user_type or ALL_USERS
+    days = days_in_window(start_date, end_date)
+    keys = [{'sketchKey': sketch_key(group, day, shard)} for day in days for shard in range(HLL_SHARDS)]
+    items = batch_get_items(ACTIVITY_TABLE, keys)
+    by_key = {item['sketchKey']: item for item in items}
+
+    daily = {}
+    for day in days:
+        day_items = [by_key[key] for key in (sketch_key(group, day, shard) for shard in range(HLL_SHARDS)) if key in by_key]
+        daily[day] = estimate_distinct(merge_sketches(day_items))
+    return {'user_count': estimate_distinct(merge_sketches(items)), 'daily_active_users': daily}
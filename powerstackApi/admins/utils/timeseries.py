@@ -0,0 +1,167 @@
+import numpy as np
+
+from utils.db_utils import *
+
+"""
+    Columnar purchase analytics.
+
+    Purchases in a window are loaded once into parallel NumPy arrays (epoch ms, amount,
+    units, commission, txnType code) and every report - bucketed histograms, moving
+    averages, percentiles - is computed on the arrays, not per item in Python. Rows are
+    walked once to collect raw values; amounts (stored as strings) are then parsed a
+    column at a time.
+"""
+
+# ---------- COLUMNS ----------
+TIMESERIES_ATTRIBUTES = ['purchaseEpochMs', 'amount', 'units', 'commission', 'txnType']
+VALUE_COLUMNS = {
+    'amount': 'naira_amount',
+    'units': 'units_sold',
+    'commission': 'commission_paid_out',
+}
+
+# ---------- BUCKETS ----------
+WEEK_MS = 7 * DAY_MS
+MONDAY_OFFSET_MS = 4 * DAY_MS  # 1970-01-01 was a Thursday; weeks start on Monday
+GRANULARITIES = {
+    'hour': (HOUR_MS, 0),
+    'day': (DAY_MS, 0),
+    'week': (WEEK_MS, MONDAY_OFFSET_MS),
+}
+MAX_BUCKETS = 10000
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def _safe_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError, decimal.InvalidOperation):
+        return 0.0
+
+
+def _float_column(values):
+    try:
+        return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    except (TypeError, ValueError):
+        # a missing or malformed value somewhere in the column; parse one at a time
+        return np.fromiter(map(_safe_float, values), dtype=np.float64, count=len(values))
+
+
+def columns_from_items(items):
+    """
+    Turn purchase rows into column arrays. Missing or unreadable numbers become 0.
+
+    Returns:
+        dict: time (int64 epoch ms), amount / units / commission (float64),
+              type_code (int32 index into types), types (list of txnType names)
+    """
+    items = list(items)
+    times = [item.get('purchaseEpochMs') for item in items]
+    if None in times:
+        # rows not yet backfilled: fall back to the display date, drop unreadable ones
+        times = [epoch_ms if epoch_ms is not None else to_epoch_ms(item.get('purchaseDate')) for epoch_ms, item in zip(times, items)]
+        items = [item for epoch_ms, item in zip(times, items) if epoch_ms is not None]
+        times = [epoch_ms for epoch_ms in times if epoch_ms is not None]
+
+    columns = {'time': np.fromiter(map(int, times), dtype=np.int64, count=len(times))}
+    for attribute in VALUE_COLUMNS:
+        columns[attribute] = _float_column([item.get(attribute) for item in items])
+
+    type_index = {}
+    type_codes = [type_index.setdefault(item.get('txnType') or 'Unknown', len(type_index)) for item in items]
+    columns['types'] = list(type_index)
+    columns['type_code'] = np.array(type_codes, dtype=np.int32)
+    return columns
+
+
+def load_purchase_columns(table_name, start_date, end_date, txn_type=None, total_segments=None):
+    """
+    One read of a '%Y-%m-%d %H:%M' window (range index Query for a single txnType,
+    otherwise a parallel scan), projected to TIMESERIES_ATTRIBUTES.
+    """
+    start, end = epoch_ms_range(start_date, end_date)
+    if txn_type:
+        index_name, sort_key = range_index_for(table_name, 'txnType', 'purchaseDate')
+        items = query_range(table_name, index_name, 'txnType', txn_type, sort_key, start, end, projection=TIMESERIES_ATTRIBUTES)
+    else:
+        scan_kwargs = {'FilterExpression': Attr('purchaseEpochMs').between(start, end)}
+        items = parallel_scan(table_name, total_segments=total_segments, **with_projection(scan_kwargs, TIMESERIES_ATTRIBUTES))
+    return columns_from_items(items)
+
+
+# ---------- REPORTS ----------
+
+def bucket_edges(start_ms, end_ms, granularity):
+    """
+    Start of every bucket covering [start_ms, end_ms], aligned to UTC hours, days or
+    Monday-started weeks.
+    """
+    if granularity not in GRANULARITIES:
+        raise InvalidAnalyticsQueryException(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    width, offset = GRANULARITIES[granularity]
+    first = (start_ms - offset) // width * width + offset
+    count = (end_ms - first) // width + 1
+    if count > MAX_BUCKETS:
+        raise InvalidAnalyticsQueryException(f"Range spans {count} {granularity} buckets, the limit is {MAX_BUCKETS}")
+    return first + np.arange(count, dtype=np.int64) * width, width
+
+
+def histogram(columns, start_ms, end_ms, granularity='day', by_type=False):
+    """
+    Per-bucket purchase count and sums of amount, units and commission.
+
+    Returns:
+        dict: buckets (bucket start epoch ms) plus one array per metric; with by_type,
+              each metric is a {txnType: array} dict instead.
+    """
+    edges, width = bucket_edges(start_ms, end_ms, granularity)
+    in_range = (columns['time'] >= start_ms) & (columns['time'] <= end_ms)
+    bucket = (columns['time'][in_range] - edges[0]) // width
+
+    # one bincount per metric; with by_type each (bucket, type) pair gets its own slot
+    type_count = len(columns['types']) if by_type else 1
+    slot = bucket * type_count + (columns['type_code'][in_range] if by_type else 0)
+    size = len(edges) * type_count
+
+    def split(totals):
+        if not by_type:
+            return totals
+        totals = totals.reshape(len(edges), type_count)
+        return {name: totals[:, code] for code, name in enumerate(columns['types'])}
+
+    series = {'buckets': edges, COUNT_FIELD: split(np.bincount(slot, minlength=size))}
+    for attribute, field in VALUE_COLUMNS.items():
+        series[field] = split(np.bincount(slot, weights=columns[attribute][in_range], minlength=size))
+    return series
+
+
+def moving_average(values, window):
+    """
+    Trailing moving average; the first window-1 points average over what is available.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window <= 1 or not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(values) + 1), window)
+
+
+def percentiles(values, qs=DEFAULT_PERCENTILES):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {f'p{q:g}': None for q in qs}
+    return {f'p{q:g}': float(value) for q, value in zip(qs, np.percentile(values, qs))}
+
+
+def to_json_series(series):
+    """ NumPy arrays (and dicts of them) to lists, bucket starts to ISO UTC strings. """
+    result = {}
+    for field, value in series.items():
+        if field == 'buckets':
+            result[field] = [epoch_ms_to_datetime(edge).strftime('%Y-%m-%dT%H:%MZ') for edge in value.tolist()]
+        elif isinstance(value, dict):
+            result[field] = {name: array.tolist() for name, array in value.items()}
+        else:
+            result[field] = value.tolist()
+    return result
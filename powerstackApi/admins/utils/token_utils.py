@@ -0,0 +1,137 @@
+import os
+import jwt
+import time
+import hashlib
+import logging
+import threading
+import collections
+
+from utils.exception_handler import *
+from utils.config_utils import pool_config
+
+# ---------- LOGS ----------
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Cognito ID token verification.
+
+    Tokens are checked against the user pool's signing keys (RS256, issuer, token_use and
+    audience). The pool id (whose prefix is its region) and the app client id come from the
+    cached pool secret (config_utils.pool_config). The key set is fetched once per container
+    and kept for JWKS_CACHE_SECONDS; a token signed with a key id that isn't in the cached
+    set triggers one refetch, so key rotation is picked up without waiting for expiry.
+
+    A verified token's claims are remembered (keyed by a hash of the token) until the
+    token's exp, so repeat requests with the same session skip the signature check.
+    The handler verifies once per request and passes the claims to the route functions.
+"""
+
+# ---------- TOKEN CONFIG ----------
+JWKS_CACHE_SECONDS = int(os.environ.get('JWKS_CACHE_SECONDS', '3600'))
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+
+_JWKS_CLIENT = None
+_JWKS_CLIENT_LOCK = threading.Lock()
+
+# sha256(token) -> (exp, claims)
+_VERIFIED_TOKENS = collections.OrderedDict()
+_VERIFIED_TOKENS_LOCK = threading.Lock()
+
+
+def pool_issuer(pool_id):
+    # pool ids are '<region>_<id>'
+    region = pool_id.split('_', 1)[0]
+    return f'https://cognito-idp.{region}.amazonaws.com/{pool_id}'
+
+
+def get_jwks_client():
+    """ One PyJWKClient per container; it caches the key set and refetches on unknown kids. """
+    global _JWKS_CLIENT
+    if _JWKS_CLIENT is None:
+        with _JWKS_CLIENT_LOCK:
+            if _JWKS_CLIENT is None:
+                pool_id, _, _ = pool_config()
+                _JWKS_CLIENT = jwt.PyJWKClient(
+                    f'{pool_issuer(pool_id)}/.well-known/jwks.json',
+                    cache_jwk_set=True,
+                    lifespan=JWKS_CACHE_SECONDS
+                )
+    return _JWKS_CLIENT
+
+
+def _token_hash(id_token):
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def _recall_claims(key, now):
+    with _VERIFIED_TOKENS_LOCK:
+        entry = _VERIFIED_TOKENS.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del _VERIFIED_TOKENS[key]
+            return "Expired"
+        _VERIFIED_TOKENS.move_to_end(key)
+        return entry[1]
+
+
+def _remember_claims(key, claims):
+    with _VERIFIED_TOKENS_LOCK:
+        _VERIFIED_TOKENS[key] = (claims['exp'], claims)
+        _VERIFIED_TOKENS.move_to_end(key)
+        while len(_VERIFIED_TOKENS) > VERIFIED_TOKEN_CACHE_SIZE:
+            _VERIFIED_TOKENS.popitem(last=False)
+
+
+def verify_token(id_token):
+    """
+    Verifies a Cognito ID token's signature and claims.
+
+    Returns:
+        dict : the token's claims
+    Raises:
+        jwt.ExpiredSignatureError, jwt.InvalidTokenError, jwt.PyJWKClientError
+    """
+    pool_id, client_id, _ = pool_config()
+    signing_key = get_jwks_client().get_signing_key_from_jwt(id_token)
+    claims = jwt.decode(
+        id_token,
+        signing_key.key,
+        algorithms=['RS256'],
+        issuer=pool_issuer(pool_id),
+        audience=client_id,
+        options={'require': ['exp', 'iss', 'aud', 'token_use']}
+    )
+    if claims.get('token_use') != 'id':
+        raise jwt.InvalidTokenError('Not an ID token')
+    return claims
+
+
+def decode_token(id_token):
+    """
+    Verified claims for an ID token, from the cache when this token was seen before.
+
+    Returns:
+        dict : claims, or "Expired" once the token's exp has passed
+    """
+    key = _token_hash(id_token)
+    claims = _recall_claims(key, time.time())
+    if claims is not None:
+        return claims
+
+    try:
+        claims = verify_token(id_token)
+    except jwt.ExpiredSignatureError:
+        return "Expired"
+    except (jwt.InvalidTokenError, jwt.PyJWKClientError) as e:
+        logger.info(f"Token rejected: {e}")
+        raise InvalidTokenException
+
+    _remember_claims(key, claims)
+    return claims
+
+
+def prewarm_jwks(open_connections=False):
+    """ Loads the pool's signing keys so the first authenticated request doesn't wait on them. """
+    get_jwks_client().get_jwk_set()
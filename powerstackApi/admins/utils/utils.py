@@ -5,6 +5,7 @@ import jwt
 
 from datetime import datetime
 from botocore.exceptions import ClientError
+from utils.token_utils import decode_token
 
 
 def user_pool_creds(secret_name, region):
@@ -34,9 +35,3 @@ def format_date_time(timezone_id):
     time_zone = pytz.timezone(timezone_id)
     local_time = time_zone.localize(datetime.now())
     return local_time.strftime('%Y-%m-%d %H:%M')
-
-
-def decode_token(id_token):
-    # id_token = event['headers']['Authorization'].split()[1]
-    decoded_token = jwt.decode(id_token, algorithms="RS256", options={"verify_signature": False})
-    return decoded_token
\ No newline at end of file
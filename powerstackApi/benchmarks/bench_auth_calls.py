@@ -0,0 +1,140 @@
+"""
+    Remote calls per authentication flow, before and after the Cognito fast path.
+
+    A fake user pool answers the Cognito APIs (list_users pages hold 60 users, like the
+    real API), DynamoDB is served by FakeAWS. "listing" replays the old behaviour: one
+    list_users of the unconfirmed users ahead of every login and signup, on top of the
+    flow's own calls. With many unconfirmed users the real list_users is also the
+    slowest and most throttled of these calls.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_auth_calls.py [unconfirmed_users]
+"""
+import sys
+import json
+import datetime
+
+from fake_aws import FakeAWS, use_lambda, make_token
+
+use_lambda('users')
+
+LIST_USERS_PAGE = 60
+
+
+class FakeUserPool:
+    def __init__(self, fake, unconfirmed):
+        self.users = {}
+        for i in range(unconfirmed):
+            self.add(f'pending{i}', f'pending{i}@powerstack.ng', 'UNCONFIRMED')
+        self.add('ada', 'ada@powerstack.ng', 'CONFIRMED')
+        self.add('bola', 'bola@powerstack.ng', 'UNCONFIRMED')
+        fake.handlers.update({
+            'GetSecretValue': lambda params: {'SecretString': json.dumps({
+                'powerstack_pool_id': 'us-east-2_bench', 'powerstack_client_id': 'client',
+                'powerstack_client_secret': 'secret'})},
+            'AdminGetUser': self.admin_get_user,
+            'InitiateAuth': self.initiate_auth,
+            'SignUp': self.sign_up,
+            'AdminDeleteUser': self.admin_delete_user,
+            'ListUsers': self.list_users,
+        })
+
+    def add(self, username, email, status):
+        self.users[username] = {'Username': username, 'email': email, 'UserStatus': status}
+
+    def find(self, name):
+        # like Cognito, an email only resolves once it is a verified alias (confirmed users)
+        user = self.users.get(name)
+        return user or next((user for user in self.users.values()
+                             if user['email'] == name and user['UserStatus'] == 'CONFIRMED'), None)
+
+    def admin_get_user(self, params):
+        user = self.find(params['Username'])
+        if user is None:
+            return FakeAWS.error('UserNotFoundException', 'User does not exist.')
+        return {'Username': user['Username'], 'UserStatus': user['UserStatus'],
+                'UserAttributes': [{'Name': 'email', 'Value': user['email']}]}
+
+    def initiate_auth(self, params):
+        user = self.find(params['AuthParameters']['USERNAME'])
+        if user is None:
+            return FakeAWS.error('UserNotFoundException', 'User does not exist.')
+        if user['UserStatus'] == 'UNCONFIRMED':
+            return FakeAWS.error('UserNotConfirmedException', 'User is not confirmed.')
+        token = make_token(email=user['email'], **{'custom:userType': 'REGULAR'})
+        return {'AuthenticationResult': {'IdToken': token}}
+
+    def sign_up(self, params):
+        if params['Username'] in self.users:
+            return FakeAWS.error('UsernameExistsException', 'User already exists')
+        email = next(a['Value'] for a in params['UserAttributes'] if a['Name'] == 'email')
+        self.add(params['Username'], email, 'UNCONFIRMED')
+        return {'UserConfirmed': False, 'UserSub': params['Username']}
+
+    def admin_delete_user(self, params):
+        self.users.pop(params['Username'], None)
+        return {}
+
+    def list_users(self, params):
+        name, value = [part.strip().strip('"') for part in params['Filter'].split('=')]
+        field = {'cognito:user_status': 'UserStatus'}.get(name, name)
+        matched = [user for user in self.users.values() if user[field] == value]
+        start = int(params.get('PaginationToken') or 0)
+        page = matched[start:start + LIST_USERS_PAGE]
+        response = {'Users': [{
+            'Username': user['Username'], 'UserStatus': user['UserStatus'],
+            'UserCreateDate': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            'Attributes': [{'Name': 'email', 'Value': user['email']}]} for user in page]}
+        if start + LIST_USERS_PAGE < len(matched):
+            response['PaginationToken'] = str(start + LIST_USERS_PAGE)
+        return response
+
+
+def signup(username, email):
+    return {'username': username, 'password': 'Passw0rd!', 'email': email, 'phone_number': '+2348000000000',
+            'user_type': 'REGULAR', 'first_name': 'Bench', 'last_name': 'User'}
+
+
+def main():
+    unconfirmed = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with FakeAWS() as fake:
+        pool = FakeUserPool(fake, unconfirmed)
+        fake.put('powerstackUsers', {
+            'userID': {'S': 'user-ada'}, 'email': {'S': 'ada@powerstack.ng'}, 'userType': {'S': 'REGULAR'},
+            'walletBalance': {'N': '0'}, 'isActive': {'BOOL': True}, 'meters': {'L': []}
+        })
+        import authentication
+
+        flows = {
+            'login (username)': lambda: authentication.user_login({'username': 'ada', 'password': 'x'}),
+            'login (email)': lambda: authentication.user_login({'username': 'ada@powerstack.ng', 'password': 'x'}),
+            'login (unconfirmed)': lambda: authentication.get_id_token('bola', 'x'),
+            'login (pending email)': lambda: authentication.get_id_token('bola@powerstack.ng', 'x'),
+            'signup (new)': lambda: authentication.user_signup(signup('chidi', 'chidi@powerstack.ng')),
+            'signup (retry)': lambda: authentication.user_signup(signup('bola', 'bola@powerstack.ng')),
+        }
+
+        # first use loads the pool secret and the signing keys; count steady-state calls
+        authentication.user_login({'username': 'ada', 'password': 'x'})
+
+        print(f'{"flow":<22}{"listing":>9}{"fast path":>11}   calls')
+        for name, flow in flows.items():
+            pool.users.pop('chidi', None)
+            pool.add('bola', 'bola@powerstack.ng', 'UNCONFIRMED')
+            fake.reset_counts()
+            try:
+                flow()
+            except Exception as e:
+                if getattr(e, 'code', None) != 'IncompleteSignup':
+                    raise
+            calls = dict(fake.calls)
+            print(f'{name:<22}{sum(calls.values()) + 1:>9}{sum(calls.values()):>11}   {calls}')
+
+        fake.reset_counts()
+        import maintenance
+        swept = maintenance.sweep_unconfirmed_users(dry_run=True)
+        print(f'\nsweeper (dry run): {len(swept["deleted"])} stale unconfirmed users, {dict(fake.calls)}')
+
+
+if __name__ == '__main__':
+    main()
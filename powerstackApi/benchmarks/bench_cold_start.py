@@ -0,0 +1,93 @@
+"""
+    Cold start of the users and admin Lambdas: import app (the Lambda init phase) + the
+    first request, in a fresh interpreter per sample.
+
+    Without prewarming, `import app` is timed before anything else is loaded (the AWS fake
+    pulls in botocore and jwt itself), and the heavy third-party packages it brought in
+    are listed. With PREWARM_ON_INIT the init phase makes AWS calls, so it runs against
+    the fake too. Every AWS call gets a fixed latency standing in for the round trip
+    (Secrets Manager / DynamoDB from inside a Lambda is typically 20-60 ms).
+
+    Lightweight routes should load nothing heavy and make no calls; with prewarming the
+    first request should cost about what a warm one does.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_cold_start.py [latency_ms] [runs]
+"""
+import os
+import sys
+import json
+import subprocess
+import statistics
+
+CHILD = '''
+import os, sys, time, json
+sys.path.insert(0, os.path.join({api_dir!r}, {lambda_name!r}))
+HEAVY = ('boto3', 'botocore', 'requests', 'jwt', 'pytz', 'numpy', 'cryptography')
+prewarm = os.environ.get('PREWARM_ON_INIT') == 'true'
+heavy = []
+if not prewarm:
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    heavy = sorted(name for name in HEAVY if name in sys.modules)
+
+sys.path.insert(0, {bench_dir!r})
+from fake_aws import FakeAWS, use_lambda, make_token
+use_lambda({lambda_name!r})
+with FakeAWS(latency_ms={latency}) as fake:
+    fake.handlers['GetSecretValue'] = lambda params: {{'SecretString': json.dumps({{
+        'powerstack_pool_id': 'us-east-2_bench', 'powerstack_client_id': 'client',
+        'powerstack_client_secret': 'secret', 'paystack_secret_key': 'sk_bench'}})}}
+    fake.handlers['InitiateAuth'] = lambda params: {{'AuthenticationResult': {{'IdToken': make_token(email='bench@powerstack.ng')}}}}
+    if prewarm:
+        start = time.perf_counter()
+        import app
+        imported = time.perf_counter()
+    init_calls = sum(fake.calls.values())
+    fake.reset_counts()
+
+    event = {event!r}
+    if event.get('headers', {{}}).get('Authorization') == 'owner':
+        event['headers']['Authorization'] = 'Bearer ' + make_token(email='owner@powerstack.ng', **{{'custom:userType': 'OWNER'}})
+    first = time.perf_counter()
+    app.lambda_handler(event, None)
+    done = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'first_ms': (done - first) * 1000, 'heavy': heavy,
+                  'init_calls': init_calls, 'calls': dict(fake.calls)}}))
+'''
+
+EVENTS = {
+    ('users', '/user/hello'): {'httpMethod': 'GET', 'path': '/user/hello'},
+    ('users', '/user/receipt'): {'httpMethod': 'GET', 'path': '/user/receipt', 'queryStringParameters': {'txnRef': 'PST-1'}},
+    ('users', '/user/login'): {'httpMethod': 'POST', 'path': '/user/login', 'body': json.dumps({'username': 'bench', 'password': 'x'})},
+    ('admins', '/admin/hello'): {'httpMethod': 'GET', 'path': '/admin/hello'},
+    ('admins', '/admin/ticket'): {'httpMethod': 'GET', 'path': '/admin/ticket', 'headers': {'Authorization': 'owner'},
+                                  'queryStringParameters': {'ticket': 'TKT-1'}},
+}
+
+
+def cold_start(lambda_name, event, latency, prewarm):
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    code = CHILD.format(api_dir=os.path.dirname(bench_dir), bench_dir=bench_dir, lambda_name=lambda_name, latency=latency, event=event)
+    env = dict(os.environ, PREWARM_ON_INIT='true' if prewarm else 'false')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 40
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for prewarm in (False, True):
+        print(f'\nPREWARM_ON_INIT={str(prewarm).lower()}')
+        print(f'{"route":<18}{"init ms":>9}{"first req ms":>14}   loaded at import / init calls / calls during first request')
+        for (lambda_name, route), event in EVENTS.items():
+            samples = [cold_start(lambda_name, event, latency, prewarm) for _ in range(runs)]
+            import_ms = statistics.median(sample['import_ms'] for sample in samples)
+            first_ms = statistics.median(sample['first_ms'] for sample in samples)
+            last = samples[-1]
+            print(f'{route:<18}{import_ms:>9.1f}{first_ms:>14.1f}   {last["heavy"] or "-"} / {last["init_calls"]} / {last["calls"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+    DynamoDB resource builds and per-request latency for the dashboard and wallet-pay paths.
+
+    Compares the old behaviour (a fresh boto3.resource + Table on every db_utils call) with
+    the pooled per-container registry. Network calls are served by FakeAWS, so the numbers
+    isolate client construction cost; connection reuse saves a TLS handshake on top of this.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_db_registry.py [iterations]
+"""
+import sys
+import boto3
+
+from fake_aws import FakeAWS, CallCounter, use_lambda, make_token, timed
+
+use_lambda('users')
+
+from utils import db_utils  # noqa: E402
+import payment  # noqa: E402
+
+EMAIL = 'bench@powerstack.ng'
+TOKEN = make_token(email=EMAIL, phone_number='+2348000000000', **{'custom:userType': 'REGULAR'})
+WALLET_DATA = {'amount': 150000, 'meter_number': '0123456789', 'meter_type': 'PREPAID', 'meter_location': 'Lagos'}
+
+
+def legacy_get_resource():
+    return boto3.resource('dynamodb')
+
+
+def legacy_get_table(table_name):
+    return legacy_get_resource().Table(table_name)
+
+
+def seed(fake):
+    fake.tables.clear()
+    fake.put('powerstackUsers', {
+        'userID': {'S': 'user-1'}, 'email': {'S': EMAIL}, 'walletBalance': {'N': '1000000'},
+        'isActive': {'BOOL': True}, 'meters': {'L': []}
+    })
+
+
+def run_paths(fake, iterations):
+    results = {}
+    paths = {
+        'dashboard': lambda: payment.user_check(payment.decode_token(TOKEN)),
+        'walletPay': lambda: (seed(fake), payment.pay_with_wallet(payment.decode_token(TOKEN), WALLET_DATA)),
+    }
+    for name, path in paths.items():
+        seed(fake)
+        path()  # first call pays the one-off build in registry mode
+        fake.reset_counts()
+        with CallCounter(boto3.session.Session, 'resource') as builds:
+            latency = timed(path, iterations)
+        results[name] = (builds.count / iterations, sum(fake.calls.values()) / iterations, latency)
+    return results
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with FakeAWS() as fake:
+        # star imports copied the pooled functions into other modules (e.g. functions)
+        patched = [module for module in list(sys.modules.values())
+                   if getattr(module, 'get_table', None) is db_utils.get_table]
+        pooled = (db_utils.get_table, db_utils.get_dynamodb_resource)
+        for module in patched:
+            module.get_table, module.get_dynamodb_resource = legacy_get_table, legacy_get_resource
+        try:
+            legacy = run_paths(fake, iterations)
+        finally:
+            for module in patched:
+                module.get_table, module.get_dynamodb_resource = pooled
+        pooled = run_paths(fake, iterations)
+
+    print(f'{"path":<12}{"mode":<10}{"builds/req":>12}{"calls/req":>11}{"ms/req":>10}')
+    for name in legacy:
+        for mode, results in (('per-call', legacy), ('pooled', pooled)):
+            builds, calls, latency = results[name]
+            print(f'{name:<12}{mode:<10}{builds:>12.1f}{calls:>11.1f}{latency:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+    Sequential vs segmented parallel scan for full-table admin reads.
+
+    FakeAWS serves `page_items` items per Scan call with a fixed per-call latency, standing
+    in for DynamoDB's 1 MB pages, so the run time is dominated by round trips as it is in
+    a real full-table report.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_parallel_scan.py [items] [latency_ms]
+"""
+import sys
+import time
+
+from fake_aws import FakeAWS, use_lambda
+
+use_lambda('admins')
+
+from utils import db_utils  # noqa: E402
+
+TABLE = 'powerstackPurchases'
+
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+
+    with FakeAWS(latency_ms=latency_ms, page_items=500) as fake:
+        for i in range(item_count):
+            fake.put(TABLE, {'purchaseID': {'S': f'PST-{i:08d}'}, 'amount': {'S': '1500.0'}, 'txnType': {'S': 'Simple'}})
+
+        start = time.perf_counter()
+        sequential = sum(1 for _ in db_utils.scan_items(TABLE))
+        baseline = time.perf_counter() - start
+        print(f'{"sequential":<14}{sequential:>8} items{baseline * 1000:>10.0f} ms')
+
+        for segments in (2, 4, 8, 16):
+            start = time.perf_counter()
+            count = sum(1 for _ in db_utils.parallel_scan(TABLE, total_segments=segments))
+            elapsed = time.perf_counter() - start
+            print(f'{f"{segments} segments":<14}{count:>8} items{elapsed * 1000:>10.0f} ms{baseline / elapsed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+    Work per wallet-funding payment: confirmation by polling only vs by the Paystack webhook.
+
+    The client polls /user/confirmPay every couple of seconds while the customer pays, and
+    a few more times after. "polling" has no webhook, so like the old flow every poll
+    verifies with Paystack; "webhook" has Paystack deliver charge.success (twice, as it
+    does when an ack is lost) and the same polls become status reads. Either way the
+    wallet must be credited once per payment. Paystack verify is stubbed and counted,
+    DynamoDB is FakeAWS.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_payment_confirm.py [payments]
+"""
+import sys
+import hmac
+import json
+import hashlib
+
+from fake_aws import FakeAWS, use_lambda, timed
+
+use_lambda('users')
+
+import payment  # noqa: E402
+from utils import payment_utils  # noqa: E402
+
+EMAIL = 'bench@powerstack.ng'
+SECRET = 'sk_bench'
+POLLS_PENDING = 4    # polls while the customer is still paying
+POLLS_AFTER = 2      # polls after the charge went through
+
+
+def transaction(reference, status):
+    return {
+        'reference': reference, 'status': status, 'amount': 500000, 'fees': 7600,
+        'transaction_date': '2024-05-01T10:00:00.000Z', 'customer': {'email': EMAIL},
+        'metadata': json.dumps(json.dumps({'tx_type': 'Wallet', 'platform': 'paystack'}))
+    }
+
+
+class FakePaystack:
+    def __init__(self):
+        self.paid = set()
+        self.verifies = 0
+
+    def verify(self, reference):
+        self.verifies += 1
+        status = 'success' if reference in self.paid else 'ongoing'
+        return {'message': 'Verification successful', 'data': transaction(reference, status)}
+
+    def webhook_event(self, reference):
+        body = json.dumps({'event': 'charge.success', 'data': transaction(reference, 'success')})
+        signature = hmac.new(SECRET.encode(), body.encode(), hashlib.sha512).hexdigest()
+        return {'httpMethod': 'POST', 'path': '/user/paystackWebhook', 'body': body,
+                'headers': {'X-Paystack-Signature': signature}}
+
+
+def poll(reference):
+    try:
+        return payment.confirm_pay_with_platform({'txnRef': reference})
+    except payment.CustomException as e:
+        return e.code
+
+
+def new_purchase(fake, reference, legacy):
+    item = {'purchaseID': {'S': reference}, 'status': {'S': 'Initialized'}, 'tx_type': {'S': 'Wallet'}}
+    if not legacy:
+        item['initializedEpochMs'] = {'N': str(payment.epoch_ms_now())}
+    fake.put('powerstackPurchases', item)
+
+
+def run(fake, paystack, payments, mode):
+    fake.tables.clear()
+    fake.put('powerstackUsers', {'userID': {'S': 'user-1'}, 'email': {'S': EMAIL}, 'walletBalance': {'N': '0'}})
+    paystack.verifies = 0
+    fake.reset_counts()
+    counter = iter(range(payments))
+
+    def one_payment():
+        reference = f'PST-{mode}-{next(counter)}'
+        new_purchase(fake, reference, legacy=mode == 'polling')
+        for _ in range(POLLS_PENDING):
+            poll(reference)
+        paystack.paid.add(reference)
+        if mode == 'webhook':
+            for _ in range(2):
+                payment.paystack_webhook(paystack.webhook_event(reference))
+        for _ in range(POLLS_AFTER):
+            poll(reference)
+
+    ms = timed(one_payment, payments)
+    balance = fake.tables['powerstackUsers'][('user-1',)]['walletBalance']['N']
+    return ms, paystack.verifies / payments, sum(fake.calls.values()) / payments, balance
+
+
+def main():
+    payments = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    paystack = FakePaystack()
+    payment.paystack_confirm_payment = paystack.verify
+    payment_utils.payment_key = lambda name: SECRET
+
+    print(f"{payments} wallet fundings of 5,000 NGN, {POLLS_PENDING} polls while paying, {POLLS_AFTER} after\n")
+    print(f"{'mode':<10}{'ms/payment':>12}{'verifies/payment':>18}{'DynamoDB calls/payment':>24}{'wallet':>12}")
+    with FakeAWS() as fake:
+        for mode in ('polling', 'webhook'):
+            ms, verifies, calls, balance = run(fake, paystack, payments, mode)
+            print(f"{mode:<10}{ms:>12.2f}{verifies:>18.1f}{calls:>24.1f}{balance:>12}")
+    print(f"\nexpected wallet: {payments * 5000}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+    Paystack verify latency: a fresh connection per call vs the pooled keep-alive session.
+
+    A local HTTPS server (self-signed certificate) stands in for api.paystack.co and counts
+    the TLS connections it accepts. "per call" replays the old requests.get, which opens a
+    new TCP + TLS connection every time; "pooled" is paystack_confirm_payment on the shared
+    session. Loopback has no network round trip, so against the real API each saved
+    handshake is worth a few RTTs more than shown here.
+
+    The flaky run has the server answer 503 to every fifth call: the old code handed the
+    error page to the caller, the session retries it.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_payment_http.py [calls]
+"""
+import os
+import ssl
+import socket
+import sys
+import json
+import datetime
+import tempfile
+import ipaddress
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fake_aws import use_lambda, timed
+
+use_lambda('users')
+
+from utils import payment_utils  # noqa: E402
+
+
+def self_signed_cert(directory):
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+            .public_key(key.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), False)
+            .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class FakePaystack(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = {'connections': 0, 'requests': 0, 'fail_every': 0}
+
+    def setup(self):
+        FakePaystack.state['connections'] += 1
+        super().setup()
+        # headers and body go out as separate writes; don't let Nagle hold the body back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        FakePaystack.state['requests'] += 1
+        fail_every = FakePaystack.state['fail_every']
+        if fail_every and FakePaystack.state['requests'] % fail_every == 0:
+            status, body = 503, b'{"status": false, "message": "Service unavailable"}'
+        else:
+            status, body = 200, json.dumps({'status': True, 'data': {'status': 'success',
+                                            'reference': self.path.rsplit('/', 1)[-1]}}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cert_path, key_path = self_signed_cert(tempfile.mkdtemp())
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakePaystack)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    verify_url = f'https://127.0.0.1:{server.server_port}/transaction/verify/'
+    payment_utils.PST_CONFIRM_URL = verify_url
+    payment_utils.payment_key = lambda name: 'sk_bench'
+    os.environ['REQUESTS_CA_BUNDLE'] = cert_path
+    payment_utils.time.sleep = lambda seconds: None
+    headers = {'Authorization': 'Bearer sk_bench', 'content-type': 'application/json'}
+
+    def per_call():
+        return requests.get(verify_url + 'PST-1', headers=headers).json()
+
+    def pooled():
+        return payment_utils.paystack_confirm_payment('PST-1')
+
+    print(f"{calls} Paystack verify calls against a local HTTPS server\n")
+    print(f"{'mode':<10}{'flaky':>7}{'ms/call':>10}{'new TLS conns':>17}{'failed':>8}")
+    for fail_every in (0, 5):
+        for mode, fn in (('per call', per_call), ('pooled', pooled)):
+            FakePaystack.state.update(connections=0, requests=0, fail_every=fail_every)
+            failed = []
+            ms = timed(lambda: failed.append(not fn().get('status')), calls)
+            print(f"{mode:<10}{'yes' if fail_every else 'no':>7}{ms:>10.2f}"
+                  f"{FakePaystack.state['connections']:>17}{sum(failed):>8}")
+
+    stats = payment_utils.payment_metrics()['paystack.verify']
+    print(f"\npaystack.verify (pooled): {stats['calls']} requests, {stats['retries']} retried, "
+          f"avg {stats['avg_ms']} ms, max {stats['max_ms']:.1f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
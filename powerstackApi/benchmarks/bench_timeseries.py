@@ -0,0 +1,75 @@
+"""
+    Owner dashboard over a large window (daily, hourly and per-type daily series, a moving
+    average and amount percentiles): per-item Python accumulation vs the NumPy columnar
+    engine in admins/utils/timeseries.py. Rows are generated in memory so only the report
+    arithmetic is timed, not the table read.
+
+    Usage:
+        powerstackApi$ python benchmarks/bench_timeseries.py [purchases]
+"""
+import sys
+import random
+
+from fake_aws import use_lambda, timed
+
+use_lambda('admins')
+
+from utils import timeseries  # noqa: E402
+
+START_MS = 1704067200000  # 2024-01-01T00:00Z
+DAYS = 90
+
+
+def make_purchases(count):
+    rng = random.Random(7)
+    return [{
+        'purchaseEpochMs': START_MS + rng.randrange(DAYS * timeseries.DAY_MS),
+        'amount': f'{rng.uniform(500, 50000):.1f}',
+        'units': f'{rng.uniform(2, 300):.2f}',
+        'commission': f'{rng.uniform(0, 500):.2f}',
+        'txnType': rng.choice(['Simple', 'Wallet']),
+    } for _ in range(count)]
+
+
+def python_dashboard(items):
+    """ Same reports in plain Python: one pass for every bucketing, then a sort for percentiles. """
+    daily, hourly, by_type, amounts = {}, {}, {}, []
+    for item in items:
+        offset = int(item['purchaseEpochMs']) - START_MS
+        amount = float(item['amount'])
+        units = float(item['units'])
+        commission = float(item['commission'])
+        amounts.append(amount)
+        for buckets, key in ((daily, offset // timeseries.DAY_MS),
+                             (hourly, offset // timeseries.HOUR_MS),
+                             (by_type, (offset // timeseries.DAY_MS, item['txnType']))):
+            row = buckets.setdefault(key, [0, 0.0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += amount
+            row[2] += units
+            row[3] += commission
+    amounts.sort()
+    quantiles = {q: amounts[min(len(amounts) - 1, int(q / 100 * len(amounts)))] for q in timeseries.DEFAULT_PERCENTILES}
+    return daily, hourly, by_type, quantiles
+
+
+def numpy_dashboard(items):
+    end_ms = START_MS + DAYS * timeseries.DAY_MS - 1
+    columns = timeseries.columns_from_items(items)
+    daily = timeseries.histogram(columns, START_MS, end_ms, 'day')
+    hourly = timeseries.histogram(columns, START_MS, end_ms, 'hour')
+    by_type = timeseries.histogram(columns, START_MS, end_ms, 'day', by_type=True)
+    average = timeseries.moving_average(daily['naira_amount'], 7)
+    return daily, hourly, by_type, average, timeseries.percentiles(columns['amount'])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    items = make_purchases(count)
+    for name, fn in (('python', python_dashboard), ('numpy', numpy_dashboard)):
+        elapsed = timed(lambda: fn(items), 3)
+        print(f'{name:<8}{count:>8} purchases{elapsed:>10.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
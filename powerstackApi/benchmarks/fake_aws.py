@@ -0,0 +1,382 @@
+"""
+    In-memory stand-in for the AWS APIs the Lambdas call, used by the benchmarks.
+
+    Patches botocore's BaseClient._make_request, so clients and resources are still built
+    and (de)serialize through the real boto3 code path (that cost is part of what we
+    measure) but no request ever leaves the machine. Every API call is counted per operation.
+"""
+import os
+import re
+import sys
+import copy
+import json
+import decimal
+import time
+import collections
+
+import jwt
+import botocore.client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.dirname(BENCH_DIR)
+
+# ---------- TABLE KEYS ----------
+KEY_SCHEMA = {
+    'powerstackUsers': ['userID'],
+    'powerstackPurchases': ['purchaseID'],
+    'powerstackTickets': ['ticketID'],
+    'powerstackCounters': ['counterName'],
+    'powerstackRollups': ['rollupKey', 'bucket'],
+    'powerstackReportCache': ['cacheKey'],
+    'powerstackActivity': ['sketchKey'],
+}
+
+
+def use_lambda(name):
+    """ Puts users/ or admins/ on sys.path the same way the Lambda runtime does. """
+    for path in (os.path.join(API_DIR, 'users'), os.path.join(API_DIR, 'admins')):
+        if path in sys.path:
+            sys.path.remove(path)
+    sys.path.insert(0, os.path.join(API_DIR, name))
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-2')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+
+# ---------- TOKENS ----------
+BENCH_POOL_ID = 'us-east-2_bench'
+BENCH_CLIENT_ID = 'client'
+# served for every GetSecretValue: the pool secret and the payment keys in one
+BENCH_SECRET = {
+    'powerstack_pool_id': BENCH_POOL_ID, 'powerstack_client_id': BENCH_CLIENT_ID,
+    'powerstack_client_secret': 'secret', 'paystack_secret_key': 'sk_bench',
+}
+BENCH_KEY_ID = 'bench-key'
+_SIGNING_KEY = None
+
+
+def signing_key():
+    """ RSA key standing in for the user pool's; its public half is served as the JWKS. """
+    global _SIGNING_KEY
+    if _SIGNING_KEY is None:
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        _SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return _SIGNING_KEY
+
+
+def bench_jwks():
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(signing_key().public_key()))
+    public_jwk.update({'kid': BENCH_KEY_ID, 'use': 'sig', 'alg': 'RS256'})
+    return {'keys': [public_jwk]}
+
+
+def make_token(**claims):
+    """ A Cognito-shaped ID token signed with the benchmark pool key. """
+    claims.setdefault('exp', int(time.time()) + 3600)
+    claims.setdefault('iss', f'https://cognito-idp.us-east-2.amazonaws.com/{BENCH_POOL_ID}')
+    claims.setdefault('aud', BENCH_CLIENT_ID)
+    claims.setdefault('token_use', 'id')
+    return jwt.encode(claims, signing_key(), algorithm='RS256', headers={'kid': BENCH_KEY_ID})
+
+
+class FakeHTTPResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.raw = None
+        self.content = b''
+
+
+class FakeAWS:
+    def __init__(self, latency_ms=0.0, page_items=None):
+        self.latency = latency_ms / 1000.0
+        self.page_items = page_items  # stands in for the 1 MB scan page limit
+        self.unprocessed_every = False  # hand back half of every batch as unprocessed
+        self.tables = collections.defaultdict(dict)
+        self.calls = collections.Counter()
+        self.handlers = {}
+        self._positions = {}
+        self._original = None
+        self._original_fetch = None
+
+    # ---------- STORE ----------
+    def key_of(self, table_name, item):
+        names = KEY_SCHEMA.get(table_name) or [next(iter(item))]
+        return tuple(item[name]['S'] if 'S' in item[name] else item[name]['N'] for name in names)
+
+    def put(self, table_name, item):
+        """ Seeds an item given in low-level AttributeValue format. """
+        self.tables[table_name][self.key_of(table_name, item)] = item
+
+    def reset_counts(self):
+        self.calls.clear()
+
+    # ---------- API ----------
+    def _make_request(self, client, operation_model, request_dict, request_context):
+        operation_name = operation_model.name
+        self.calls[operation_name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        body = request_dict.get('body') or b'{}'
+        api_params = json.loads(body) if body[:1] in (b'{', '{') else {}
+        handler = self.handlers.get(operation_name) or getattr(self, f'op_{operation_name}', None)
+        parsed = handler(api_params) if handler else {}
+        parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': 200})
+        if 'Error' in parsed:
+            parsed['ResponseMetadata']['HTTPStatusCode'] = 400
+            return FakeHTTPResponse(400), parsed
+        return FakeHTTPResponse(200), parsed
+
+    @staticmethod
+    def error(code, message='', **extra):
+        return dict({'Error': {'Code': code, 'Message': message}}, **extra)
+
+    def op_Scan(self, params, matches=None):
+        """ Pages in insertion order, honouring Limit / ExclusiveStartKey (filters are ignored). """
+        table_name = params['TableName']
+        segment = (table_name, params.get('Segment', 0), params.get('TotalSegments', 1))
+        keys = self._ordered_keys(*segment)
+        start = 0
+        if params.get('ExclusiveStartKey'):
+            start = self._positions[segment][self.key_of(table_name, params['ExclusiveStartKey'])] + 1
+        page = min(params.get('Limit', len(keys)), self.page_items or len(keys))
+        end = min(start + page, len(keys))
+        examined = [self.tables[table_name][key] for key in keys[start:end]]
+        items = copy.deepcopy([item for item in examined if matches is None or matches(item)])
+
+        response = {'Count': len(items), 'ScannedCount': len(examined)}
+        if params.get('Select') != 'COUNT':
+            response['Items'] = items
+        if end < len(keys):
+            names = KEY_SCHEMA.get(table_name) or [next(iter(examined[-1]))]
+            response['LastEvaluatedKey'] = {name: examined[-1][name] for name in names}
+        return response
+
+    def _ordered_keys(self, table_name, segment, total_segments):
+        cache_key = (table_name, segment, total_segments)
+        keys = list(self.tables[table_name])[segment::total_segments]
+        if len(self._positions.get(cache_key, ())) != len(keys):
+            self._positions[cache_key] = {key: position for position, key in enumerate(keys)}
+        return keys
+
+    def op_Query(self, params):
+        """ A Scan limited to the items that match the key condition (= and BETWEEN). """
+        values = params.get('ExpressionAttributeValues', {})
+        names = params.get('ExpressionAttributeNames', {})
+        clauses = re.findall(r'([#\w]+) (?:= (:\w+)|BETWEEN (:\w+) AND (:\w+))', params.get('KeyConditionExpression', ''))
+
+        def matches(item):
+            for name, equal, low, high in clauses:
+                current = item.get(names.get(name, name))
+                if current is None:
+                    return False
+                if equal and current != values[equal]:
+                    return False
+                if low and not self._sort_value(values[low]) <= self._sort_value(current) <= self._sort_value(values[high]):
+                    return False
+            return True
+
+        return self.op_Scan(params, matches=matches)
+
+    @staticmethod
+    def _sort_value(value):
+        (kind, raw), = value.items()
+        return decimal.Decimal(raw) if kind == 'N' else raw
+
+    def op_GetItem(self, params):
+        table_name = params['TableName']
+        item = self.tables[table_name].get(self.key_of(table_name, params['Key']))
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def op_GetSecretValue(self, params):
+        return {'Name': params['SecretId'], 'SecretString': json.dumps(BENCH_SECRET)}
+
+    def op_DescribeTable(self, params):
+        names = KEY_SCHEMA.get(params['TableName'], ['id'])
+        return {'Table': {
+            'TableName': params['TableName'],
+            'KeySchema': [{'AttributeName': names[0], 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name in names]
+        }}
+
+    def op_PutItem(self, params):
+        table_name = params['TableName']
+        condition = params.get('ConditionExpression')
+        if condition and not self._condition_holds(
+                condition, self.tables[table_name].get(self.key_of(table_name, params['Item'])),
+                params.get('ExpressionAttributeValues', {}), params.get('ExpressionAttributeNames', {})):
+            return self.error('ConditionalCheckFailedException', 'The conditional request failed')
+        self.put(table_name, params['Item'])
+        return {}
+
+    def op_UpdateItem(self, params):
+        """ Understands the update shapes db_utils uses: SET a = :v, ADD a :v, and simple conditions. """
+        table_name = params['TableName']
+        key = self.key_of(table_name, params['Key'])
+        item = self.tables[table_name].get(key)
+        values = params.get('ExpressionAttributeValues', {})
+        names = params.get('ExpressionAttributeNames', {})
+
+        condition = params.get('ConditionExpression')
+        if condition and not self._condition_holds(condition, item, values, names):
+            return self.error('ConditionalCheckFailedException', 'The conditional request failed')
+
+        item = copy.deepcopy(item) if item else copy.deepcopy(params['Key'])
+        updated = {}
+        expression = params['UpdateExpression']
+        action, _, clauses = expression.partition(' ')
+        for clause in clauses.split(','):
+            if action == 'SET':
+                name, _, value = [part.strip() for part in clause.partition('=')]
+                name = names.get(name, name)
+                item[name] = values[value] if value in values else item.get(name)
+            elif action == 'ADD':
+                name, value = clause.split()
+                name = names.get(name, name)
+                current = item.get(name, {'N': '0'})
+                if 'N' not in current:
+                    return self.error('ValidationException', 'An operand in the update expression has an incorrect data type')
+                item[name] = {'N': str(decimal.Decimal(current['N']) + decimal.Decimal(values[value]['N']))}
+            updated[name] = item[name]
+        self.tables[table_name][key] = item
+
+        if params.get('ReturnValues') == 'UPDATED_NEW':
+            return {'Attributes': copy.deepcopy(updated)}
+        return {}
+
+    def op_BatchGetItem(self, params):
+        responses, unprocessed = {}, {}
+        for table_name, request in params['RequestItems'].items():
+            keys = request['Keys']
+            if self.unprocessed_every and len(keys) > 1:
+                keys, left = keys[::2], keys[1::2]
+                unprocessed[table_name] = dict(request, Keys=left)
+            found = [self.tables[table_name].get(self.key_of(table_name, key)) for key in keys]
+            responses[table_name] = copy.deepcopy([item for item in found if item])
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def op_BatchWriteItem(self, params):
+        unprocessed = {}
+        for table_name, requests in params['RequestItems'].items():
+            if self.unprocessed_every and len(requests) > 1:
+                requests, unprocessed[table_name] = requests[::2], requests[1::2]
+            for request in requests:
+                if 'PutRequest' in request:
+                    self.put(table_name, request['PutRequest']['Item'])
+                else:
+                    self.tables[table_name].pop(self.key_of(table_name, request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': unprocessed}
+
+    def op_TransactWriteItems(self, params):
+        reasons, failed = [], False
+        for entry in params['TransactItems']:
+            (kind, request), = entry.items()
+            table_name = request['TableName']
+            key = self.key_of(table_name, request.get('Key') or request['Item'])
+            condition = request.get('ConditionExpression')
+            holds = not condition or self._condition_holds(
+                condition, self.tables[table_name].get(key),
+                request.get('ExpressionAttributeValues', {}), request.get('ExpressionAttributeNames', {}))
+            reason = 'None' if holds else 'ConditionalCheckFailed'
+            if holds and kind == 'Update' and request['UpdateExpression'].startswith('ADD '):
+                # ADD to a non-number cancels the whole transaction
+                names = request.get('ExpressionAttributeNames', {})
+                item = self.tables[table_name].get(key) or {}
+                for clause in request['UpdateExpression'][4:].split(','):
+                    current = item.get(names.get(clause.split()[0], clause.split()[0]))
+                    if current is not None and 'N' not in current:
+                        reason = 'ValidationError'
+            reasons.append({'Code': reason})
+            failed = failed or reason != 'None'
+        if failed:
+            return self.error('TransactionCanceledException', 'Transaction cancelled', CancellationReasons=reasons)
+
+        for entry in params['TransactItems']:
+            (kind, request), = entry.items()
+            request = dict(request)
+            request.pop('ConditionExpression', None)
+            if kind == 'Put':
+                self.op_PutItem(request)
+            elif kind == 'Update':
+                self.op_UpdateItem(request)
+        return {}
+
+    def _condition_holds(self, condition, item, values, names):
+        for clause in condition.split(' AND '):
+            clause = clause.strip()
+            if clause.startswith('attribute_exists('):
+                if not item or clause[17:-1] not in item:
+                    return False
+            elif clause.startswith('attribute_not_exists('):
+                if item and clause[21:-1] in item:
+                    return False
+            else:
+                name, operator, value = clause.split()
+                name = names.get(name, name)
+                current, expected = (item or {}).get(name), values[value]
+                if current is None or set(current) != set(expected):
+                    return False
+                (kind, left), (_, right) = next(iter(current.items())), next(iter(expected.items()))
+                if kind == 'N':
+                    left, right = decimal.Decimal(left), decimal.Decimal(right)
+                if not {'=': left == right, '>=': left >= right, '<=': left <= right,
+                        '>': left > right, '<': left < right, '<>': left != right}[operator]:
+                    return False
+        return True
+
+    # ---------- PATCHING ----------
+    def __enter__(self):
+        fake = self
+        self._original = botocore.client.BaseClient._make_request
+
+        def _make_request(client, operation_model, request_dict, request_context):
+            return fake._make_request(client, operation_model, request_dict, request_context)
+
+        botocore.client.BaseClient._make_request = _make_request
+
+        # JWKS downloads are plain HTTPS, not botocore; serve and count them here
+        self._original_fetch = jwt.PyJWKClient.fetch_data
+
+        def fetch_data(client):
+            fake.calls['GetJWKS'] += 1
+            return bench_jwks()
+
+        jwt.PyJWKClient.fetch_data = fetch_data
+        return self
+
+    def __exit__(self, *exc):
+        botocore.client.BaseClient._make_request = self._original
+        jwt.PyJWKClient.fetch_data = self._original_fetch
+        return False
+
+
+class CallCounter:
+    """ Counts calls to a callable attribute while it is patched in place. """
+    def __init__(self, owner, attribute):
+        self.owner = owner
+        self.attribute = attribute
+        self.count = 0
+        self._original = getattr(owner, attribute)
+
+    def __enter__(self):
+        counter = self
+        original = self._original
+
+        def wrapper(*args, **kwargs):
+            counter.count += 1
+            return original(*args, **kwargs)
+
+        setattr(self.owner, self.attribute, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        setattr(self.owner, self.attribute, self._original)
+        return False
+
+
+def timed(fn, iterations):
+    """ Runs fn `iterations` times, returns mean latency in ms. """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
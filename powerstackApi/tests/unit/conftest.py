@@ -0,0 +1,54 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from fake_aws import FakeAWS  # noqa: E402
+
+# top-level module names users/ and admins/ both use, with different contents
+LAMBDA_MODULES = {'utils', 'functions', 'payment', 'authentication', 'maintenance', 'app',
+                  'analytics', 'rollups', 'backfill', 'transfers', 'activity'}
+
+
+def _lambda_module_names():
+    return [name for name in sys.modules if name.split('.')[0] in LAMBDA_MODULES]
+
+
+@pytest.fixture
+def load_lambda(monkeypatch):
+    """
+    Imports modules fresh from users/ or admins/, the way that Lambda sees them, e.g.
+    load_lambda('users', 'payment'). Both Lambdas have a utils package and a functions
+    module, so whatever an earlier test imported is set aside and put back afterwards.
+    """
+    for name, value in (('AWS_DEFAULT_REGION', 'us-east-2'), ('AWS_ACCESS_KEY_ID', 'test'),
+                        ('AWS_SECRET_ACCESS_KEY', 'test')):
+        monkeypatch.setenv(name, value)
+    saved_path = list(sys.path)
+    saved_modules = {name: sys.modules.pop(name) for name in _lambda_module_names()}
+
+    def load(lambda_name, *modules):
+        for name in _lambda_module_names():
+            del sys.modules[name]
+        sys.path[:] = [path for path in saved_path
+                       if os.path.basename(os.path.normpath(path)) not in ('users', 'admins')]
+        sys.path.insert(0, os.path.abspath(os.path.join(ROOT, lambda_name)))
+        loaded = [importlib.import_module(module) for module in modules]
+        return loaded[0] if len(loaded) == 1 else loaded
+
+    yield load
+    for name in _lambda_module_names():
+        del sys.modules[name]
+    sys.modules.update(saved_modules)
+    sys.path[:] = saved_path
+
+
+@pytest.fixture
+def aws():
+    """ In-memory DynamoDB (benchmarks/fake_aws.py); every API call is counted in aws.calls. """
+    with FakeAWS() as fake:
+        yield fake
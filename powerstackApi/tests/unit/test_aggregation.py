@@ -0,0 +1,51 @@
+def test_all_metrics_and_groups_in_one_pass(load_lambda):
+    db_utils = load_lambda('admins', 'utils.db_utils')
+    purchases = iter([
+        {'txnType': 'Simple', 'amount': '1000.0', 'units': '5.5', 'serviceFee': '100.0'},
+        {'txnType': 'Wallet', 'amount': '2000.0', 'units': '11', 'commission': '20.0'},
+        {'txnType': 'Simple', 'amount': '500.0', 'units': 'n/a'},
+    ])
+
+    groups = db_utils.aggregate_items(purchases, group_by='txnType')
+
+    assert groups['Simple']['purchase_count'] == 2
+    assert groups['Simple']['naira_amount'] == 1500.0
+    assert groups['Simple']['units_sold'] == 5.5
+    assert groups['Simple']['service_fees'] == 100.0
+    assert groups['Wallet']['commission_paid_out'] == 20.0
+
+
+def test_ungrouped_totals(load_lambda):
+    db_utils = load_lambda('admins', 'utils.db_utils')
+    totals = db_utils.aggregate_items([{'amount': '10'}, {'amount': '2.5'}])
+
+    assert totals == {db_utils.UNGROUPED: {
+        'purchase_count': 2, 'naira_amount': 12.5, 'units_sold': 0.0,
+        'commission_paid_out': 0.0, 'service_fees': 0.0, 'platform_fees': 0.0,
+    }}
+
+
+def test_window_without_type_is_scanned_not_queried(aws, load_lambda):
+    db = load_lambda('admins', 'utils.db_utils')
+    aws.put('powerstackPurchases', {'purchaseID': {'S': 'PST-1'}, 'txnType': {'S': 'Simple'},
+                                    'purchaseEpochMs': {'N': '1704096000000'}})
+
+    untyped = db.analytics('powerstackPurchases', 'txnType', None, 'purchaseDate', '2024-01-01 00:00', '2024-01-01 23:59')
+    assert untyped['Count'] == 1
+    assert aws.calls['Query'] == 0
+
+    db.analytics('powerstackPurchases', 'txnType', 'Simple', 'purchaseDate', '2024-01-01 00:00', '2024-01-01 23:59')
+    assert aws.calls['Query'] == 1
+
+
+def test_days_are_totalled_separately(aws, load_lambda):
+    db = load_lambda('admins', 'utils.db_utils')
+    for purchase_id, epoch_ms, amount in (('PST-1', 1704096000000, '100'), ('PST-2', 1704099600000, '50'),
+                                          ('PST-3', 1704196800000, '25')):
+        aws.put('powerstackPurchases', {'purchaseID': {'S': purchase_id}, 'txnType': {'S': 'Simple'},
+                                        'amount': {'N': amount}, 'purchaseEpochMs': {'N': str(epoch_ms)}})
+
+    days = db.aggregate_by_day('powerstackPurchases', 'purchaseDate', [('2024-01-01 00:00', '2024-01-02 23:59')])
+
+    assert {day: totals[db.UNGROUPED]['purchase_count'] for day, totals in days.items()} == {'2024-01-01': 2, '2024-01-02': 1}
+    assert days['2024-01-01'][db.UNGROUPED]['naira_amount'] == 150.0
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+from fake_aws import FakeAWS, make_token
+
+
+class FakeUserPool:
+    """
+    Answers the Cognito calls authentication.py makes. Like the real pool, admin_get_user
+    resolves an email only once it is a verified alias, i.e. for confirmed users.
+    """
+    def __init__(self, aws):
+        self.users = {}
+        aws.handlers.update({
+            'GetSecretValue': lambda params: {'SecretString': json.dumps({
+                'powerstack_pool_id': 'us-east-2_test', 'powerstack_client_id': 'client',
+                'powerstack_client_secret': 'secret'})},
+            'AdminGetUser': self.admin_get_user,
+            'InitiateAuth': self.initiate_auth,
+            'SignUp': self.sign_up,
+            'AdminDeleteUser': self.admin_delete_user,
+            'ListUsers': self.list_users,
+        })
+
+    def add(self, username, email, status):
+        self.users[username] = {'Username': username, 'email': email, 'UserStatus': status}
+
+    def find(self, name):
+        user = self.users.get(name)
+        return user or next((user for user in self.users.values()
+                             if user['email'] == name and user['UserStatus'] == 'CONFIRMED'), None)
+
+    def admin_get_user(self, params):
+        user = self.find(params['Username'])
+        if user is None:
+            return FakeAWS.error('UserNotFoundException', 'User does not exist.')
+        return {'Username': user['Username'], 'UserStatus': user['UserStatus'],
+                'UserAttributes': [{'Name': 'email', 'Value': user['email']}]}
+
+    def initiate_auth(self, params):
+        user = self.find(params['AuthParameters']['USERNAME'])
+        if user is None:
+            return FakeAWS.error('UserNotFoundException', 'User does not exist.')
+        if user['UserStatus'] == 'UNCONFIRMED':
+            return FakeAWS.error('UserNotConfirmedException', 'User is not confirmed.')
+        return {'AuthenticationResult': {'IdToken': make_token(email=user['email'])}}
+
+    def sign_up(self, params):
+        if params['Username'] in self.users:
+            return FakeAWS.error('UsernameExistsException', 'User already exists')
+        email = next(a['Value'] for a in params['UserAttributes'] if a['Name'] == 'email')
+        self.add(params['Username'], email, 'UNCONFIRMED')
+        return {'UserConfirmed': False, 'UserSub': params['Username']}
+
+    def admin_delete_user(self, params):
+        self.users.pop(params['Username'], None)
+        return {}
+
+    def list_users(self, params):
+        # Filter is 'attribute = "value"'
+        name, value = [part.strip().strip('"') for part in params['Filter'].split('=')]
+        field = {'cognito:user_status': 'UserStatus'}.get(name, name)
+        return {'Users': [{'Username': user['Username'], 'UserStatus': user['UserStatus'],
+                           'Attributes': [{'Name': 'email', 'Value': user['email']}]}
+                          for user in self.users.values() if user[field] == value]}
+
+
+@pytest.fixture
+def pool(aws):
+    return FakeUserPool(aws)
+
+
+@pytest.fixture
+def authentication(aws, pool, load_lambda):
+    module = load_lambda('users', 'authentication')
+    aws.reset_counts()
+    return module
+
+
+def signup(username, email):
+    return {'username': username, 'password': 'Passw0rd!', 'email': email, 'phone_number': '+2348000000000',
+            'user_type': 'REGULAR', 'first_name': 'Test', 'last_name': 'User'}
+
+
+def test_username_login_goes_straight_to_initiate_auth(aws, pool, authentication):
+    pool.add('ada', 'ada@powerstack.ng', 'CONFIRMED')
+
+    assert authentication.get_id_token('ada', 'x')
+    assert aws.calls['InitiateAuth'] == 1
+    assert aws.calls['AdminGetUser'] + aws.calls['ListUsers'] == 0
+
+
+def test_unconfirmed_username_is_incomplete_signup(aws, pool, authentication):
+    pool.add('bola', 'bola@powerstack.ng', 'UNCONFIRMED')
+
+    with pytest.raises(authentication.IncompleteSignupException):
+        authentication.get_id_token('bola', 'x')
+    assert aws.calls['ListUsers'] == 0
+
+
+def test_email_login_resolves_the_username(aws, pool, authentication):
+    pool.add('ada', 'ada@powerstack.ng', 'CONFIRMED')
+
+    assert authentication.get_id_token('ada@powerstack.ng', 'x')
+    assert aws.calls['InitiateAuth'] == 1
+    assert aws.calls['ListUsers'] == 0
+
+
+def test_signup_with_a_confirmed_email_is_rejected(aws, pool, authentication):
+    pool.add('ada', 'ada@powerstack.ng', 'CONFIRMED')
+
+    with pytest.raises(authentication.AccountExistsException):
+        authentication.user_signup(signup('ada2', 'ada@powerstack.ng'))
+    assert aws.calls['SignUp'] == 0
+
+
+def test_signup_replaces_an_unconfirmed_username(aws, pool, authentication):
+    pool.add('bola', 'old@powerstack.ng', 'UNCONFIRMED')
+
+    authentication.user_signup(signup('bola', 'bola@powerstack.ng'))
+
+    assert pool.users['bola']['email'] == 'bola@powerstack.ng'
+    assert aws.calls['AdminDeleteUser'] == 1
+    assert aws.calls['SignUp'] == 2
+
+
+def test_unverified_email_login_is_incomplete_signup(aws, pool, authentication):
+    pool.add('bola', 'bola@powerstack.ng', 'UNCONFIRMED')
+
+    with pytest.raises(authentication.IncompleteSignupException):
+        authentication.get_id_token('bola@powerstack.ng', 'x')
+    assert aws.calls['InitiateAuth'] == 0
+
+
+def test_unknown_email_login_is_user_not_found(aws, pool, authentication):
+    with pytest.raises(authentication.UserNotFoundException):
+        authentication.get_id_token('nobody@powerstack.ng', 'x')
+
+
+def test_signup_replaces_an_unconfirmed_email(aws, pool, authentication):
+    pool.add('bola-old', 'bola@powerstack.ng', 'UNCONFIRMED')
+
+    authentication.user_signup(signup('bola', 'bola@powerstack.ng'))
+
+    assert 'bola-old' not in pool.users
+    assert pool.users['bola']['email'] == 'bola@powerstack.ng'
+    assert aws.calls['SignUp'] == 1
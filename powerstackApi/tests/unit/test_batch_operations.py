@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def db(aws, load_lambda, monkeypatch):
+    db = load_lambda('admins', 'utils.db_utils')
+    sleeps = []
+    monkeypatch.setattr(db.time, 'sleep', sleeps.append)
+    db.sleeps = sleeps
+    aws.unprocessed_every = True  # half of every batch comes back unprocessed
+    return db
+
+
+def test_unprocessed_items_are_retried_with_backoff(db, aws):
+    tickets = [{'ticketID': f'PST-{number}', 'ticketStatus': 'NEW'} for number in range(10)]
+
+    assert db.batch_write_items('powerstackTickets', put_items=tickets) == 10
+    assert len(aws.tables['powerstackTickets']) == 10
+    assert aws.calls['BatchWriteItem'] == 4  # 10 -> 5 -> 2 -> 1 left
+    assert len(db.sleeps) == 3
+
+    found = db.batch_get_items('powerstackTickets', [{'ticketID': ticket['ticketID']} for ticket in tickets])
+    assert sorted(item['ticketID'] for item in found) == sorted(ticket['ticketID'] for ticket in tickets)
+
+
+def test_gives_up_after_max_retries(db, monkeypatch):
+    monkeypatch.setattr(db, 'MAX_BATCH_RETRIES', 1)
+    tickets = [{'ticketID': f'PST-{number}'} for number in range(10)]
+
+    with pytest.raises(db.CustomException) as error:
+        db.batch_write_items('powerstackTickets', put_items=tickets)
+    assert error.value.code == 'BatchIncomplete'
@@ -0,0 +1,75 @@
+import json
+import time
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def config_utils(load_lambda):
+    return load_lambda('users', 'utils.config_utils')
+
+
+@pytest.fixture
+def secrets(monkeypatch, config_utils):
+    """ A fake Secrets Manager: state['value'] is served, every fetch is counted. """
+    state = {'value': {'paystack_secret_key': 'sk_1'}, 'fetches': 0, 'delay': 0, 'fail': False}
+
+    def fetch(secret_name):
+        state['fetches'] += 1
+        time.sleep(state['delay'])
+        if state['fail']:
+            raise RuntimeError('(ThrottlingException) Rate exceeded: slow down')
+        return json.dumps(state['value'])
+
+    monkeypatch.setattr(config_utils, '_fetch_secret', fetch)
+    config_utils._SECRETS.clear()
+    return state
+
+
+def wait_for_refresh(config_utils, name):
+    for _ in range(200):
+        if name not in config_utils._REFRESHING:
+            return
+        time.sleep(0.01)
+
+
+def test_concurrent_first_loads_share_one_fetch(config_utils, secrets):
+    secrets['delay'] = 0.05
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(config_utils.payment_key('paystack_secret_key'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['sk_1'] * 8
+    assert secrets['fetches'] == 1
+
+
+def test_refresh_ahead_serves_cached_value_and_updates_in_background(config_utils, secrets, monkeypatch):
+    config_utils.get_secret_json('powerstack_payments')
+    name, (expires_at, raw, parsed) = next(iter(config_utils._SECRETS.items()))
+    config_utils._SECRETS[name] = (time.monotonic() + 1, raw, parsed)  # inside the refresh window
+    secrets['value'] = {'paystack_secret_key': 'sk_2'}
+
+    assert config_utils.payment_key('paystack_secret_key') == 'sk_1'
+    wait_for_refresh(config_utils, name)
+    assert config_utils.payment_key('paystack_secret_key') == 'sk_2'
+    assert secrets['fetches'] == 2
+
+
+def test_failed_refresh_keeps_last_good_value(config_utils, secrets):
+    config_utils.get_secret_json('powerstack_payments')
+    name, (expires_at, raw, parsed) = next(iter(config_utils._SECRETS.items()))
+    config_utils._SECRETS[name] = (time.monotonic() - 1, raw, parsed)  # expired
+    secrets['fail'] = True
+
+    assert config_utils.payment_key('paystack_secret_key') == 'sk_1'
+
+
+def test_first_load_failure_is_reported(config_utils, secrets):
+    secrets['fail'] = True
+    with pytest.raises(config_utils.CustomException) as error:
+        config_utils.get_secret_json('powerstack_pool')
+    assert error.value.code == 'ThrottlingException'
@@ -0,0 +1,47 @@
+import base64
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def db(aws, load_lambda):
+    return load_lambda('admins', 'utils.db_utils')
+
+
+def test_cursor_round_trip(db):
+    key = {'ticketID': 'PST-7', 'purchaseEpochMs': Decimal('1704096000000')}
+
+    assert db.decode_cursor(db.encode_cursor(key)) == key
+    assert db.encode_cursor(None) is None and db.decode_cursor('') is None
+
+
+@pytest.mark.parametrize('token', ['not a cursor', base64.urlsafe_b64encode(b'{"ticketID": "PST-7"}').decode()])
+def test_tampered_cursor_is_rejected(db, token):
+    with pytest.raises(db.InvalidCursorException):
+        db.decode_cursor(token)
+
+
+def test_page_size_bounds(db):
+    assert db.parse_page_size(None) == db.DEFAULT_PAGE_SIZE
+    assert db.parse_page_size('0') == 1
+    assert db.parse_page_size(10 ** 6) == db.MAX_PAGE_SIZE
+    with pytest.raises(db.CustomException) as error:
+        db.parse_page_size('ten')
+    assert error.value.code == 'InvalidPageSize'
+
+
+def test_pages_cover_the_table_once(db, aws):
+    for number in range(7):
+        aws.put('powerstackTickets', {'ticketID': {'S': f'PST-{number}'}, 'ticketStatus': {'S': 'NEW'}})
+
+    seen, sizes, token = [], [], None
+    while True:
+        items, token = db.scan_page('powerstackTickets', limit=3, next_token=token)
+        seen += [item['ticketID'] for item in items]
+        sizes.append(len(items))
+        if token is None:
+            break
+
+    assert sizes == [3, 3, 1]
+    assert sorted(seen) == [f'PST-{number}' for number in range(7)]
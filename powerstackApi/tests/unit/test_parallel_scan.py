@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture
+def db(aws, load_lambda, monkeypatch):
+    db = load_lambda('admins', 'utils.db_utils')
+    monkeypatch.setattr(db.time, 'sleep', lambda seconds: None)
+    aws.page_items = 2  # several pages per segment
+    for number in range(25):
+        aws.put('powerstackTickets', {'ticketID': {'S': f'PST-{number}'}, 'ticketStatus': {'S': 'NEW'}})
+    return db
+
+
+def test_every_item_once_across_segments(db, aws):
+    segments = []
+    aws.handlers['Scan'] = lambda params: segments.append((params['Segment'], params['TotalSegments'])) or aws.op_Scan(params)
+
+    tickets = list(db.parallel_scan('powerstackTickets', total_segments=4))
+
+    assert sorted(ticket['ticketID'] for ticket in tickets) == sorted(f'PST-{number}' for number in range(25))
+    assert {segment for segment, _ in segments} == {0, 1, 2, 3}
+    assert all(total == 4 for _, total in segments)
+
+
+def test_throttled_pages_are_retried(db, aws):
+    throttled = []
+
+    def scan(params):
+        if not throttled:
+            throttled.append(params['Segment'])
+            return aws.error('ProvisionedThroughputExceededException', 'Slow down')
+        return aws.op_Scan(params)
+
+    aws.handlers['Scan'] = scan
+    assert len(list(db.parallel_scan('powerstackTickets', total_segments=2))) == 25
+
+
+def test_segment_errors_reach_the_caller(db, aws):
+    aws.handlers['Scan'] = lambda params: aws.error('ResourceNotFoundException', 'No table')
+
+    with pytest.raises(db.ClientError):
+        list(db.parallel_scan('powerstackTickets', total_segments=2))
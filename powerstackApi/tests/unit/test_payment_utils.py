@@ -0,0 +1,122 @@
+import hmac
+import json
+import hashlib
+import logging
+
+import pytest
+import requests
+
+
+class FakeSession:
+    """ Plays back outcomes in order: an int is a response status, an exception is raised. """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        return response
+
+
+@pytest.fixture
+def payment_utils(load_lambda):
+    return load_lambda('users', 'utils.payment_utils')
+
+
+@pytest.fixture
+def session(monkeypatch, payment_utils):
+    sleeps = []
+    monkeypatch.setattr(payment_utils.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(payment_utils, '_PAYMENT_METRICS', {})
+
+    def use(*outcomes):
+        fake = FakeSession(*outcomes)
+        fake.sleeps = sleeps
+        monkeypatch.setattr(payment_utils, 'get_payment_session', lambda: fake)
+        return fake
+    return use
+
+
+def test_idempotent_calls_retry_with_bounded_jittered_backoff(payment_utils, session):
+    fake = session(requests.exceptions.ReadTimeout(), 503, 200)
+
+    response = payment_utils.payment_request('GET', 'https://pay/verify/1', 'paystack.verify', idempotent=True)
+
+    assert response.status_code == 200
+    assert len(fake.calls) == 3
+    assert all(call[2]['timeout'] == (payment_utils.PAYMENT_CONNECT_TIMEOUT, payment_utils.PAYMENT_READ_TIMEOUT)
+               for call in fake.calls)
+    assert len(fake.sleeps) == 2
+    assert all(0 <= delay <= payment_utils.PAYMENT_RETRY_MAX_DELAY for delay in fake.sleeps)
+    stats = payment_utils.payment_metrics()['paystack.verify']
+    assert (stats['calls'], stats['retries'], stats['errors']) == (3, 2, 0)
+
+
+def test_retries_stop_at_max_attempts(payment_utils, session):
+    fake = session(*[502] * payment_utils.PAYMENT_MAX_ATTEMPTS)
+
+    response = payment_utils.payment_request('GET', 'https://pay/verify/1', 'paystack.verify', idempotent=True)
+
+    assert response.status_code == 502
+    assert len(fake.calls) == payment_utils.PAYMENT_MAX_ATTEMPTS
+    assert payment_utils.payment_metrics()['paystack.verify']['errors'] == 1
+
+
+def test_non_idempotent_calls_only_retry_unopened_connections(payment_utils, session):
+    fake = session(requests.exceptions.ConnectTimeout(), 503)
+    response = payment_utils.payment_request('POST', 'https://pay/init', 'paystack.initialize')
+    assert response.status_code == 503
+    assert len(fake.calls) == 2
+
+    fake = session(requests.exceptions.ReadTimeout(), 200)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        payment_utils.payment_request('POST', 'https://pay/init', 'paystack.initialize')
+    assert len(fake.calls) == 1
+
+
+def test_session_is_shared_and_pooled(payment_utils, monkeypatch):
+    monkeypatch.setattr(payment_utils, '_PAYMENT_SESSION', None)
+
+    session = payment_utils.get_payment_session()
+
+    assert payment_utils.get_payment_session() is session
+    adapter = session.get_adapter(payment_utils.PST_INIT_URL)
+    assert adapter._pool_maxsize == payment_utils.PAYMENT_POOL_SIZE
+    assert adapter.max_retries.total == 0
+
+
+def test_paystack_signature_is_hmac_sha512_of_the_raw_body(payment_utils, monkeypatch):
+    monkeypatch.setattr(payment_utils, 'payment_key', lambda name: 'sk_test')
+    body = b'{"event": "charge.success", "data": {"reference": "PST-1"}}'
+    signature = hmac.new(b'sk_test', body, hashlib.sha512).hexdigest()
+
+    assert payment_utils.paystack_signature_valid(body, signature)
+    assert not payment_utils.paystack_signature_valid(body.replace(b'PST-1', b'PST-2'), signature)
+    assert not payment_utils.paystack_signature_valid(body, None)
+
+
+def test_metrics_are_logged_as_bare_emf_at_the_configured_level(payment_utils, monkeypatch):
+    lines = []
+    handler = logging.Handler()
+    handler.emit = lambda record: lines.append((record.levelno, handler.format(record)))
+    monkeypatch.setattr(payment_utils.metrics_logger, 'handlers', [handler])
+    monkeypatch.setattr(payment_utils, 'EMIT_PAYMENT_METRICS', True)
+    monkeypatch.setattr(payment_utils, '_PAYMENT_METRICS', {})
+
+    payment_utils.record_payment_call('paystack.verify', 12.34, 'ok')
+    monkeypatch.setattr(payment_utils, 'PAYMENT_METRICS_LOG_LEVEL', logging.DEBUG)
+    payment_utils.record_payment_call('paystack.verify', 5.0, 'ok')
+
+    assert len(lines) == 1
+    level, line = lines[0]
+    assert level == logging.INFO
+    metric = json.loads(line)
+    assert (metric['Endpoint'], metric['Latency']) == ('paystack.verify', 12.3)
+    assert metric['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'Powerstack/Payments'
+    assert payment_utils.payment_metrics()['paystack.verify']['calls'] == 2
@@ -0,0 +1,74 @@
+import hmac
+import json
+import hashlib
+
+import pytest
+
+SECRET = 'sk_test'
+EMAIL = 'user@powerstack.ng'
+
+
+@pytest.fixture
+def payment(aws, load_lambda, monkeypatch):
+    payment, payment_utils = load_lambda('users', 'payment', 'utils.payment_utils')
+    monkeypatch.setattr(payment_utils, 'payment_key', lambda name: SECRET)
+    aws.put('powerstackUsers', {'userID': {'S': 'user-1'}, 'email': {'S': EMAIL}, 'walletBalance': {'S': '100'}})
+    aws.put('powerstackPurchases', {'purchaseID': {'S': 'PST-1'}, 'status': {'S': 'Initialized'}, 'tx_type': {'S': 'Wallet'}})
+    aws.reset_counts()
+    return payment
+
+
+def webhook_event(event='charge.success', signature=None, **data):
+    data = dict({'reference': 'PST-1', 'status': 'success', 'amount': 500000, 'fees': 7600,
+                 'transaction_date': '2024-05-01T10:00:00.000Z', 'customer': {'email': EMAIL},
+                 'metadata': {'tx_type': 'Wallet', 'platform': 'paystack'}}, **data)
+    body = json.dumps({'event': event, 'data': data})
+    signature = signature or hmac.new(SECRET.encode(), body.encode(), hashlib.sha512).hexdigest()
+    return {'httpMethod': 'POST', 'path': '/user/paystackWebhook', 'body': body,
+            'headers': {'X-Paystack-Signature': signature}}
+
+
+def test_bad_signature_is_rejected(payment, aws):
+    with pytest.raises(payment.InvalidSignatureException):
+        payment.paystack_webhook(webhook_event(signature='0' * 128))
+    assert sum(aws.calls.values()) == 0
+
+
+def test_other_events_are_ignored(payment, aws):
+    assert payment.paystack_webhook(webhook_event('charge.failed'))['message'] == 'Ignored event charge.failed'
+    assert payment.paystack_webhook(webhook_event(status='failed'))['message'] == 'Ignored event charge.success'
+    assert sum(aws.calls.values()) == 0
+
+
+@pytest.mark.parametrize('reference', [None, '', 'PST-not-ours'])
+def test_unknown_or_missing_reference_is_acknowledged(payment, aws, reference):
+    assert payment.paystack_webhook(webhook_event(reference=reference)) == {'message': 'Ignored unknown reference'}
+    assert aws.calls['GetItem'] == (1 if reference else 0)
+
+
+def test_redelivery_credits_the_wallet_once(payment, aws):
+    first = payment.paystack_webhook(webhook_event())
+    again = payment.paystack_webhook(webhook_event())
+
+    assert first['message'] == 'Payment successful!'
+    assert again['message'] == 'Transaction already stored'
+    assert aws.tables['powerstackUsers'][('user-1',)]['walletBalance'] == {'N': '5100.00'}
+    assert aws.tables['powerstackPurchases'][('PST-1',)]['status'] == {'S': 'Confirmed'}
+
+
+def test_unsettled_payment_polls_are_answered_pending(payment, aws, monkeypatch):
+    statuses = ['ongoing', 'failed']
+    monkeypatch.setattr(payment, 'paystack_confirm_payment',
+                        lambda reference: {'message': 'Verification successful', 'data': {'status': statuses.pop(0)}})
+    aws.put('powerstackPurchases', {'purchaseID': {'S': 'PST-2'}, 'status': {'S': 'Initialized'},
+                                    'initializedEpochMs': {'N': str(payment.epoch_ms_now())}})
+
+    # inside the webhook grace period Paystack isn't asked
+    assert payment.confirm_pay_with_platform({'txnRef': 'PST-2'})['status'] == 'pending'
+    assert statuses == ['ongoing', 'failed']
+
+    assert payment.confirm_pay_with_platform({'txnRef': 'PST-1'}) == {
+        'status': 'pending', 'message': 'Transaction status: pending', 'txnRef': 'PST-1'}
+    with pytest.raises(payment.CustomException) as error:
+        payment.confirm_pay_with_platform({'txnRef': 'PST-1'})
+    assert (error.value.code, error.value.message) == ('PaymentStatus', 'Transaction status: failed')
@@ -0,0 +1,60 @@
+EMAIL = 'user@powerstack.ng'
+
+
+def sent(aws, operation):
+    """ Records the requests for one operation, still answered by the in-memory table. """
+    requests = []
+    answer = getattr(aws, f'op_{operation}')
+    aws.handlers[operation] = lambda params: requests.append(params) or answer(params)
+    return requests
+
+
+def seed_user(aws):
+    aws.put('powerstackUsers', {
+        'userID': {'S': 'user-1'}, 'email': {'S': EMAIL},
+        'walletBalance': {'N': '10'}, 'meters': {'L': []},
+    })
+
+
+def test_get_item_sends_a_projection_with_name_placeholders(aws, load_lambda):
+    db = load_lambda('users', 'utils.db_utils')
+    seed_user(aws)
+    requests = sent(aws, 'GetItem')
+
+    assert db.get_item('powerstackUsers', {'userID': 'user-1'}, projection=['userID', 'meters']) is not None
+
+    request = requests[0]
+    assert sorted(request['ExpressionAttributeNames'].values()) == ['meters', 'userID']
+    assert request['ProjectionExpression'] == ', '.join(request['ExpressionAttributeNames'])
+
+
+def test_item_exists_reads_only_the_key(aws, load_lambda):
+    db = load_lambda('users', 'utils.db_utils')
+    seed_user(aws)
+    requests = sent(aws, 'GetItem')
+
+    assert db.item_exists('powerstackUsers', {'userID': 'user-1'}) is True
+    assert db.item_exists('powerstackUsers', {'userID': 'user-2'}) is False
+    assert [list(request['ExpressionAttributeNames'].values()) for request in requests] == [['userID'], ['userID']]
+
+
+def test_exists_by_index_is_a_single_count(aws, load_lambda):
+    db = load_lambda('users', 'utils.db_utils')
+    seed_user(aws)
+    requests = sent(aws, 'Query')
+
+    assert db.check_item_exists_by_index('powerstackUsers', db.EMAIL_INDEX, 'email', EMAIL) is True
+    assert requests[0]['Select'] == 'COUNT' and requests[0]['Limit'] == 1
+
+
+def test_user_check_reads_the_user_once(aws, load_lambda):
+    functions = load_lambda('users', 'functions')
+    seed_user(aws)
+
+    response = functions.user_check({'email': EMAIL})
+
+    assert response['user_info']['userID'] == 'user-1'
+    assert aws.calls['Query'] == 1
+    assert aws.calls['GetItem'] + aws.calls['Scan'] == 0
+    # only the lastLogin stamp; active-user sketches are fed from the users stream
+    assert aws.calls['UpdateItem'] == 1
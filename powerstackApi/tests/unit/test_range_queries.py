@@ -0,0 +1,90 @@
+import decimal
+
+import pytest
+
+from fake_aws import FakeAWS
+
+WINDOW = ('2024-03-01 00:00', '2024-03-31 23:59')
+MARCH_1 = 1709251200000
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+@pytest.fixture
+def aws():
+    with FakeAWS(page_items=2) as fake:
+        yield fake
+
+
+@pytest.fixture
+def queries(aws):
+    """ Query requests as sent, answered by the in-memory table. """
+    sent = []
+    aws.handlers['Query'] = lambda params: sent.append(params) or aws.op_Query(params)
+    return sent
+
+
+def seed_purchases(aws, count):
+    for number in range(count):
+        aws.put('powerstackPurchases', {
+            'purchaseID': {'S': f'PST-{number}'}, 'txnType': {'S': 'Merchant'},
+            'purchaseEpochMs': {'N': str(MARCH_1 + number * DAY_MS)},
+        })
+
+
+def test_to_epoch_ms_reads_every_stored_format(load_lambda):
+    time_utils = load_lambda('admins', 'utils.time_utils')
+
+    assert time_utils.to_epoch_ms('2024-03-01T00:00:00.000Z') == MARCH_1
+    assert time_utils.to_epoch_ms('2024-03-01T01:00:00+01:00') == MARCH_1
+    assert time_utils.to_epoch_ms('2024-03-01 00:00') == MARCH_1
+    assert time_utils.to_epoch_ms(decimal.Decimal(MARCH_1)) == MARCH_1
+    assert time_utils.to_epoch_ms('not a date') is None
+    assert time_utils.epoch_ms_range(*WINDOW) == (MARCH_1, MARCH_1 + 31 * DAY_MS - 1)
+
+
+def test_indexed_window_is_a_paged_query(aws, load_lambda, queries):
+    db = load_lambda('admins', 'utils.db_utils')
+    seed_purchases(aws, 5)
+    index_name, sort_key = db.range_index_for('powerstackPurchases', 'txnType', 'purchaseDate')
+
+    result = db.analytics('powerstackPurchases', 'txnType', 'Merchant', 'purchaseDate', *WINDOW)
+
+    assert result['Count'] == 5
+    assert len(queries) == 3
+    assert all(query['IndexName'] == index_name for query in queries)
+    values = queries[0]['ExpressionAttributeValues'].values()
+    assert sorted(int(value['N']) for value in values if 'N' in value) == [MARCH_1, MARCH_1 + 31 * DAY_MS - 1]
+    assert {'S': 'Merchant'} in values
+    assert sort_key in queries[0]['ExpressionAttributeNames'].values()
+    assert aws.calls['Scan'] == 0
+
+
+def test_unindexed_attributes_keep_the_scan(aws, load_lambda, queries):
+    db = load_lambda('admins', 'utils.db_utils')
+    seed_purchases(aws, 1)
+
+    assert db.range_index_for('powerstackPurchases', 'meterType', 'purchaseDate') is None
+    db.analytics('powerstackPurchases', 'meterType', 'PREPAID', 'purchaseDate', *WINDOW)
+
+    assert queries == []
+    assert aws.calls['Scan'] > 0
+
+
+def test_backfills_write_each_page_as_it_is_scanned(aws, load_lambda):
+    backfill = load_lambda('admins', 'backfill')
+    for number in range(6):
+        aws.put('powerstackPurchases', {'purchaseID': {'S': f'PST-{number}'}, 'purchaseDate': {'S': '2024-03-01 00:00'}})
+        aws.put('powerstackUsers', {'userID': {'S': f'user-{number}'}, 'lastLogin': {'S': '2024-03-01 00:00'}})
+    aws.put('powerstackPurchases', {'purchaseID': {'S': 'PST-bad'}, 'purchaseDate': {'S': 'someday'}})
+    writes = []
+    aws.handlers['BatchWriteItem'] = lambda params: writes.append(params) or aws.op_BatchWriteItem(params)
+
+    assert backfill.backfill_purchase_epoch_ms() == {'updated': 6, 'skipped': 1}
+    # one write per scan page (page_items=2), never the whole table at once
+    sizes = [len(params['RequestItems']['powerstackPurchases']) for params in writes]
+    assert sum(sizes) == 6 and max(sizes) <= 2
+    assert all(purchase.get('purchaseEpochMs') == {'N': str(MARCH_1)}
+               for key, purchase in aws.tables['powerstackPurchases'].items() if key != ('PST-bad',))
+
+    assert backfill.backfill_login_epoch_ms() == {'updated': 6, 'skipped': 0}
+    assert all(user['lastLoginEpochMs'] == {'N': str(MARCH_1)} for user in aws.tables['powerstackUsers'].values())
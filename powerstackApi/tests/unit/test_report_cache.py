@@ -0,0 +1,76 @@
+import pytest
+
+
+@pytest.fixture
+def report_cache(load_lambda):
+    return load_lambda('admins', 'utils.report_cache')
+
+
+def test_window_splits_into_live_edges_and_cached_days(report_cache):
+    pieces = report_cache.day_pieces('2024-01-01 06:00', '2024-01-03 12:00')
+
+    assert pieces == [
+        ('2024-01-01 06:00', '2024-01-01 23:59', False),
+        ('2024-01-02 00:00', '2024-01-02 23:59', True),
+        ('2024-01-03 00:00', '2024-01-03 12:00', False),
+    ]
+
+
+def test_additive_results_merge(report_cache):
+    total = None
+    for part in ({'user_count': 1, 'users': ['a'], 'groups': {'Simple': {'purchase_count': 2}}},
+                 {'user_count': 2, 'users': ['b', 'c'], 'groups': {'Simple': {'purchase_count': 1}, 'Wallet': {'purchase_count': 4}}}):
+        total = report_cache.merge_results(total, part)
+
+    assert total == {
+        'user_count': 3,
+        'users': ['a', 'b', 'c'],
+        'groups': {'Simple': {'purchase_count': 3}, 'Wallet': {'purchase_count': 4}},
+    }
+
+
+def test_closed_periods(report_cache):
+    assert report_cache.is_closed('2024-01-01 23:59')
+    assert not report_cache.is_closed('2999-01-01 00:00')
+
+
+def test_uncached_days_are_computed_in_one_pass(aws, report_cache):
+    for purchase_id, epoch_ms in (('PST-1', 1704096000000), ('PST-2', 1704196800000), ('PST-3', 1704369600000)):
+        aws.put('powerstackPurchases', {'purchaseID': {'S': purchase_id}, 'txnType': {'S': 'Simple'},
+                                        'amount': {'N': '100'}, 'purchaseEpochMs': {'N': str(epoch_ms)}})
+    passes = []
+
+    def compute_days(spans):
+        passes.append(spans)
+        return report_cache.aggregate_by_day('powerstackPurchases', 'purchaseDate', spans, group_by='txnType')
+
+    first = report_cache.cached_by_day('purchaseGroups', {}, '2024-01-01 06:00', '2024-01-04 12:00', compute_days)
+    again = report_cache.cached_by_day('purchaseGroups', {}, '2024-01-01 06:00', '2024-01-04 12:00', compute_days)
+
+    assert first == again == {'Simple': {'purchase_count': 3, 'naira_amount': 300.0, 'units_sold': 0.0,
+                                         'commission_paid_out': 0.0, 'service_fees': 0.0, 'platform_fees': 0.0}}
+    # cold: the whole window in one pass; warm: only the partial days at the edges
+    assert passes == [
+        [('2024-01-01 06:00', '2024-01-04 12:00')],
+        [('2024-01-01 06:00', '2024-01-01 23:59'), ('2024-01-04 00:00', '2024-01-04 12:00')],
+    ]
+
+
+def test_sales_totals_are_cached_per_day_and_refreshed_by_the_backfill(aws, load_lambda):
+    analytics, backfill = load_lambda('admins', 'analytics', 'backfill')
+    aws.put('powerstackPurchases', {'purchaseID': {'S': 'PST-1'}, 'status': {'S': 'Confirmed'}, 'txnType': {'S': 'Simple'},
+                                    'amount': {'S': '100.0'}, 'purchaseEpochMs': {'N': '1704459851000'}})  # 2024-01-05
+    owner = {'custom:userType': 'OWNER'}
+    day = {'start_date': '2024-01-05 00:00', 'end_date': '2024-01-05 23:59'}
+
+    # served before the backfill: the closed day is cached as empty
+    assert analytics.transactions_by_date_range(owner, day)['purchase_count'] == 0
+    backfill.backfill_rollups('2024-03-01 00:00')
+
+    assert analytics.transactions_by_date_range(owner, day)['purchase_count'] == 1
+    aws.reset_counts()
+    week = analytics.transactions_by_date_range(owner, {'start_date': '2024-01-01 00:00', 'end_date': '2024-01-07 23:59'})
+    again = analytics.transactions_by_date_range(owner, {'start_date': '2024-01-04 00:00', 'end_date': '2024-01-05 23:59'})
+    assert week['purchase_count'] == again['purchase_count'] == 1
+    # one DAY-row Query either side of the cached 5th; the second window is all cached days
+    assert aws.calls['Query'] == 2
@@ -0,0 +1,114 @@
+import os
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+
+
+@pytest.fixture()
+def stream_event():
+    """ Replay of a purchases-table stream batch """
+    with open(os.path.join(ROOT, 'events', 'purchase_stream.json')) as f:
+        return json.load(f)
+
+
+def test_only_confirmation_is_counted(load_lambda, stream_event):
+    rollups = load_lambda('admins', 'rollups')
+    deltas = rollups.rollup_deltas(stream_event['Records'])
+
+    simple_hour = deltas[('HOUR#Simple', '2024-01-05T13')]
+    assert simple_hour['purchaseCount'] == 1
+    assert simple_hour['nairaAmount'] == Decimal('5000.0')
+    assert 'commissionPaidOut' not in simple_hour
+
+    wallet_day = deltas[('DAY#Wallet', '2024-01-05')]
+    assert wallet_day['purchaseCount'] == 1
+    assert wallet_day['commissionPaidOut'] == Decimal('20.0')
+
+    every_type = deltas[('HOUR#ALL', '2024-01-05T13')]
+    assert every_type['purchaseCount'] == 2
+    assert every_type['nairaAmount'] == simple_hour['nairaAmount'] + wallet_day['nairaAmount']
+    assert deltas[('DAY#ALL', '2024-01-05')] == every_type
+    assert len(deltas) == 6
+
+
+def test_rollup_ranges_use_days_for_whole_days(load_lambda):
+    rollups = load_lambda('admins', 'rollups')
+    ranges = rollups.rollup_ranges(datetime(2024, 1, 5, 10, 20), datetime(2024, 1, 8, 2, 0))
+
+    assert ranges == [
+        ('HOUR', '2024-01-05T10', '2024-01-05T23'),
+        ('HOUR', '2024-01-08T00', '2024-01-08T02'),
+        ('DAY', '2024-01-06', '2024-01-07'),
+    ]
+    assert rollups.rollup_ranges(datetime(2024, 1, 5), datetime(2024, 1, 6, 23, 59)) == [
+        ('DAY', '2024-01-05', '2024-01-06'),
+    ]
+
+
+def rollup_rows(aws):
+    return {key: row for key, row in aws.tables['powerstackRollups'].items() if '#' in key[0] and key[1][:1] == '2'}
+
+
+def test_redelivered_records_are_counted_once(aws, load_lambda, stream_event):
+    rollups = load_lambda('admins', 'rollups')
+
+    assert rollups.lambda_handler(stream_event, None) == {'batchItemFailures': []}
+    first = {key: dict(row) for key, row in rollup_rows(aws).items()}
+    assert rollups.lambda_handler(stream_event, None) == {'batchItemFailures': []}
+
+    assert rollup_rows(aws) == first
+    assert first[('HOUR#Simple', '2024-01-05T13')]['purchaseCount'] == {'N': '1'}
+
+
+def test_failed_record_changes_no_row(aws, load_lambda, stream_event):
+    rollups = load_lambda('admins', 'rollups')
+    # the DAY row's ADD fails, so the HOUR row must not move either
+    aws.put('powerstackRollups', {'rollupKey': {'S': 'HOUR#Simple'}, 'bucket': {'S': '2024-01-05T13'},
+                                  'purchaseCount': {'N': '7'}})
+    aws.put('powerstackRollups', {'rollupKey': {'S': 'DAY#Simple'}, 'bucket': {'S': '2024-01-05'},
+                                  'purchaseCount': {'S': 'corrupt'}})
+    event = {'Records': [record for record in stream_event['Records'] if record['eventID'] == 'e02']}
+
+    failures = rollups.lambda_handler(event, None)['batchItemFailures']
+
+    assert failures == [{'itemIdentifier': event['Records'][0]['dynamodb']['SequenceNumber']}]
+    assert aws.tables['powerstackRollups'][('HOUR#Simple', '2024-01-05T13')]['purchaseCount'] == {'N': '7'}
+    assert not [key for key in aws.tables['powerstackRollups'] if key[0].startswith('APPLIED#')]
+
+
+def test_backfill_counts_purchases_before_the_stream_once(aws, load_lambda):
+    backfill = load_lambda('admins', 'backfill')
+    for purchase_id, epoch_ms in (('PST-old-1', 1704459851000), ('PST-old-2', 1704463451000), ('PST-new', 1714557600000)):
+        aws.put('powerstackPurchases', {
+            'purchaseID': {'S': purchase_id}, 'status': {'S': 'Confirmed'}, 'txnType': {'S': 'Simple'},
+            'amount': {'S': '100.0'}, 'purchaseEpochMs': {'N': str(epoch_ms)}
+        })
+
+    assert backfill.backfill_rollups('2024-03-01 00:00', dry_run=True)['rows'] == 0
+    assert backfill.backfill_rollups('2024-03-01 00:00', txn_types=['ALL']) == {'purchases': 2, 'rows': 3, 'already_backfilled': 0}
+    assert ('DAY#Simple', '2024-01-05') not in aws.tables['powerstackRollups']
+    assert backfill.backfill_rollups('2024-03-01 00:00') == {'purchases': 2, 'rows': 3, 'already_backfilled': 3}
+    assert backfill.backfill_rollups('2024-03-01 00:00') == {'purchases': 2, 'rows': 0, 'already_backfilled': 6}
+
+    day = aws.tables['powerstackRollups'][('DAY#Simple', '2024-01-05')]
+    assert (day['purchaseCount'], day['nairaAmount']) == ({'N': '2'}, {'N': '200.0'})
+    assert aws.tables['powerstackRollups'][('DAY#ALL', '2024-01-05')]['purchaseCount'] == {'N': '2'}
+    assert ('DAY#Simple', '2024-05-01') not in aws.tables['powerstackRollups']
+
+
+def test_totals_without_a_type_count_every_type(aws, load_lambda, stream_event):
+    rollups, analytics = load_lambda('admins', 'rollups', 'analytics')
+    rollups.lambda_handler(stream_event, None)
+    owner = {'custom:userType': 'OWNER'}
+    window = {'start_date': '2024-01-05 00:00', 'end_date': '2024-01-05 23:59'}
+
+    totals = analytics.transactions_by_date_range(owner, window)
+    simple = analytics.transactions_by_date_range(owner, dict(window, type='Simple'))
+    wallet = analytics.transactions_by_date_range(owner, dict(window, type='Wallet'))
+
+    assert totals['purchase_count'] == simple['purchase_count'] + wallet['purchase_count'] == 2
+    assert totals['naira_amount'] == simple['naira_amount'] + wallet['naira_amount'] > 0
@@ -0,0 +1,103 @@
+import sys
+import json
+import types
+
+import pytest
+
+
+@pytest.fixture
+def router_utils(load_lambda):
+    return load_lambda('admins', 'utils.router_utils')
+
+
+def fake_module(monkeypatch, name, **handlers):
+    module = types.ModuleType(name)
+    module.__dict__.update(handlers)
+    monkeypatch.setitem(sys.modules, name, module)
+    return module
+
+
+def test_routes_pass_claims_query_and_body(router_utils, monkeypatch):
+    calls = []
+    fake_module(monkeypatch, 'routes_under_test',
+                with_query=lambda claims, query: calls.append((claims, query)) or 'q',
+                with_body=lambda data: calls.append(data) or {'ok': True},
+                with_event=lambda event: calls.append(event['body']) or 'e')
+    monkeypatch.setattr(router_utils, 'request_claims', lambda event: {'email': 'ada@powerstack.ng'})
+    routes = {
+        ('GET', '/x'): router_utils.route('routes_under_test', 'with_query', auth=True, query='optional'),
+        ('POST', '/y'): router_utils.route('routes_under_test', 'with_body', body=True),
+        ('POST', '/z'): router_utils.route('routes_under_test', 'with_event', event=True),
+    }
+
+    response = router_utils.handle_request(routes, {'httpMethod': 'GET', 'path': '/x', 'queryStringParameters': None})
+    assert (response['statusCode'], json.loads(response['body'])) == (200, 'q')
+    response = router_utils.handle_request(routes, {'httpMethod': 'POST', 'path': '/y', 'body': '{"a": 1}'}, wrap_message=True)
+    assert json.loads(response['body']) == {'message': {'ok': True}}
+    router_utils.handle_request(routes, {'httpMethod': 'POST', 'path': '/z', 'body': '{"a":  1}'})
+    assert calls == [({'email': 'ada@powerstack.ng'}, {}), {'a': 1}, '{"a":  1}']
+
+
+def test_unknown_paths_and_missing_required_query_are_404(router_utils):
+    routes = {('GET', '/admin/ticket'): router_utils.route('not_imported', 'get_specific_ticket', query='required')}
+
+    for event in ({'httpMethod': 'GET', 'path': '/admin/tickets/nope'},
+                  {'httpMethod': 'POST', 'path': '/admin/ticket'},
+                  {'httpMethod': 'GET', 'path': '/admin/ticket'}):
+        response = router_utils.handle_request(routes, event)
+        assert response['statusCode'] == 404
+        assert json.loads(response['body'])['code'] == 'InvalidPath'
+    assert 'not_imported' not in sys.modules
+
+
+def test_auth_failures(router_utils, monkeypatch):
+    fake_module(monkeypatch, 'routes_under_test', denied=lambda claims: (_ for _ in ()).throw(router_utils.UnauthorizedUser))
+    routes = {('GET', '/x'): router_utils.route('routes_under_test', 'denied', auth=True)}
+    event = {'httpMethod': 'GET', 'path': '/x', 'headers': {'Authorization': 'Bearer t'}}
+
+    missing = router_utils.handle_request(routes, {'httpMethod': 'GET', 'path': '/x'})
+    assert json.loads(missing['body'])['code'] == 'InvalidToken'
+
+    monkeypatch.setattr(router_utils, 'request_claims', lambda event: "Expired")
+    assert router_utils.handle_request(routes, event)['statusCode'] == 403
+
+    monkeypatch.setattr(router_utils, 'request_claims', lambda event: {'custom:userType': 'REGULAR'})
+    denied = router_utils.handle_request(routes, event)
+    assert (denied['statusCode'], json.loads(denied['body'])['code']) == (400, 'UnauthorizedUser')
+
+
+def test_route_modules_load_on_first_dispatch(aws, load_lambda):
+    app = load_lambda('users', 'app')
+
+    hello = app.lambda_handler({'httpMethod': 'GET', 'path': '/user/hello'}, None)
+    assert json.loads(hello['body']) == 'Hello World!'
+    assert not {'functions', 'payment', 'authentication'} & set(sys.modules)
+
+    app.lambda_handler({'httpMethod': 'GET', 'path': '/user/receipt',
+                        'queryStringParameters': {'txnRef': 'PST-0'}}, None)
+    assert 'functions' in sys.modules
+    assert not {'payment', 'authentication'} & set(sys.modules)
+
+
+def test_prewarm_imports_routes_and_survives_failing_warmers(router_utils, monkeypatch):
+    warmed = []
+
+    def broken(open_connections):
+        raise RuntimeError('no network')
+
+    fake_module(monkeypatch, 'routes_under_test',
+                handler=lambda: 'ok',
+                warm=lambda open_connections: warmed.append(open_connections),
+                broken=broken)
+    routes = {('GET', '/x'): router_utils.route('routes_under_test', 'handler'),
+              ('GET', '/hello'): router_utils.static_route('hi')}
+    warmers = [('routes_under_test', 'broken'), ('routes_under_test', 'warm')]
+
+    response = router_utils.warm_ping_response(routes, warmers, {'warmup': True, 'connections': True})
+
+    assert response['warm'] is True
+    assert set(response['prewarmed']) == {'import routes_under_test', 'resolve handlers',
+                                          'routes_under_test.broken', 'routes_under_test.warm'}
+    assert warmed == [True]
+    assert 'function' in routes[('GET', '/x')]
+    assert router_utils.is_warm_ping({'warmup': True}) and not router_utils.is_warm_ping({'httpMethod': 'GET'})
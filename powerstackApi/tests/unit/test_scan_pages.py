@@ -0,0 +1,28 @@
+import pytest
+
+EMAIL = 'user@powerstack.ng'
+
+
+@pytest.fixture
+def db(aws, load_lambda):
+    db = load_lambda('users', 'utils.db_utils')
+    aws.page_items = 2  # stands in for the 1 MB page limit
+    for number in range(5):
+        aws.put('powerstackPurchases', {'purchaseID': {'S': f'PST-{number}'}, 'email': {'S': EMAIL}, 'amount': {'S': '100'}})
+    return db
+
+
+def test_reads_follow_every_page(db):
+    assert len(db.get_items_by_attribute('powerstackPurchases', 'email', EMAIL)) == 5
+    assert db.count_items('powerstackPurchases') == 5
+
+
+def test_list_pages_chain_through_next_token(db):
+    pages, token = [], None
+    while True:
+        items, token = db.get_items_by_attribute_page('powerstackPurchases', 'email', EMAIL, limit=2, next_token=token)
+        pages.append([item['purchaseID'] for item in items])
+        if token is None:
+            break
+
+    assert pages == [['PST-0', 'PST-1'], ['PST-2', 'PST-3'], ['PST-4']]
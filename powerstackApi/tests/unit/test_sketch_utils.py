@@ -0,0 +1,59 @@
+import pytest
+
+
+@pytest.fixture
+def sketch_utils(load_lambda):
+    return load_lambda('admins', 'utils.sketch_utils')
+
+
+def sketch_of(sketch_utils, members):
+    """ A day's sketch as the table would hold it, one item per shard """
+    shards = {}
+    for member in members:
+        index, rank = sketch_utils.hll_register(member)
+        shard = shards.setdefault(index // sketch_utils.REGISTERS_PER_SHARD, {})
+        shard[f'r{index}'] = max(rank, shard.get(f'r{index}', 0))
+    return list(shards.values())
+
+
+def test_estimate_within_error_bounds(sketch_utils):
+    for count in (0, 50, 20000):
+        registers = sketch_utils.merge_sketches(sketch_of(sketch_utils, (f'user-{i}' for i in range(count))))
+        assert abs(sketch_utils.estimate_distinct(registers) - count) <= 0.1 * count
+
+
+def test_merged_days_count_repeat_users_once(sketch_utils):
+    monday = sketch_of(sketch_utils, (f'user-{i}' for i in range(1000)))
+    tuesday = sketch_of(sketch_utils, (f'user-{i}' for i in range(500, 1500)))
+
+    week = sketch_utils.estimate_distinct(sketch_utils.merge_sketches(monday + tuesday))
+
+    assert abs(week - 1500) <= 150
+
+
+def user_record(event_name, new_login, old_login=None, user_id='user-1'):
+    images = {'NewImage': {'userID': {'S': user_id}, 'userType': {'S': 'REGULAR'},
+                           'lastLoginEpochMs': {'N': str(new_login)}}}
+    if old_login is not None:
+        images['OldImage'] = {'userID': {'S': user_id}, 'lastLoginEpochMs': {'N': str(old_login)}}
+    return {'eventName': event_name, 'dynamodb': images}
+
+
+def test_logins_reach_the_sketches_from_the_users_stream(aws, load_lambda):
+    activity, sketches = load_lambda('admins', 'activity', 'utils.sketch_utils')
+    day_start = 1704067200000  # 2024-01-01T00:00Z
+    event = {'Records': [
+        user_record('INSERT', day_start + 1000, user_id='user-new'),
+        user_record('MODIFY', day_start + 2000, day_start - 1000),
+        user_record('MODIFY', day_start - 1000, day_start - 1000, user_id='user-edited'),  # no new login
+    ]}
+
+    assert activity.lambda_handler(event, None) == {'batchItemFailures': []}
+    rows = {key: dict(item) for key, item in aws.tables['powerstackActivity'].items()}
+    sketches._WRITTEN_RANKS.clear()  # as if another container got the redelivery
+    activity.lambda_handler(event, None)
+
+    assert aws.tables['powerstackActivity'] == rows
+    counts = activity.active_user_counts('2024-01-01 00:00', '2024-01-01 23:59')
+    assert counts['daily_active_users'] == {'2024-01-01': 2}
+    assert activity.active_user_counts('2024-01-01 00:00', '2024-01-01 23:59', user_type='REGULAR')['user_count'] == 2
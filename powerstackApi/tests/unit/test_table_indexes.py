@@ -0,0 +1,24 @@
+def describe_with(*index_names):
+    return lambda params: {'Table': {
+        'TableName': params['TableName'],
+        'GlobalSecondaryIndexes': [{'IndexName': name} for name in index_names],
+    }}
+
+
+def test_listed_indexes_are_created_before_retired_ones_are_deleted(aws, load_lambda):
+    db = load_lambda('admins', 'utils.db_utils')
+    updates = []
+    aws.handlers['UpdateTable'] = lambda params: updates.append(params['GlobalSecondaryIndexUpdates'][0]) or {}
+
+    aws.handlers['DescribeTable'] = describe_with('txnType-purchaseTime-index')
+    assert db.ensure_table_indexes('powerstackPurchases') == ['txnType-purchaseEpochMs-index', 'txnType-purchaseTime-index']
+    assert updates[-1]['Create']['IndexName'] == 'txnType-purchaseEpochMs-index'
+
+    aws.handlers['DescribeTable'] = describe_with('txnType-purchaseTime-index', 'txnType-purchaseEpochMs-index')
+    assert db.ensure_table_indexes('powerstackPurchases') == ['txnType-purchaseTime-index']
+    assert updates[-1] == {'Delete': {'IndexName': 'txnType-purchaseTime-index'}}
+
+    aws.handlers['DescribeTable'] = describe_with('txnType-purchaseEpochMs-index')
+    assert db.ensure_table_indexes('powerstackPurchases') == []
+    assert db.ensure_table_indexes('powerstackTickets') == []
+    assert len(updates) == 2
@@ -0,0 +1,39 @@
+import pytest
+
+TOKEN = {'email': 'user@powerstack.ng', 'custom:userType': 'CUSTOMER'}
+
+
+def ticket(ticket_id, details='old'):
+    return {'ticketID': {'S': ticket_id}, 'details': {'S': details}, 'ticketStatus': {'S': 'NEW'}}
+
+
+def test_numbering_continues_after_existing_tickets(aws, load_lambda):
+    functions = load_lambda('users', 'functions')
+    for ticket_id in ('PST-1', 'PST-2', 'PST-7', 'legacy'):
+        aws.put('powerstackTickets', ticket(ticket_id))
+
+    assert functions.submit_ticket(TOKEN, {'details': 'meter offline'}) == {'message': 'Ticket ID: PST-8'}
+    assert functions.submit_ticket(TOKEN, {'details': 'no token'}) == {'message': 'Ticket ID: PST-9'}
+    assert aws.tables['powerstackCounters'][('ticketID',)]['currentValue'] == {'N': '9'}
+
+
+def test_taken_ticket_ids_are_skipped_not_overwritten(aws, load_lambda):
+    functions = load_lambda('users', 'functions')
+    aws.put('powerstackCounters', {'counterName': {'S': 'ticketID'}, 'currentValue': {'N': '1'}})
+    aws.put('powerstackTickets', ticket('PST-2'))
+
+    assert functions.submit_ticket(TOKEN, {'details': 'meter offline'}) == {'message': 'Ticket ID: PST-3'}
+    assert aws.tables['powerstackTickets'][('PST-2',)]['details'] == {'S': 'old'}
+
+
+def test_admin_reads_one_ticket_by_key(aws, load_lambda):
+    functions = load_lambda('admins', 'functions')
+    admin = {'email': 'admin@powerstack.ng', 'custom:userType': 'ADMIN'}
+    for ticket_id in ('PST-1', 'PST-2'):
+        aws.put('powerstackTickets', ticket(ticket_id))
+
+    assert functions.get_specific_ticket(admin, {'ticket': 'PST-2'})['ticket']['ticketID'] == 'PST-2'
+    with pytest.raises(functions.InvalidReferenceException):
+        functions.get_specific_ticket(admin, {'ticket': 'PST-3'})
+    assert aws.calls['GetItem'] == 2
+    assert aws.calls['Scan'] == 0
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+DAY_START = 1704067200000  # 2024-01-01T00:00Z, a Monday
+
+
+@pytest.fixture
+def timeseries(load_lambda):
+    return load_lambda('admins', 'utils.timeseries')
+
+
+def test_daily_and_per_type_histogram(timeseries):
+    columns = timeseries.columns_from_items([
+        {'purchaseEpochMs': DAY_START + 1, 'amount': '100.0', 'txnType': 'Simple'},
+        {'purchaseDate': '2024-01-02 10:30', 'amount': '50.5', 'units': '3', 'txnType': 'Wallet'},
+        {'purchaseEpochMs': DAY_START + timeseries.DAY_MS + 5, 'amount': 'n/a', 'txnType': 'Simple'},
+    ])
+    end = DAY_START + 3 * timeseries.DAY_MS - 1
+
+    daily = timeseries.histogram(columns, DAY_START, end, 'day')
+    assert daily['purchase_count'].tolist() == [1, 2, 0]
+    assert daily['naira_amount'].tolist() == [100.0, 50.5, 0.0]
+
+    by_type = timeseries.histogram(columns, DAY_START, end, 'week', by_type=True)
+    assert {name: counts.tolist() for name, counts in by_type['purchase_count'].items()} == {'Simple': [2], 'Wallet': [1]}
+
+
+def test_moving_average_and_percentiles(timeseries):
+    assert timeseries.moving_average([2, 4, 6, 8], 2).tolist() == [2.0, 3.0, 5.0, 7.0]
+    assert timeseries.percentiles(np.arange(1, 101), (50,)) == {'p50': 50.5}
+    assert timeseries.percentiles([], (90,)) == {'p90': None}
@@ -0,0 +1,100 @@
+import json
+import time
+
+import jwt
+import pytest
+
+rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+
+POOL_ID = 'us-east-2_test'
+CLIENT_ID = 'test-client'
+ISSUER = f'https://cognito-idp.us-east-2.amazonaws.com/{POOL_ID}'
+
+
+def new_key(kid):
+    return kid, rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def jwks(*keys):
+    public = []
+    for kid, key in keys:
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+        jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+        public.append(jwk)
+    return {'keys': public}
+
+
+def token(key, **claims):
+    kid, private_key = key
+    claims = dict({'email': 'ada@powerstack.ng', 'iss': ISSUER, 'aud': CLIENT_ID, 'token_use': 'id',
+                   'exp': int(time.time()) + 3600}, **claims)
+    return jwt.encode(claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+@pytest.fixture
+def token_utils(load_lambda):
+    return load_lambda('admins', 'utils.token_utils')
+
+
+@pytest.fixture
+def pool(monkeypatch, token_utils):
+    """ Serves whatever key set the test puts in pool['keys']; counts the downloads. """
+    state = {'keys': [], 'fetches': 0}
+
+    def fetch_data(client):
+        state['fetches'] += 1
+        return jwks(*state['keys'])
+
+    monkeypatch.setattr(token_utils, 'pool_config', lambda: (POOL_ID, CLIENT_ID, 'secret'))
+    monkeypatch.setattr(token_utils, '_JWKS_CLIENT', None)
+    monkeypatch.setattr(jwt.PyJWKClient, 'fetch_data', fetch_data)
+    token_utils._VERIFIED_TOKENS.clear()
+    return state
+
+
+def test_verified_once_then_served_from_cache(token_utils, pool, monkeypatch):
+    key = new_key('k1')
+    pool['keys'] = [key]
+    id_token = token(key)
+
+    assert token_utils.decode_token(id_token)['email'] == 'ada@powerstack.ng'
+    monkeypatch.setattr(token_utils, 'verify_token', lambda _: pytest.fail('token verified twice'))
+    assert token_utils.decode_token(id_token)['email'] == 'ada@powerstack.ng'
+    assert pool['fetches'] == 1
+
+
+def test_rotated_key_triggers_one_refetch(token_utils, pool):
+    old, new = new_key('old'), new_key('new')
+    pool['keys'] = [old]
+    token_utils.decode_token(token(old))
+
+    pool['keys'] = [old, new]
+    assert token_utils.decode_token(token(new))['token_use'] == 'id'
+    assert pool['fetches'] == 2
+
+
+def test_rejects_forged_and_expired_tokens(token_utils, pool):
+    key = new_key('k1')
+    pool['keys'] = [key]
+
+    forged = token(('k1', new_key('k1')[1]))
+    with pytest.raises(token_utils.InvalidTokenException):
+        token_utils.decode_token(forged)
+    with pytest.raises(token_utils.InvalidTokenException):
+        token_utils.decode_token(token(key, token_use='access'))
+    with pytest.raises(token_utils.InvalidTokenException):
+        token_utils.decode_token(token(key, aud='another-client'))
+    with pytest.raises(token_utils.InvalidTokenException):
+        token_utils.decode_token(token(key, iss='https://cognito-idp.eu-west-1.amazonaws.com/eu-west-1_other'))
+    assert token_utils.decode_token(token(key, exp=int(time.time()) - 10)) == "Expired"
+
+
+def test_cached_claims_expire_with_the_token(token_utils, pool, monkeypatch):
+    key = new_key('k1')
+    pool['keys'] = [key]
+    exp = int(time.time()) + 60
+    id_token = token(key, exp=exp)
+    token_utils.decode_token(id_token)
+
+    monkeypatch.setattr(token_utils.time, 'time', lambda: exp + 1)
+    assert token_utils.decode_token(id_token) == "Expired"
@@ -0,0 +1,32 @@
+import pytest
+
+EMAIL = 'user@powerstack.ng'
+
+
+@pytest.fixture
+def queries(aws):
+    """ Query requests as sent, answered by the in-memory table. """
+    sent = []
+    aws.handlers['Query'] = lambda params: sent.append(params) or aws.op_Query(params)
+    return sent
+
+
+def test_email_and_phone_lookups_query_their_index(aws, load_lambda, queries):
+    db = load_lambda('users', 'utils.db_utils')
+    aws.put('powerstackUsers', {'userID': {'S': 'user-1'}, 'email': {'S': EMAIL}, 'phoneNumber': {'S': '+2348000000000'}})
+
+    assert db.get_user_by_email_index('powerstackUsers', EMAIL)['userID'] == 'user-1'
+    assert db.get_user_id_by_phone('+2348000000000') == 'user-1'
+
+    assert [query['IndexName'] for query in queries] == ['email-index', 'phoneNumber-index']
+    assert all(query['Limit'] == 1 for query in queries)
+    assert aws.calls['Scan'] == 0
+
+
+def test_unknown_email_is_user_not_found(aws, load_lambda, queries):
+    functions = load_lambda('users', 'functions')
+
+    assert functions.get_user_by_email_index('powerstackUsers', EMAIL) is None
+    with pytest.raises(functions.UserNotFoundException):
+        functions.add_meter({'email': EMAIL}, {'meterNumber': '0101'})
+    assert aws.calls['Scan'] == 0
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+
+USERS = 'powerstackUsers'
+
+
+@pytest.fixture
+def db(aws, load_lambda):
+    aws.put(USERS, {'userID': {'S': 'user-1'}, 'walletBalance': {'N': '50'}})
+    return load_lambda('users', 'utils.db_utils')
+
+
+def balance(aws):
+    return aws.tables[USERS][('user-1',)]['walletBalance']
+
+
+def test_debit_returns_the_new_balance_in_one_call(db, aws):
+    aws.reset_counts()
+
+    assert db.debit_wallet(USERS, 'userID', 'user-1', 20, commission=0.2) == Decimal('30.20')
+    assert aws.calls == {'UpdateItem': 1}
+
+
+def test_debit_beyond_the_balance_changes_nothing(db, aws):
+    with pytest.raises(db.InsufficientBalanceException):
+        db.debit_wallet(USERS, 'userID', 'user-1', 50.01)
+    assert balance(aws) == {'N': '50'}
+
+
+def test_credit_converts_a_legacy_string_balance(db, aws):
+    aws.put(USERS, {'userID': {'S': 'user-1'}, 'walletBalance': {'S': '50'}})
+
+    assert db.credit_wallet(USERS, 'userID', 'user-1', 25) == Decimal('75.00')
+    assert balance(aws) == {'N': '75.00'}
+
+
+def test_credit_to_an_unknown_user(db):
+    with pytest.raises(db.UserNotFoundException):
+        db.credit_wallet(USERS, 'userID', 'user-2', 25)
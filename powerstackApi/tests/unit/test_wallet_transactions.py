@@ -0,0 +1,79 @@
+import pytest
+
+USERS, PURCHASES = 'powerstackUsers', 'powerstackPurchases'
+
+
+@pytest.fixture
+def db(aws, load_lambda):
+    aws.put(USERS, {'userID': {'S': 'user-1'}, 'walletBalance': {'N': '50'}})
+    return load_lambda('users', 'utils.db_utils')
+
+
+def balance(aws):
+    return aws.tables[USERS][('user-1',)]['walletBalance']
+
+
+def test_insufficient_funds_debit_nothing_and_store_no_purchase(db, aws):
+    with pytest.raises(db.InsufficientBalanceException):
+        db.transact_wallet_purchase(USERS, 'userID', 'user-1', 100, PURCHASES, {'purchaseID': 'PST-1', 'amount': '100'})
+
+    assert balance(aws) == {'N': '50'}
+    assert not aws.tables[PURCHASES]
+
+
+def test_purchase_debits_a_legacy_string_balance(db, aws):
+    aws.put(USERS, {'userID': {'S': 'user-1'}, 'walletBalance': {'S': '500'}})
+
+    db.transact_wallet_purchase(USERS, 'userID', 'user-1', 100, PURCHASES, {'purchaseID': 'PST-1'}, commission=1)
+
+    assert balance(aws) == {'N': '401.00'}
+    assert ('PST-1',) in aws.tables[PURCHASES]
+
+
+def test_repeated_purchase_id_debits_nothing(db, aws):
+    aws.put(PURCHASES, {'purchaseID': {'S': 'PST-1'}, 'amount': {'S': '10'}})
+    aws.reset_counts()
+
+    with pytest.raises(db.CustomException) as error:
+        db.transact_wallet_purchase(USERS, 'userID', 'user-1', 10, PURCHASES, {'purchaseID': 'PST-1', 'amount': '10'})
+
+    assert error.value.code == 'DuplicateTransaction'
+    assert balance(aws) == {'N': '50'}
+    assert aws.tables[PURCHASES][('PST-1',)]['amount'] == {'S': '10'}
+    assert aws.calls == {'TransactWriteItems': 1}
+
+
+def initialized(aws, purchase_id='PST-9'):
+    aws.put(PURCHASES, {'purchaseID': {'S': purchase_id}, 'status': {'S': 'Initialized'}})
+    aws.reset_counts()
+    return {'purchaseID': purchase_id, 'status': 'Confirmed'}
+
+
+def test_confirmation_adds_the_credit_in_one_round_trip(db, aws):
+    purchase = initialized(aws)
+
+    assert db.transact_confirm_purchase(PURCHASES, purchase, USERS, 'userID', 'user-1', credit='25.5') == purchase
+    assert db.transact_confirm_purchase(PURCHASES, purchase, USERS, 'userID', 'user-1', credit='25.5') is None
+
+    assert balance(aws) == {'N': '75.50'}
+    assert aws.calls == {'TransactWriteItems': 2}
+
+
+def test_confirmation_credits_a_legacy_string_balance(db, aws):
+    aws.put(USERS, {'userID': {'S': 'user-1'}, 'walletBalance': {'S': '50'}})
+    purchase = initialized(aws)
+
+    db.transact_confirm_purchase(PURCHASES, purchase, USERS, 'userID', 'user-1', credit=10)
+
+    assert balance(aws) == {'N': '60.00'}
+    assert aws.tables[PURCHASES][('PST-9',)]['status'] == {'S': 'Confirmed'}
+
+
+def test_confirmation_for_an_unknown_wallet_writes_nothing(db, aws):
+    purchase = initialized(aws)
+
+    with pytest.raises(db.UserNotFoundException):
+        db.transact_confirm_purchase(PURCHASES, purchase, USERS, 'userID', 'user-2', credit=10)
+
+    assert aws.tables[PURCHASES][('PST-9',)]['status'] == {'S': 'Initialized'}
+    assert ('user-2',) not in aws.tables[USERS]
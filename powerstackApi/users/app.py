@@ -1,213 +1,66 @@
-import json
 import logging
-from decimal import Decimal
 
-from utils.general_utils import *
-from utils.exception_handler import *
-from functions import * 
-from authentication import *
-from payment import *
+from utils.router_utils import *
 
 # ---------- LOGS ----------
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        return json.JSONEncoder.default(self, obj)
+# ---------- ROUTES ----------
+# (httpMethod, path) -> handler; route modules are imported on first use (utils/router_utils.py)
+ROUTES = {
+    # ---------- GET ----------
+    ('GET', '/user/hello'): static_route("Hello World!"),
+    ('GET', '/user/dashboard'): route('functions', 'user_check', auth=True),
+    # Query Param: 'limit', 'nextToken'
+    ('GET', '/user/purchases'): route('functions', 'purchase_history', auth=True, query='optional'),
+    # Query Param: 'txnRef' or 'txnRefs' (comma separated)
+    ('GET', '/user/receipt'): route('functions', 'get_receipt', query='required'),
+    # Query Param: 'txnRef'
+    ('GET', '/user/confirmPay'): route('payment', 'confirm_pay_with_platform', query='required'),
+
+    # ---------- POST ----------
+    # Body: meterName, meterNumber, meterType, meterLocation
+    ('POST', '/user/addMeter'): route('functions', 'add_meter', auth=True, body=True),
+    # Body: meterName, meterNumber, meterType, meterLocation
+    ('POST', '/user/removeMeter'): route('functions', 'remove_meter', auth=True, body=True),
+    # Body: details
+    ('POST', '/user/ticket'): route('functions', 'submit_ticket', auth=True, body=True),
+    # for both simple and wallet funding transactions
+    ('POST', '/user/initPay'): route('payment', 'initialize_pay_with_platform', body=True),
+    ('POST', '/user/walletPay'): route('payment', 'pay_with_wallet', auth=True, body=True),
+    # Paystack events (set as the webhook URL on the Paystack dashboard), signed with x-paystack-signature
+    ('POST', '/user/paystackWebhook'): route('payment', 'paystack_webhook', event=True),
+    # Body: username, password, email, phone_number, user_type
+    ('POST', '/user/signUp'): route('authentication', 'user_signup', body=True),
+    # Body: username, verification_code, password
+    ('POST', '/user/verify'): route('authentication', 'confirm_sign_up', body=True),
+    # Body: username, password
+    ('POST', '/user/login'): route('authentication', 'user_login', body=True),
+    # Body: username
+    ('POST', '/user/forgotPassword'): route('authentication', 'forgot_password_request', body=True),
+    # Body: username, verification_code, new_password
+    ('POST', '/user/resetPassword'): route('authentication', 'reset_password', body=True),
+}
+
+
+# ---------- PREWARM ----------
+# (module, function) run during init when PREWARM_ON_INIT is set, and on {"warmup": true} pings
+WARMERS = [
+    ('functions', 'prewarm_clients'),
+    ('authentication', 'prewarm_cognito'),
+    ('payment', 'prewarm_payments'),
+    ('utils.token_utils', 'prewarm_jwks'),
+]
+
+if PREWARM_ON_INIT:
+    prewarm(ROUTES, WARMERS)
+
 
 # ---------- USERS LAMBDA FUNCTION ----------
 def lambda_handler(event, context):
-    logger.info(f"event {event}")
-    response_body = {"error": "Invalid request"}
-    status_code = 400
-
-    if "httpMethod" in event:
-        try:
-            http_method = event["httpMethod"]
-            path = event["path"]
-
-            # ---------- SECTION 1: AUTH HEADER ----------
-            if 'headers' in event and 'Authorization' in event['headers']:
-                id_token = event['headers']['Authorization'].split()[1]
-
-                decoded_token = decode_token(id_token)
-                if decoded_token == "Expired":
-                    return {
-                        "statusCode": 403,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'ExpiredToken',
-                            'message':'Session expired, log in again'
-                            })
-                    }
-            
-            # ---------- SECTION 2: OPTIONS REQUESTS ----------
-            if http_method == "OPTIONS":
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    'body': json.dumps('Options, PASS.')
-                }
-            # ---------- SECTION 3: GET REQUESTS ----------
-            if http_method == "GET":
-                if path == "/user/hello":
-                    message = "Hello World!"
-                
-                elif path == "/user/dashboard":
-                    message = user_check(id_token)
-       
-                elif path == "/user/purchases":
-                    message = purchase_history(id_token)
-
-                elif path == "/user/receipt" and "queryStringParameters" in event:
-                    """
-                        Query Param: 'txnRef'
-                    """
-                    query_params = event['queryStringParameters']
-                    message = get_receipt(query_params=query_params)
-                
-                elif path == "/user/confirmPay" and "queryStringParameters" in event:
-                    """
-                        Query Param: 'txnRef'
-                    """
-                    query_params = event['queryStringParameters']
-                    message = confirm_pay_with_platform(query_params=query_params)
- 
-                else:
-                # If the path is not recognized, return an error response
-                    return {
-                        "statusCode": 404,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'InvalidPath',
-                            'message': f'Invalid path: {path}'
-                        })
-                    }
-                
-                logging.info(message)
-                status_code = 200
-                response_body = message
-
-            # ---------- SECTION 4: POST REQUESTS ----------
-            if http_method == "POST":
-                data = json.loads(event['body'])
-
-                if path == "/user/addMeter":
-                    """
-                        Body: meterName, meterNumber, meterType, meterLocation
-                    """
-                    message = add_meter(id_token, data)
+    if is_warm_ping(event):
+        return warm_ping_response(ROUTES, WARMERS, event)
 
-                elif path == "/user/removeMeter":
-                    """
-                        Body: meterName, meterNumber, meterType, meterLocation
-                    """
-                    message = remove_meter(id_token, data)
-        
-                elif path == "/user/ticket":
-                    """
-                        Body: details
-                    """
-                    message = submit_ticket(id_token, data)
-    
-                elif path == "/user/initPay":
-                    #for both simple and wallet funding transactions
-                    message = initialize_pay_with_platform(data)
-    
-                elif path == "/user/walletPay":
-                    message = pay_with_wallet(id_token, data)
-
-                elif path =="/user/signUp":
-                    """
-                        Body: username, password, email, phone_number, user_type
-                    """
-                    message = user_signup(data)
-
-                elif path=="/user/verify":
-                    """
-                        Body: username, verification_code, password
-                    """
-                    message = confirm_sign_up(data)
-                
-                elif path=="/user/login":
-                    """
-                        Body: username, password
-                    """
-                    message = user_login(data)
-                
-                elif path=="/user/forgotPassword":
-                    """
-                        Body: username
-                    """
-                    message = forgot_password_request(data)
-
-                elif path=="/user/resetPassword":
-                    """
-                        Body: username, verification_code, new_password
-                    """
-                    message = reset_password(data)
-
-                else:
-                # If the path is not recognized, return an error response
-                    return {
-                        "statusCode": 404,
-                        "headers": {
-                            'Access-Control-Allow-Headers': 'Content-Type',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-                            "Content-type": 'application/json'
-                        },
-                        "body": json.dumps({
-                            'code': 'InvalidPath',
-                            'message': f'Invalid path: {path}'
-                        })
-                    }
-                
-                logging.info(message)
-                status_code = 200
-                response_body = message
-
-        except CustomException as e:
-        # Handle your custom exception and return the custom error response
-            logger.error(f"Custom Exception {e}")
-            status_code=400
-            response_body = {"code": e.code, "message": e.message}
-        
-        except Exception as e:
-            logger.error(f"Unhandled Exception {e}")
-            status_code = 400
-            response_body = {"error": str(e)}
-    else:
-        logger.error("httpMethod not present in request.")
-        status_code = 400
-        response_body = {"error": "httpMethod not present in request."}
-    
-    response = {
-        "statusCode": status_code,
-        "headers": {
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'OPTIONS,POST,GET',
-            "Content-type": 'application/json'
-        },
-        "body": json.dumps(response_body, cls=DecimalEncoder)
-    }
-
-    return response
\ No newline at end of file
+    logger.info(f"event {event}")
+    return handle_request(ROUTES, event)
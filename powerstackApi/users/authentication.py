@@ -1,11 +1,19 @@
 from functions import *
 
 # ---------- GLOBALS ----------
-POOL_SECRET = json.loads(get_secret('powerstack_pool', 'us-east-2'))
-COGNITO_CLIENT = boto3.client('cognito-idp')
-USER_POOL_ID = POOL_SECRET["powerstack_pool_id"]
-USER_CLIENT_ID = POOL_SECRET["powerstack_client_id"]
-USER_CLIENT_SECRET = POOL_SECRET["powerstack_client_secret"]
+# The pool secret and the Cognito client are loaded on first use, not at import, so
+# routes that never touch Cognito don't pay for them on a cold start
+_COGNITO_CLIENT = None
+_COGNITO_CLIENT_LOCK = threading.Lock()
+
+
+def get_cognito_client():
+    global _COGNITO_CLIENT
+    if _COGNITO_CLIENT is None:
+        with _COGNITO_CLIENT_LOCK:
+            if _COGNITO_CLIENT is None:
+                _COGNITO_CLIENT = boto3.client('cognito-idp')
+    return _COGNITO_CLIENT
 
 
 # ---------- AUTH FUNCTIONS ----------
@@ -26,7 +34,8 @@ def user_login(data):
         # Get id token for access
         id_token = get_id_token(username, password)
 
-        user_info = user_check(id_token)
+        # verifying here also caches the claims for the dashboard calls that follow
+        user_info = user_check(decode_token(id_token))
         if user_info['user_info']['isActive'] is False:
             raise AccountDeactivatedException
         else:
@@ -47,6 +56,8 @@ def user_signup(data):
         JSON : Success / Error msg
     """
     try:
+        user_pool_id, client_id, client_secret = pool_config()
+        cognito_client = get_cognito_client()
         username = data.get('username')
         password = data.get('password')
         email = data.get('email')
@@ -55,26 +66,19 @@ def user_signup(data):
         first_name = data.get('first_name')
         last_name = data.get('last_name')
 
-        # Delete unconfirmed user if any
-        unconfirmed_list = get_unconfirmed_users(USER_POOL_ID, COGNITO_CLIENT)
-        email_unconfirmed = any(user_dict['Email'] == email for user_dict in unconfirmed_list)
-        if email_unconfirmed:
-            for user_dict in unconfirmed_list:
-                if email == user_dict['Email']:
-                    delete_user(USER_POOL_ID, user_dict['Username'], COGNITO_CLIENT)
-
-        # Check if a user with the same email already exists
-        existing_user = None
-        existing_user = get_user_by_email(email, COGNITO_CLIENT, USER_POOL_ID)
-
+        # One targeted lookup instead of listing every unconfirmed user in the pool:
+        # a confirmed account blocks the signup, an abandoned unconfirmed one is replaced
+        existing_user = get_user_by_email(email, cognito_client, user_pool_id)
         logger.info(existing_user)
         if existing_user:
             user_status = existing_user['user_status']
             if user_status == 'CONFIRMED':
                 raise AccountExistsException
+            if user_status == 'UNCONFIRMED':
+                delete_user(user_pool_id, existing_user['username'], cognito_client)
 
         # Calculate the SECRET_HASH
-        secret_hash = calculate_secret_hash(username, USER_CLIENT_ID, USER_CLIENT_SECRET)
+        secret_hash = calculate_secret_hash(username, client_id, client_secret)
 
         # Create the user
         user_attributes = [
@@ -85,13 +89,23 @@ def user_signup(data):
             {'Name': 'family_name', 'Value': last_name},
         ]
 
-        response = COGNITO_CLIENT.sign_up(
-            ClientId=USER_CLIENT_ID,
-            Username=username,
-            Password=password,
-            UserAttributes=user_attributes,
-            SecretHash=secret_hash
-        )
+        sign_up_params = {
+            'ClientId': client_id,
+            'Username': username,
+            'Password': password,
+            'UserAttributes': user_attributes,
+            'SecretHash': secret_hash
+        }
+        try:
+            response = cognito_client.sign_up(**sign_up_params)
+        except cognito_client.exceptions.UsernameExistsException:
+            # Username held by an earlier signup that was never confirmed (possibly with
+            # another email): replace it, otherwise the username is taken
+            existing_user = get_user_by_email(username, cognito_client, user_pool_id)
+            if not existing_user or existing_user['user_status'] != 'UNCONFIRMED':
+                raise AccountExistsException
+            delete_user(user_pool_id, existing_user['username'], cognito_client)
+            response = cognito_client.sign_up(**sign_up_params)
         logger.info(response)
 
         return {"message": "User created successfully"}
@@ -110,13 +124,15 @@ def confirm_sign_up(data):
         JSON : Status msg / IdToken
     """
     try:
+        user_pool_id, client_id, client_secret = pool_config()
+        cognito_client = get_cognito_client()
         username = data.get('username')
         verification_code = data.get('verification_code')
         password = data.get('password')
-        secret_hash = calculate_secret_hash(username, USER_CLIENT_ID,USER_CLIENT_SECRET)
+        secret_hash = calculate_secret_hash(username, client_id,client_secret)
         # Confirm user sign up
-        COGNITO_CLIENT.confirm_sign_up(
-            ClientId=USER_CLIENT_ID,
+        cognito_client.confirm_sign_up(
+            ClientId=client_id,
             Username=username,
             ConfirmationCode=verification_code,
             SecretHash=secret_hash
@@ -127,7 +143,7 @@ def confirm_sign_up(data):
 
 
         # Create the user in DB
-        user_check(id_token)
+        user_check(decode_token(id_token))
 
         return {
             'message': 'Sign-up confirmed and user authenticated successfully', 
@@ -148,19 +164,21 @@ def forgot_password_request(data):
         JSON : Success / Error msg
     """
     try:
+        user_pool_id, client_id, client_secret = pool_config()
+        cognito_client = get_cognito_client()
         username_or_email = data.get('username')
 
         is_email = '@' in username_or_email
         if is_email:
-            user_attributes = get_user_by_email(username_or_email, COGNITO_CLIENT, USER_POOL_ID)
+            user_attributes = get_user_by_email(username_or_email, cognito_client, user_pool_id)
             if user_attributes is None:
                 raise UserNotFoundException
             else:
                 username_or_email = user_attributes.get('username')
 
-        secret_hash = calculate_secret_hash(username_or_email, USER_CLIENT_ID,USER_CLIENT_SECRET)
-        response = COGNITO_CLIENT.forgot_password(
-            ClientId=USER_CLIENT_ID,
+        secret_hash = calculate_secret_hash(username_or_email, client_id,client_secret)
+        response = cognito_client.forgot_password(
+            ClientId=client_id,
             Username=username_or_email,
             SecretHash=secret_hash
         )
@@ -182,21 +200,23 @@ def reset_password(data):
         JSON : Success / Error msg
     """
     try:
+        user_pool_id, client_id, client_secret = pool_config()
+        cognito_client = get_cognito_client()
         username = data.get('username')
         verification_code = data.get('verification_code')
         new_password = data.get('new_password')
 
         is_email = '@' in username
         if is_email:
-            user_attributes = get_user_by_email(username, COGNITO_CLIENT, USER_POOL_ID)
+            user_attributes = get_user_by_email(username, cognito_client, user_pool_id)
             if user_attributes is None:
                 raise UserNotFoundException
             else:
                 username = user_attributes.get('username')
 
-        secret_hash = calculate_secret_hash(username, USER_CLIENT_ID,USER_CLIENT_SECRET)
-        response = COGNITO_CLIENT.confirm_forgot_password(
-            ClientId=USER_CLIENT_ID,
+        secret_hash = calculate_secret_hash(username, client_id,client_secret)
+        response = cognito_client.confirm_forgot_password(
+            ClientId=client_id,
             Username=username,
             ConfirmationCode=verification_code,
             Password=new_password,
@@ -221,41 +241,42 @@ def get_id_token(username, password):
         string : id_token
     """
     try:
-        # Check if user unconfirmed / redirect to sign up
-        unconfirmed_list = get_unconfirmed_users(USER_POOL_ID, COGNITO_CLIENT)
-
-        # Check if the identifier is an email
+        user_pool_id, client_id, client_secret = pool_config()
+        cognito_client = get_cognito_client()
+        # Emails are resolved to the username (see get_user_by_email), which also gives the
+        # status; usernames go straight to initiate_auth, which rejects unconfirmed users
         is_email = '@' in username
         if is_email:
-            # Check if email unconfirmed
-            email_unconfirmed = any(user_dict['Email'] == username for user_dict in unconfirmed_list)
-            if email_unconfirmed:
-                raise IncompleteSignupException
-            
-            user_attributes = get_user_by_email(username, COGNITO_CLIENT, USER_POOL_ID)
+            user_attributes = get_user_by_email(username, cognito_client, user_pool_id)
             if user_attributes is None:
                 raise UserNotFoundException
-            else:
-                username = user_attributes.get('username')
-        else:
-            # Check if username unconfirmed
-            username_unconfirmed = any(user_dict['Username'] == username for user_dict in unconfirmed_list)
-            if username_unconfirmed:
+            if user_attributes.get('user_status') == 'UNCONFIRMED':
                 raise IncompleteSignupException
-            
+            username = user_attributes.get('username')
+
         # Calculate the SECRET_HASH
-        secret_hash = calculate_secret_hash(username, USER_CLIENT_ID, USER_CLIENT_SECRET)
-
-        auth_response = COGNITO_CLIENT.initiate_auth(
-            AuthFlow='USER_PASSWORD_AUTH',
-            AuthParameters={
-                'USERNAME': username,
-                'PASSWORD': password,
-                'SECRET_HASH': secret_hash
-            },
-            ClientId=USER_CLIENT_ID
-        )
+        secret_hash = calculate_secret_hash(username, client_id, client_secret)
+
+        try:
+            auth_response = cognito_client.initiate_auth(
+                AuthFlow='USER_PASSWORD_AUTH',
+                AuthParameters={
+                    'USERNAME': username,
+                    'PASSWORD': password,
+                    'SECRET_HASH': secret_hash
+                },
+                ClientId=client_id
+            )
+        except cognito_client.exceptions.UserNotConfirmedException:
+            raise IncompleteSignupException
         id_token = auth_response['AuthenticationResult']['IdToken']
         return id_token
     except Exception as e:
-        error_format(e)
\ No newline at end of file
+        error_format(e)
+
+
+# ---------- PREWARM ----------
+def prewarm_cognito(open_connections=False):
+    """ Cognito client and the pool secret, so the first auth request only talks to Cognito. """
+    get_cognito_client()
+    pool_config()
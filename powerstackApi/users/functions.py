@@ -1,3 +1,4 @@
+import os
 import uuid
 import boto3
 import logging
@@ -44,21 +45,26 @@ logger.setLevel(logging.INFO)
 USERS_TABLE = 'powerstackUsers'
 PURCHASE_TABLE = 'powerstackPurchases'
 TICKETS_TABLE = 'powerstackTickets'
+COUNTERS_TABLE = 'powerstackCounters'
+
+# ---------- SEQUENCES ----------
+TICKET_SEQUENCE = 'ticketID'
+TICKET_ID_BLOCK_SIZE = int(os.environ.get('TICKET_ID_BLOCK_SIZE', 1)) # > 1 to reserve ids in blocks for bursts
+TICKET_ID_ATTEMPTS = 5 # ids already taken (e.g. by tickets numbered before the counter) are skipped
 
 # ---------- GENERAL FUNCTIONS ----------
 
-def user_check(id_token):
+def user_check(decoded_token):
     """
     Dashboard function - gets user info from DB if user exists.
     If user doesn't exist, creates user profile in DB
 
     Args:
-        id_token (string)
+        decoded_token (dict): verified token claims
 
     Returns:
         JSON : success message
     """
-    decoded_token = decode_token(id_token)
 
     try:
         email = decoded_token['email']
@@ -67,13 +73,16 @@ def user_check(id_token):
         first_name = decoded_token.get('given_name', None)
         last_name = decoded_token.get('family_name', None)
         
-        if check_item_exists(USERS_TABLE, 'email', email):
-            user = get_items_by_attribute(USERS_TABLE, 'email', email)[0]
+        user = get_user_by_email_index(USERS_TABLE, email)
+        if user is not None:
             user['walletBalance'] = float(user.get('walletBalance'))
 
             user_id = user.get('userID')
 
-            update_table_item(USERS_TABLE, 'userID', user_id, 'lastLogin', format_date_time('Africa/Lagos'))
+            update_item_attributes(USERS_TABLE, 'userID', user_id, {
+                'lastLogin': format_date_time('Africa/Lagos'),
+                'lastLoginEpochMs': epoch_ms_now()
+            })
             
             return {'user_info': user, 'message': 'User info retrieved.'}
         else:    
@@ -86,17 +95,20 @@ def user_check(id_token):
                 'lastName': last_name,
                 'isActive': True,
                 'lastLogin': format_date_time('Africa/Lagos'),
+                'lastLoginEpochMs': epoch_ms_now(),
                 'walletBalance': 0,
                 'meters': []
             }
             
+            # GSI key attributes (phoneNumber, userType) can't be stored as NULL
+            user_attributes = {key: value for key, value in user_attributes.items() if value is not None}
             insert_data(USERS_TABLE, user_attributes)
             return {'message': 'User added to database.'}
     except Exception as e:
         error_format(e)
 
 
-def purchase_history(id_token):
+def purchase_history(decoded_token, query_params):
     """
         Returns list of purchases based on user email.
         Used for both REGULAR and MERCHANT accts
@@ -104,37 +116,40 @@ def purchase_history(id_token):
         :return: list of past purchases
     """
     """
-    Returns list of purchases based on user email.
+    Returns a page of purchases based on user email.
     Used for both REGULAR and MERCHANT accts
 
     Args:
-        string: id_token
+        decoded_token (dict): verified token claims
+        query_params (dict): limit, nextToken (from the previous page)
 
     Returns:
-        JSON: list of all user purchases
+        JSON: user purchases on this page and nextToken (None on the last page)
     """
-    decoded_token = decode_token(id_token)
     try:
         email_attr = 'email'
         email = decoded_token[email_attr] #use email as main query method
-        purchase_list = get_items_by_attribute(PURCHASE_TABLE, email_attr, email)
-        return {'message': purchase_list}
+        purchase_list, next_token = get_items_by_attribute_page(
+            PURCHASE_TABLE, email_attr, email,
+            limit=query_params.get('limit'),
+            next_token=query_params.get('nextToken')
+        )
+        return {'message': purchase_list, 'nextToken': next_token}
     except Exception as e:
         error_format(e)
     
 
-def add_meter(id_token, data):
+def add_meter(decoded_token, data):
     """
     Adds meter to user account.
 
     Args:
-        id_token (string): id token 
+        decoded_token (dict): verified token claims
         data (dict): meterName, meterNumber, meterType, meterLocation
 
     Returns:
         JSON : success / error info
     """
-    decoded_token = decode_token(id_token)
 
     try:
         email = decoded_token['email']
@@ -147,7 +162,9 @@ def add_meter(id_token, data):
             'meterLocation': data.get('meterLocation', None)
         }
 
-        user = get_items_by_attribute(USERS_TABLE, 'email', email)[0]
+        user = get_user_by_email_index(USERS_TABLE, email, projection=['userID', 'meters'])
+        if user is None:
+            raise UserNotFoundException
         user_id = user.get('userID')
         meters = user.get('meters')
 
@@ -164,18 +181,17 @@ def add_meter(id_token, data):
         error_format(e)
 
 
-def remove_meter(id_token, data):
+def remove_meter(decoded_token, data):
     """
     Removes meter from meters list
 
     Args:
-        id_token (string): id token 
+        decoded_token (dict): verified token claims
         data (dict): meterName, meterNumber, meterType, meterLocation
 
     Returns:
         JSON: success / error msg
     """
-    decoded_token = decode_token(id_token)
 
     try:
         email = decoded_token['email']
@@ -183,8 +199,9 @@ def remove_meter(id_token, data):
         meter_number = data['meterNumber']
         
 
-        user = get_items_by_attribute(USERS_TABLE, 'email', email)[0]
-        user_id = user.get('userID')
+        user_id = get_user_id_by_email(USERS_TABLE, email)
+        if user_id is None:
+            raise UserNotFoundException
         
         remove_item_from_list(USERS_TABLE,'userID', user_id, 'meters', meter_number)
         return {'message': 'Meter removed!'}
@@ -193,12 +210,12 @@ def remove_meter(id_token, data):
         error_format(e)
     
 
-def submit_ticket(id_token, data):
+def submit_ticket(decoded_token, data):
     """
     Allows user to create and submit tickets.
 
     Args:
-        id_token (string): id_token
+        decoded_token (dict): verified token claims
         data (dict): details 
 
     Returns:
@@ -207,48 +224,75 @@ def submit_ticket(id_token, data):
     #TODO: Implement email notifications for customer service email with tix info , add func. for claiming / updating tix status.
     # Submit ticket to table > Trigger Email notif > Customer service rep can reply > update the ticket status
 
-    decoded_token = decode_token(id_token)
 
     try:
-        item_count = get_item_count(TICKETS_TABLE) + 1
         email = decoded_token['email']
         user_type = decoded_token['custom:userType']
-        ticket_id = 'PST-' + str(item_count)
-        ticket_data = {
-            'ticketID': ticket_id,
-            'email': email,
-            'userType': user_type,
-            'details': data.get('details', None),
-            'ticketStatus': 'NEW'  
-        }
-        insert_data(TICKETS_TABLE, ticket_data)
-        # trigger email here
-        return {'message': f'Ticket ID: {ticket_id}'}
+        for _ in range(TICKET_ID_ATTEMPTS):
+            ticket_number = next_sequence_value(COUNTERS_TABLE, TICKET_SEQUENCE, block_size=TICKET_ID_BLOCK_SIZE,
+                                                seed=highest_ticket_number)
+            ticket_id = 'PST-' + str(ticket_number)
+            ticket_data = {
+                'ticketID': ticket_id,
+                'email': email,
+                'userType': user_type,
+                'details': data.get('details', None),
+                'ticketStatus': 'NEW'
+            }
+            if insert_new_item(TICKETS_TABLE, ticket_data, 'ticketID'):
+                # trigger email here
+                return {'message': f'Ticket ID: {ticket_id}'}
+            logger.info(f"Ticket ID {ticket_id} already taken, trying the next one")
+        raise CustomException(code='TicketIdUnavailable', message='Could not assign a ticket ID, please try again.')
     except Exception as e:
         error_format(e)
 
 
+def highest_ticket_number():
+    """ Seed for the ticket counter: the largest n of the existing PST-<n> ticket IDs. """
+    highest = 0
+    for ticket in scan_items(TICKETS_TABLE, projection=['ticketID']):
+        number = str(ticket['ticketID']).replace('PST-', '', 1)
+        if number.isdigit():
+            highest = max(highest, int(number))
+    return highest
+
+
 def get_receipt(query_params):
     """
-    Gets single purchase info from purchase table with txnRef
+    Gets single purchase info from purchase table with txnRef,
+    or several at once with a comma separated txnRefs
 
     Args:
         id_token (string): id_token
-        query_params (dict): txnRef
+        query_params (dict): txnRef / txnRefs
 
     Returns:
-        JSON: receipt / error msg
+        JSON: receipt(s) / error msg
     """
     # TODO: take out idToken here
     #decoded_token = decode_token(id_token)
     reference = query_params.get('txnRef')
+    references = query_params.get('txnRefs')
 
     try:
-        receipt_list = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', reference)
-        if (receipt_list):
-            receipt = receipt_list[0]
-        else:
+        if references:
+            keys = [{'purchaseID': ref.strip()} for ref in references.split(',') if ref.strip()]
+            receipts = batch_get_items(PURCHASE_TABLE, keys, consistent_read=True)
+            return {'message': 'Receipts retrieved', 'transaction_data': receipts}
+
+        receipt = get_item(PURCHASE_TABLE, {'purchaseID': reference}, consistent_read=True)
+        if receipt is None:
             raise InvalidReferenceException
         return {'message': 'Receipt retrieved', 'transaction_data': receipt}
     except Exception as e:
-        error_format(e)
\ No newline at end of file
+        error_format(e)
+
+
+# ---------- PREWARM ----------
+def prewarm_clients(open_connections=False):
+    """ DynamoDB client, resource and Tables for this Lambda, built ahead of the first request. """
+    prewarm_dynamodb(
+        [USERS_TABLE, PURCHASE_TABLE, TICKETS_TABLE, COUNTERS_TABLE, ACTIVITY_TABLE],
+        ping_key=(USERS_TABLE, 'userID') if open_connections else None
+    )
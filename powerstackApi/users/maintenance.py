@@ -0,0 +1,52 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from authentication import *
+
+"""
+    Offline housekeeping for the user pool, run on a schedule (EventBridge -> this
+    module's lambda_handler) or by hand:
+
+        powerstackApi/users$ python maintenance.py [--dry-run]
+
+    Signups that were never confirmed used to be found by listing every unconfirmed user
+    on each login and signup. Request paths now look users up one at a time, and the
+    leftovers are cleared here instead.
+"""
+
+# ---------- SWEEPER CONFIG ----------
+UNCONFIRMED_MAX_AGE_HOURS = int(os.environ.get('UNCONFIRMED_MAX_AGE_HOURS', '72'))
+
+
+def sweep_unconfirmed_users(max_age_hours=UNCONFIRMED_MAX_AGE_HOURS, dry_run=False):
+    """
+    Deletes UNCONFIRMED users created more than max_age_hours ago. Newer ones are left
+    alone so a user who is still waiting on their verification code can finish.
+
+    Returns:
+        dict: usernames deleted (or that would be, on a dry run) and how many were kept
+    """
+    user_pool_id = pool_config()[0]
+    cognito_client = get_cognito_client()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+    deleted, kept = [], 0
+    for user in get_unconfirmed_users(user_pool_id, cognito_client):
+        created = user.get('UserCreateDate')
+        if created is None or created > cutoff:
+            kept += 1
+            continue
+        if not dry_run:
+            delete_user(user_pool_id, user['Username'], cognito_client)
+        deleted.append(user['Username'])
+
+    logger.info(f"Unconfirmed user sweep: {len(deleted)} deleted, {kept} kept (dry_run={dry_run})")
+    return {'deleted': deleted, 'kept': kept}
+
+
+def lambda_handler(event, context):
+    return sweep_unconfirmed_users(dry_run=bool((event or {}).get('dry_run')))
+
+
+if __name__ == '__main__':
+    print(sweep_unconfirmed_users(dry_run='--dry-run' in sys.argv))
@@ -1,3 +1,4 @@
+import base64
 import random
 
 from functions import *
@@ -5,6 +6,12 @@ from functions import *
 # ---------- FEES (MERCHANT COMMISSION) ----------
 COMMISSION = 0.01 # 1%
 
+# ---------- CONFIRMATION ----------
+# Polls leave a new payment to the webhook for this long before asking Paystack themselves
+WEBHOOK_GRACE_SECONDS = int(os.environ.get('PAYSTACK_WEBHOOK_GRACE_SECONDS', 20))
+# Paystack statuses of a payment that may still succeed
+PAYSTACK_PENDING_STATUSES = ('ongoing', 'pending', 'processing', 'queued')
+
 # ---------- PAYMENT FUNCTIONS ----------
 def initialize_pay_with_platform(data):
     """
@@ -54,6 +61,7 @@ def initialize_pay_with_platform(data):
         purchase_data["purchaseID"] = tx_ref
         purchase_data["amount"] = str(float(amount) / 100) # amount to naira
         purchase_data["status"] = "Initialized"
+        purchase_data["initializedEpochMs"] = epoch_ms_now()
         insert_data(PURCHASE_TABLE, purchase_data)
 
         callback_url = "http://127.0.0.1:5000/receipt/" + tx_ref + "?confirm=true"
@@ -65,16 +73,121 @@ def initialize_pay_with_platform(data):
         error_format(e)
 
 
+def paystack_metadata(data):
+    """ Transaction metadata as a dict; it is sent JSON-encoded, and comes back as sent. """
+    metadata = data.get('metadata') or {}
+    while isinstance(metadata, str):
+        metadata = json.loads(metadata) if metadata else {}
+    return metadata
+
+
+def finalize_platform_payment(data, stored_purchase):
+    """
+    Records a successful Paystack transaction once: takes out fees, credits the wallet for
+    wallet funding, vends for simple payments and stores the confirmed purchase. Shared by
+    the webhook and confirm_pay_with_platform; whichever gets there first does the work,
+    the other finds the purchase already Confirmed.
+
+    Args:
+        data (dict): Paystack transaction (verify response or charge.success event data)
+        stored_purchase (dict): the purchase as written by initialize_pay_with_platform
+
+    Returns:
+        dict : message and receipt
+    """
+    tx_ref = stored_purchase['purchaseID']
+    if stored_purchase.get("status") != "Initialized":
+        return {'message': "Transaction already stored", 'receipt': stored_purchase}
+
+    metadata = paystack_metadata(data)
+
+    platform_fees = float(data.get('fees') or 0) / 100 # to Naira from Kobo
+    amount = float(data.get('amount')) / 100 # to Naira from Kobo
+    transaction_date = data.get('transaction_date') or data.get('paid_at')
+    email = data.get("customer").get("email")
+
+    phone_number = metadata.get("phone_number", stored_purchase.get("phone_number"))
+    platform = metadata.get("platform", stored_purchase.get("platform"))
+    meter_number = metadata.get("meter_number", stored_purchase.get("meter_number"))
+    meter_type = metadata.get("meter_type", stored_purchase.get("meter_type"))
+    location = metadata.get("location", stored_purchase.get("location"))
+    tx_type = metadata.get("tx_type", stored_purchase.get("tx_type"))
+
+    purchase_data = {
+        "purchaseID": tx_ref,
+        "amount": str(amount),
+        "email": email,
+        "phoneNumber": phone_number,
+        "purchaseDate": transaction_date,
+        "purchaseEpochMs": to_epoch_ms(transaction_date) or epoch_ms_now(),
+        "paymentMethod": platform,
+        "txnType": tx_type,
+        "platformFees": str(platform_fees),
+        "status": "Confirmed"
+    }
+
+    # ---------- SIMPLE PAYMENT ----------
+    if tx_type == "Simple":
+        # Take out fees from amnt (service fee + platform fee then vend electricity)
+
+        unit_amount = float(amount) - service_fee(amount) - float(platform_fees) # amount paid - service fee - platform fees
+        purchase_data['units'] = str(unit_amount)
+        purchase_data['serviceFee'] = str(service_fee(amount))
+        purchase_data['meterNumber'] = meter_number
+        purchase_data['meterType'] = meter_type
+        purchase_data['location'] = location
+
+        # TODO: remove (temporary) - replace with token vending here
+        token = random.randint(10**11, (10**12)-1)
+        purchase_data['token'] = token
+
+    # ---------- FUND WALLET + ADD PAYMENT TO DB ----------
+    # One transaction, only while the purchase is still Initialized
+    if tx_type == "Wallet":
+        # Funding wallets  (leave amount as is will take out fees when purchasing from wallet)
+
+        user_id = get_user_id_by_email(USERS_TABLE, email)
+        if user_id is None:
+            raise UserNotFoundException
+
+        confirmed = transact_confirm_purchase(PURCHASE_TABLE, purchase_data, USERS_TABLE, 'userID', user_id, credit=amount)
+    else:
+        confirmed = transact_confirm_purchase(PURCHASE_TABLE, purchase_data)
+
+    if confirmed is None:
+        receipt = get_item(PURCHASE_TABLE, {'purchaseID': tx_ref}, consistent_read=True)
+        return {'message': "Transaction already stored", 'receipt': receipt}
+
+    # ---------- RETURN RECEIPT ----------
+    return {'message': 'Payment successful!', 'transaction_data': confirmed}
+
+
 def confirm_pay_with_platform(query_params):
     """
         Checks if payment went through, if so:
          - take out fees, manage commissions >  adds payment to our DB > if wallet funds update wallet
          - vend tokens > return receipts
          - add k electric specific data points to store in DB on reception of apis
+
+        Payments are normally confirmed by paystack_webhook, so this is a status read. Paystack
+        is only asked once a purchase has been Initialized for WEBHOOK_GRACE_SECONDS (webhook
+        late or lost).
+        A payment that isn't settled yet is a normal answer, not an error: the response is
+        {'status': 'pending'} and the client polls again.
     """
     tx_ref = query_params.get('txnRef')
 
     try:
+        stored_purchase = get_item(PURCHASE_TABLE, {'purchaseID': tx_ref}, consistent_read=True)
+        if stored_purchase is None:
+            raise InvalidReferenceException
+        elif stored_purchase.get("status") == "Confirmed":
+            return {'message': 'Payment successful!', 'transaction_data': stored_purchase}
+
+        initialized_ms = stored_purchase.get("initializedEpochMs")
+        if initialized_ms is not None and epoch_ms_now() - int(initialized_ms) < WEBHOOK_GRACE_SECONDS * 1000:
+            return pending_payment(tx_ref)
+
         response = paystack_confirm_payment(tx_ref)
 
         message = response.get('message')
@@ -83,97 +196,74 @@ def confirm_pay_with_platform(query_params):
         transaction_status = data.get('status')
 
         if message == "Verification successful" and transaction_status == "success":
+            return finalize_platform_payment(data, stored_purchase)
+        elif transaction_status in PAYSTACK_PENDING_STATUSES:
+            return pending_payment(tx_ref)
+        else:
+            raise CustomException(
+                code='PaymentStatus',
+                message = "Transaction status: " + transaction_status
+            )
+    except Exception as e:
+        error_format(e)
 
-            metadata = json.loads(data.get('metadata'))
-
-            platform_fees = float(data.get('fees')) / 100 # to Naira from Kobo
-            amount = float(data.get('amount')) / 100 # to Naira from Kobo
-            transaction_date = data.get('transaction_date')
-            email = data.get("customer").get("email")
-
-            phone_number = metadata.get("phone_number")
-            platform = metadata.get("platform")
-            meter_number = metadata.get("meter_number")
-            meter_type = metadata.get("meter_type")
-            location = metadata.get("location")
-            tx_type = metadata.get("tx_type")
-
-            purchase_data = {
-                "purchaseID": tx_ref,
-                "amount": str(amount),
-                "email": email,
-                "phoneNumber": phone_number,
-                "purchaseDate": transaction_date,
-                "paymentMethod": platform,
-                "txnType": tx_type,
-                "platformFees": str(platform_fees)
-            }
-
-            # ---------- SIMPLE PAYMENT ----------
-            if tx_type == "Simple":
-                # Take out fees from amnt (service fee + platform fee then vend electricity)
-
-                unit_amount = float(amount) - service_fee(amount) - float(platform_fees) # amount paid - service fee - platform fees
-                purchase_data['units'] = str(unit_amount)
-                purchase_data['serviceFee'] = str(service_fee(amount))
-                purchase_data['meterNumber'] = meter_number
-                purchase_data['meterType'] = meter_type
-                purchase_data['location'] = location
-
-                # TODO: remove (temporary) - replace with token vending here
-                token = random.randint(10**11, (10**12)-1)
-                purchase_data['token'] = token
-        
 
-            # ---------- FUND WALLET ----------
-            if tx_type == "Wallet":
-                # Funding wallets  (leave amount as is will take out fees when purchasing from wallet)
+def pending_payment(tx_ref):
+    return {'status': 'pending', 'message': 'Transaction status: pending', 'txnRef': tx_ref}
 
-                user = get_items_by_attribute(USERS_TABLE, 'email', email)[0]
 
-                user_id = user.get('userID')
-                wallet_balance = float(user.get('walletBalance'))
+def paystack_webhook(event):
+    """
+    Paystack pushes transaction events here (the webhook URL set on the Paystack dashboard).
+    The raw body must carry a valid x-paystack-signature before anything in it is read.
+    charge.success finalizes the purchase; other events are acknowledged and ignored.
+    Paystack resends an event until it gets a 200, and a resend finds the purchase Confirmed.
 
-                new_wallet_balance = str(wallet_balance + float(amount))
-                update_table_item(USERS_TABLE, 'userID', user_id, 'walletBalance', new_wallet_balance)
+    Args:
+        event (dict): API Gateway event
 
-                purchase_data['wallet_balance'] = new_wallet_balance
-        
-            # ---------- ADD PAYMENT TO DB ----------
-            stored_purchase = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', tx_ref)[0]
-            if stored_purchase.get("status") == "Initialized":
-                purchase_data["status"] = "Confirmed"
-                insert_data(PURCHASE_TABLE, purchase_data)
-
-            else:
-                return {'message': "Transaction already stored", 'receipt': stored_purchase}
-        
-            # ---------- RETURN RECEIPT ----------   
-            receipt = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', tx_ref)[0]                                                                     
-            return {'message': 'Payment successful!', 'transaction_data': receipt}
-        else:
-            raise CustomException(
-                code='PaymentStatus',
-                message = "Transaction status: " + transaction_status
-            )
+    Returns:
+        dict : message (and receipt for a confirmed charge)
+    """
+    try:
+        raw_body = event.get('body') or ''
+        raw_body = base64.b64decode(raw_body) if event.get('isBase64Encoded') else raw_body.encode()
+        headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+
+        if not paystack_signature_valid(raw_body, headers.get('x-paystack-signature')):
+            raise InvalidSignatureException
+
+        payload = json.loads(raw_body)
+        event_type = payload.get('event')
+        data = payload.get('data') or {}
+        if event_type != 'charge.success' or data.get('status') != 'success':
+            return {'message': f'Ignored event {event_type}'}
+
+        reference = data.get('reference')
+        stored_purchase = get_item(PURCHASE_TABLE, {'purchaseID': reference}, consistent_read=True) if reference else None
+        if stored_purchase is None:
+            # Not one of ours (or no reference at all), a resend won't change that
+            logger.info(f"Webhook for unknown reference {reference}")
+            return {'message': 'Ignored unknown reference'}
+
+        return finalize_platform_payment(data, stored_purchase)
     except Exception as e:
         error_format(e)
 
 
-def pay_with_wallet(id_token, data):
+def pay_with_wallet(decoded_token, data):
     # if merchant 1% discount on all transactions ( will not take out the full amount - will take out amount - 1%)
     # vend token
     # may add fcn to get total commission earned
     # show reciept, add data to purchases, update wallet balance in user
-    decoded_token = decode_token(id_token)
     email = decoded_token.get('email')
     phone_number = decoded_token.get('phone_number')
     user_type = decoded_token.get('custom:userType')
     
     try:
-        user = get_items_by_attribute(USERS_TABLE, 'email', email)[0]
-        user_id = user.get('userID')
-        wallet_balance = float(user.get('walletBalance'))
+        user_id = get_user_id_by_email(USERS_TABLE, email)
+        if user_id is None:
+            raise UserNotFoundException
      
         meter_number = data.get('meter_number')
         meter_type = data.get('meter_type')
@@ -189,6 +279,7 @@ def pay_with_wallet(id_token, data):
             'email': email,
             'phoneNumber': phone_number,
             'purchaseDate': format_date_time('Africa/Lagos'),
+            'purchaseEpochMs': epoch_ms_now(),
             'txnType': "Wallet",
             'meterNumber': meter_number,
             'meterType': meter_type,
@@ -197,65 +288,60 @@ def pay_with_wallet(id_token, data):
 
 
         unit_amount = amount - service_fee(amount) - platform_fee(amount)
-        new_balance = wallet_balance
+        commission = 0
     
-        if wallet_balance >= amount:
-            if user_type == 'MERCHANT':
-                customer_contact = data.get('customerContact')
-                customer_name = data.get('customerName')
-
-                
-                    #VEND ELECTRICITY HERE
-                
-                    #UPDATE WALLET VALUE
-                    
-                commission = COMMISSION * amount
-                new_balance = str(wallet_balance - amount + commission)
-             
-                #ADD INFO TO PURCHASE
-                purchase_details['units'] = str(unit_amount)
-                purchase_details['serviceFee'] = str(service_fee(amount))
-                purchase_details['platformFees'] = str(platform_fee(amount))
-                purchase_details['customerContact'] = customer_contact
-                purchase_details['customerName'] = customer_name
-                purchase_details['commission'] = str(commission)
-                purchase_details['payment_method'] = "MERCHANT"
-
-                # TODO: remove (temporary) - replace with token vending below
-                token = random.randint(10**11, (10**12)-1)
-                purchase_details['token'] = token
-
-            else:
-            
-                #VEND HERE
+        if user_type == 'MERCHANT':
+            customer_contact = data.get('customerContact')
+            customer_name = data.get('customerName')
 
-                #UPDATE WALLET VALUE
-                new_balance = str(wallet_balance - amount)
+            
+                #VEND ELECTRICITY HERE
+            
+            # Merchant keeps the commission, it is credited back in the same wallet update
+            commission = COMMISSION * amount
+         
+            #ADD INFO TO PURCHASE
+            purchase_details['units'] = str(unit_amount)
+            purchase_details['serviceFee'] = str(service_fee(amount))
+            purchase_details['platformFees'] = str(platform_fee(amount))
+            purchase_details['customerContact'] = customer_contact
+            purchase_details['customerName'] = customer_name
+            purchase_details['commission'] = str(commission)
+            purchase_details['payment_method'] = "MERCHANT"
+
+            # TODO: remove (temporary) - replace with token vending below
+            token = random.randint(10**11, (10**12)-1)
+            purchase_details['token'] = token
 
-                purchase_details['units'] = str(unit_amount)
-                purchase_details['serviceFee'] = str(service_fee(amount))
-                purchase_details['platformFees'] = str(platform_fee(amount))
-                # TODO: remove (temporary) - replace with token vending below
-                token = random.randint(10**11, (10**12)-1)
-                purchase_details['token'] = token
-        
-            # ---------- UPDATE WALLET ----------
-            update_table_item(USERS_TABLE, 'userID', user_id, 'walletBalance', new_balance)
-
-            # ---------- ADD PAYMENT TO DB ----------
-            if check_value_in_table(PURCHASE_TABLE, "purchaseID", purchase_id) == False:
-                    purchase_details["status"] = "Confirmed"
-                    insert_data(PURCHASE_TABLE, purchase_details)
-            else:
-                receipt = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', purchase_id)[0]
-                return {'message': "Transaction already stored", 'receipt': receipt}
-
-            # ---------- RETURN RECEIPT ----------
-            receipt = get_items_by_attribute(PURCHASE_TABLE, 'purchaseID', purchase_id)[0]                                                                         
-            return {'message': 'Payment successful!', 'transaction_data': receipt}
-        
         else:
-            raise InsufficientBalanceException
+        
+            #VEND HERE
+
+            purchase_details['units'] = str(unit_amount)
+            purchase_details['serviceFee'] = str(service_fee(amount))
+            purchase_details['platformFees'] = str(platform_fee(amount))
+            # TODO: remove (temporary) - replace with token vending below
+            token = random.randint(10**11, (10**12)-1)
+            purchase_details['token'] = token
+    
+        # ---------- UPDATE WALLET + ADD PAYMENT TO DB ----------
+        # One transaction: raises InsufficientBalanceException if the balance is below amount
+        purchase_details["status"] = "Confirmed"
+        receipt = transact_wallet_purchase(
+            USERS_TABLE, 'userID', user_id, amount,
+            PURCHASE_TABLE, purchase_details,
+            commission=commission
+        )
+
+        # ---------- RETURN RECEIPT ----------
+        return {'message': 'Payment successful!', 'transaction_data': receipt}
 
     except Exception as e:
-        error_format(e)
\ No newline at end of file
+        error_format(e)
+
+
+# ---------- PREWARM ----------
+def prewarm_payments(open_connections=False):
+    """ Loads the payment platform keys and the shared HTTP session ahead of the first payment. """
+    payment_key('paystack_secret_key')
+    prewarm_payment_client(open_connections)
@@ -1,13 +1,24 @@
+import os
 import json
+import time
+import queue
 import boto3
+import base64
 import random
 import decimal
 import logging
+import threading
+import collections
 
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from utils.exception_handler import *
 from utils.general_utils import *
-from boto3.dynamodb.conditions import Key, Attr
+from utils.time_utils import *
+from boto3.dynamodb.conditions import Key, Attr, ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 
 # ---------- LOGS ----------
@@ -15,26 +26,446 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # ---------- DYNAMO DB CLIENT ----------
-dynamodb =  boto3.client('dynamodb')
+"""
+    Clients are built once per Lambda container and reused across warm invocations.
+    Low-level clients are thread safe and shared. Resources and sessions are not, so
+    each thread gets its own session + resource, and Table objects are cached per thread.
+"""
+DYNAMODB_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', 25)),
+    connect_timeout=float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', 2)),
+    read_timeout=float(os.environ.get('DYNAMODB_READ_TIMEOUT', 5)),
+    tcp_keepalive=True,
+    retries={
+        'max_attempts': int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', 4)),
+        'mode': 'standard'
+    }
+)
+
+_DYNAMODB_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+_THREAD_LOCAL = threading.local()
+
+
+def get_dynamodb_client():
+    global _DYNAMODB_CLIENT
+    if _DYNAMODB_CLIENT is None:
+        with _CLIENT_LOCK:
+            if _DYNAMODB_CLIENT is None:
+                _DYNAMODB_CLIENT = boto3.client('dynamodb', config=DYNAMODB_CONFIG)
+    return _DYNAMODB_CLIENT
+
+
+def get_dynamodb_resource():
+    resource = getattr(_THREAD_LOCAL, 'resource', None)
+    if resource is None:
+        resource = boto3.session.Session().resource('dynamodb', config=DYNAMODB_CONFIG)
+        _THREAD_LOCAL.resource = resource
+        _THREAD_LOCAL.tables = {}
+    return resource
+
+
+def get_table(table_name):
+    resource = get_dynamodb_resource()
+    table = _THREAD_LOCAL.tables.get(table_name)
+    if table is None:
+        table = resource.Table(table_name)
+        _THREAD_LOCAL.tables[table_name] = table
+    return table
+
+
+PREWARM_KEY = '__prewarm__'
+
+
+def prewarm_dynamodb(table_names, ping_key=None):
+    """
+    Builds the shared client and this thread's resource and Tables ahead of the first
+    request (Lambda runs init and invocations on the same thread).
+
+    Args:
+        table_names (list): tables to build Table objects for
+        ping_key (tuple): (table_name, hash key name) to also open both connection pools
+                          with a GetItem on a key that doesn't exist; None to skip
+    """
+    client = get_dynamodb_client()
+    for table_name in table_names:
+        get_table(table_name)
+    if ping_key:
+        table_name, key_name = ping_key
+        get_table(table_name).get_item(Key={key_name: PREWARM_KEY}, ProjectionExpression='#k', ExpressionAttributeNames={'#k': key_name})
+        client.get_item(TableName=table_name, Key={key_name: {'S': PREWARM_KEY}}, ProjectionExpression='#k', ExpressionAttributeNames={'#k': key_name})
+
+
+# ---------- TABLE INDEXES ----------
+"""
+    Global secondary indexes the lookups below depend on. All project ALL attributes so
+    a lookup is a single Query with no follow-up GetItem on the base table.
+    ensure_table_indexes() creates any that are missing and drops retired ones (on-demand tables).
+"""
+EMAIL_INDEX = 'email-index'
+PHONE_INDEX = 'phoneNumber-index'
+TXN_TYPE_TIME_INDEX = 'txnType-purchaseEpochMs-index'
+USER_TYPE_LOGIN_INDEX = 'userType-lastLoginEpochMs-index'
+
+TABLE_INDEXES = {
+    'powerstackUsers': [
+        {
+            'IndexName': EMAIL_INDEX,
+            'KeySchema': [{'AttributeName': 'email', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+            'AttributeDefinitions': [{'AttributeName': 'email', 'AttributeType': 'S'}]
+        },
+        {
+            'IndexName': PHONE_INDEX,
+            'KeySchema': [{'AttributeName': 'phoneNumber', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'},
+            'AttributeDefinitions': [{'AttributeName': 'phoneNumber', 'AttributeType': 'S'}]
+        },
+        {
+            'IndexName': USER_TYPE_LOGIN_INDEX,
+            'KeySchema': [
+                {'AttributeName': 'userType', 'KeyType': 'HASH'},
+                {'AttributeName': 'lastLoginEpochMs', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+            'AttributeDefinitions': [
+                {'AttributeName': 'userType', 'AttributeType': 'S'},
+                {'AttributeName': 'lastLoginEpochMs', 'AttributeType': 'N'}
+            ]
+        },
+    ],
+    'powerstackPurchases': [
+        {
+            'IndexName': TXN_TYPE_TIME_INDEX,
+            'KeySchema': [
+                {'AttributeName': 'txnType', 'KeyType': 'HASH'},
+                {'AttributeName': 'purchaseEpochMs', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+            'AttributeDefinitions': [
+                {'AttributeName': 'txnType', 'AttributeType': 'S'},
+                {'AttributeName': 'purchaseEpochMs', 'AttributeType': 'N'}
+            ]
+        },
+    ],
+}
+
+# (table, equality attribute, display date attribute) -> (index, epoch-ms attribute)
+RANGE_INDEXES = {
+    ('powerstackPurchases', 'txnType', 'purchaseDate'): (TXN_TYPE_TIME_INDEX, 'purchaseEpochMs'),
+    ('powerstackUsers', 'userType', 'lastLogin'): (USER_TYPE_LOGIN_INDEX, 'lastLoginEpochMs'),
+}
+
+
+def ensure_table_indexes(table_name):
+    """
+    Brings a table's GSIs in line with TABLE_INDEXES: creates the listed ones that are
+    missing, then deletes the ones that aren't listed any more (e.g. the retired
+    txnType-purchaseTime-index). DynamoDB only allows one index change per UpdateTable
+    call, so call this again once the previous change has finished until it returns an
+    empty list. Tables without an entry in TABLE_INDEXES are left alone.
+
+    Returns:
+        list : names of indexes still to create or delete (the first one is in progress)
+    """
+    if table_name not in TABLE_INDEXES:
+        return []
+
+    client = get_dynamodb_client()
+    description = client.describe_table(TableName=table_name)['Table']
+    existing = [index['IndexName'] for index in description.get('GlobalSecondaryIndexes', [])]
+    listed = [index['IndexName'] for index in TABLE_INDEXES[table_name]]
+    missing = [index for index in TABLE_INDEXES[table_name] if index['IndexName'] not in existing]
+    retired = [name for name in existing if name not in listed]
+
+    if missing:
+        index = missing[0]
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=index['AttributeDefinitions'],
+            GlobalSecondaryIndexUpdates=[{
+                'Create': {
+                    'IndexName': index['IndexName'],
+                    'KeySchema': index['KeySchema'],
+                    'Projection': index['Projection']
+                }
+            }]
+        )
+        logger.info(f"Creating index {index['IndexName']} on {table_name}")
+    elif retired:
+        # only once every listed index exists, so no lookup is left without one
+        client.update_table(
+            TableName=table_name,
+            GlobalSecondaryIndexUpdates=[{'Delete': {'IndexName': retired[0]}}]
+        )
+        logger.info(f"Deleting index {retired[0]} from {table_name}")
 
-def get_all_items(table_name):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
+    return [index['IndexName'] for index in missing] + retired
+
+
+# ---------- PAGINATION ----------
+"""
+    Cursors handed to clients are the scan's LastEvaluatedKey, serialized to DynamoDB JSON
+    and base64 encoded so they stay opaque and survive Decimal keys.
+"""
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_PAGES_PER_REQUEST = 10
+
+_SERIALIZER = TypeSerializer()
+_DESERIALIZER = TypeDeserializer()
 
-    response = table.scan()
-    items = response.get('Items', [])
 
-    # If the table has more items, continue scanning
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+def encode_cursor(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    serialized = {name: _SERIALIZER.serialize(value) for name, value in last_evaluated_key.items()}
+    return base64.urlsafe_b64encode(json.dumps(serialized).encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(next_token):
+    if not next_token:
+        return None
+    try:
+        serialized = json.loads(base64.urlsafe_b64decode(next_token.encode('utf-8')))
+        return {name: _DESERIALIZER.deserialize(value) for name, value in serialized.items()}
+    except Exception:
+        raise InvalidCursorException
+
+
+def parse_page_size(limit):
+    if limit in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise CustomException(code='InvalidPageSize', message=f'Invalid page size: {limit}')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def scan_items(table_name, projection=None, **scan_kwargs):
+    """
+    Streams every item of a scan, one page in memory at a time.
+
+    Args:
+        table_name (string)
+        projection (list): attributes to return, all if None
+        scan_kwargs : any extra Scan arguments (FilterExpression, ExpressionAttributeValues, ...)
+
+    Yields:
+        dict : item
+    """
+    table = get_table(table_name)
+    scan_kwargs = with_projection(scan_kwargs, projection)
+
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def count_items(table_name, **scan_kwargs):
+    """ Counts matching items across every scan page without returning them. """
+    table = get_table(table_name)
+    count = 0
+
+    while True:
+        response = table.scan(Select='COUNT', **scan_kwargs)
+        count += response.get('Count', 0)
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return count
+
+
+def scan_page(table_name, limit=None, next_token=None, projection=None, **scan_kwargs):
+    """
+    Returns one page of up to `limit` items plus the cursor for the next page.
+    With a FilterExpression a page can come back short (at most MAX_PAGES_PER_REQUEST
+    scan calls are made per request), a None cursor means the scan is finished.
+
+    Args:
+        table_name (string)
+        limit (int / string): page size, clamped to MAX_PAGE_SIZE
+        next_token (string): cursor from the previous page
+        projection (list): attributes to return, all if None (key attributes are always added)
+
+    Returns:
+        tuple : (items, next_token)
+    """
+    table = get_table(table_name)
+    key_names = [key['AttributeName'] for key in table.key_schema]
+    if projection:
+        scan_kwargs = with_projection(scan_kwargs, list(dict.fromkeys(key_names + list(projection))))
+    limit = parse_page_size(limit)
+    start_key = decode_cursor(next_token)
+    items = []
+
+    for _ in range(MAX_PAGES_PER_REQUEST):
+        if start_key:
+            scan_kwargs['ExclusiveStartKey'] = start_key
+        response = table.scan(Limit=limit, **scan_kwargs)
         items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
 
-    return items
+        if len(items) > limit:
+            # Filtered pages can overshoot, resume right after the last item we return
+            items = items[:limit]
+            start_key = {name: items[-1][name] for name in key_names}
+        if not start_key or len(items) >= limit:
+            break
+
+    return items, encode_cursor(start_key)
+
+
+def get_all_items(table_name):
+    return list(scan_items(table_name))
+
+
+# ---------- PARALLEL SCAN ----------
+"""
+    Full-table reads split into DynamoDB scan segments, each scanned on its own thread.
+    Workers share the thread-safe low-level client (a resource per short-lived thread would
+    cost more than the scan saves), so arguments are serialized and items deserialized here.
+    Pages are streamed back through a bounded queue, so memory stays at a few pages per
+    segment however large the table is. Throttled pages are retried with full jitter
+    backoff on top of botocore's own retries.
+"""
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', 4))
+MAX_SCAN_SEGMENTS = 32
+THROTTLE_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+MAX_THROTTLE_RETRIES = 6
+
+_SEGMENT_DONE = object()
+
+
+def backoff_delay(attempt, base=0.05, cap=2.0):
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def to_client_scan_kwargs(table_name, scan_kwargs):
+    """ Turns resource-style Scan arguments (Attr conditions, python values) into client ones. """
+    scan_kwargs = dict(scan_kwargs, TableName=table_name)
+    names = dict(scan_kwargs.pop('ExpressionAttributeNames', {}))
+    values = dict(scan_kwargs.pop('ExpressionAttributeValues', {}))
+
+    condition = scan_kwargs.get('FilterExpression')
+    if isinstance(condition, ConditionBase):
+        built = ConditionExpressionBuilder().build_expression(condition)
+        scan_kwargs['FilterExpression'] = built.condition_expression
+        names.update(built.attribute_name_placeholders)
+        values.update(built.attribute_value_placeholders)
+
+    if names:
+        scan_kwargs['ExpressionAttributeNames'] = names
+    if values:
+        scan_kwargs['ExpressionAttributeValues'] = {key: _SERIALIZER.serialize(value) for key, value in values.items()}
+    return scan_kwargs
+
+
+def scan_segment_pages(table_name, segment, total_segments, scan_kwargs, stop=None):
+    client = get_dynamodb_client()
+    scan_kwargs = dict(to_client_scan_kwargs(table_name, scan_kwargs), Segment=segment, TotalSegments=total_segments)
+    attempt = 0
+
+    while stop is None or not stop.is_set():
+        try:
+            response = client.scan(**scan_kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] in THROTTLE_ERRORS and attempt < MAX_THROTTLE_RETRIES:
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            raise
+        attempt = 0
+        yield [
+            {name: _DESERIALIZER.deserialize(value) for name, value in item.items()}
+            for item in response.get('Items', [])
+        ]
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _put_until_stopped(pages, value, stop):
+    while not stop.is_set():
+        try:
+            pages.put(value, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def parallel_scan_pages(table_name, total_segments=None, **scan_kwargs):
+    """
+    Scans a whole table with `total_segments` parallel workers, a page at a time, for
+    callers that act on each page as it arrives (e.g. batch writes) instead of holding
+    the whole table.
+
+    Args:
+        table_name (string)
+        total_segments (int): degree of parallelism, defaults to SCAN_SEGMENTS
+        scan_kwargs : any extra Scan arguments (FilterExpression, ProjectionExpression, ...)
+
+    Yields:
+        list : one scan page of items, pages in no particular order
+    """
+    total_segments = max(1, min(int(total_segments or SCAN_SEGMENTS), MAX_SCAN_SEGMENTS))
+    pages = queue.Queue(maxsize=total_segments * 2)
+    stop = threading.Event()
+
+    def worker(segment):
+        try:
+            for page in scan_segment_pages(table_name, segment, total_segments, scan_kwargs, stop):
+                _put_until_stopped(pages, page, stop)
+        except Exception as e:
+            _put_until_stopped(pages, e, stop)
+        finally:
+            _put_until_stopped(pages, _SEGMENT_DONE, stop)
+
+    executor = ThreadPoolExecutor(max_workers=total_segments)
+    try:
+        for segment in range(total_segments):
+            executor.submit(worker, segment)
+
+        finished = 0
+        while finished < total_segments:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                finished += 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def parallel_scan(table_name, total_segments=None, **scan_kwargs):
+    """
+    Scans a whole table with `total_segments` parallel workers.
+
+    Args:
+        table_name (string)
+        total_segments (int): degree of parallelism, defaults to SCAN_SEGMENTS
+        scan_kwargs : any extra Scan arguments (FilterExpression, ProjectionExpression, ...)
+
+    Yields:
+        dict : item, in no particular order
+    """
+    for page in parallel_scan_pages(table_name, total_segments=total_segments, **scan_kwargs):
+        yield from page
 
 
 def insert_data(table_name, data):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
+    table = get_table(table_name)
 
     response = table.put_item(Item=data)
 
@@ -44,11 +475,28 @@ def insert_data(table_name, data):
         return "Failed to insert data."
     
 
-def get_item(table_name, item_id):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
+def insert_new_item(table_name, data, key_name):
+    """
+    Put that never overwrites an existing item.
+
+    Returns:
+        bool : False if an item with the same key already exists
+    """
+    table = get_table(table_name)
+
+    try:
+        table.put_item(Item=data, ConditionExpression=f'attribute_not_exists({key_name})')
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def get_item(table_name, item_id, consistent_read=False, projection=None):
+    table = get_table(table_name)
 
-    response = table.get_item(Key=item_id)
+    response = table.get_item(**with_projection({'Key': item_id, 'ConsistentRead': consistent_read}, projection))
     if 'Item' in response:
         item = response['Item']
         return item
@@ -56,72 +504,123 @@ def get_item(table_name, item_id):
         return None
     
 
-def get_items_by_attribute(table_name, attribute_name, attribute_value):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
-    response = table.scan(
+def item_exists(table_name, item_id, consistent_read=False):
+    """ Key lookup that only brings back the key attributes. """
+    return get_item(table_name, item_id, consistent_read=consistent_read, projection=list(item_id)) is not None
+
+
+def get_items_by_attribute(table_name, attribute_name, attribute_value, projection=None):
+    items = scan_items(
+        table_name,
+        projection=projection,
         FilterExpression=Attr(attribute_name).eq(attribute_value)
     )
 
-    items = response.get('Items', [])
-
     # Convert decimal values to strings
     items = [convert_decimal_to_string(item) for item in items]
     return items
 
 
-def get_user_id_by_phone(phone):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table('PowerstackUsers')
+def get_items_by_attribute_page(table_name, attribute_name, attribute_value, limit=None, next_token=None, projection=None):
+    """
+    One page of items matching attribute_name == attribute_value.
 
-    response = table.scan(
-        FilterExpression=Attr('phoneNumber').eq(phone)
+    Returns:
+        tuple : (items, next_token)
+    """
+    return scan_page(
+        table_name,
+        limit=limit,
+        next_token=next_token,
+        projection=projection,
+        FilterExpression=Attr(attribute_name).eq(attribute_value)
     )
 
-    items = response.get('Items', [])
+
+def get_items_by_index(table_name, index_name, key_name, key_value, limit=None, projection=None):
+    table = get_table(table_name)
+
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': Key(key_name).eq(key_value)
+    }
+    if limit:
+        query_kwargs['Limit'] = limit
+
+    response = table.query(**with_projection(query_kwargs, projection))
+    return response.get('Items', [])
+
+
+def check_item_exists_by_index(table_name, index_name, key_name, key_value):
+    table = get_table(table_name)
+
+    response = table.query(
+        IndexName=index_name,
+        KeyConditionExpression=Key(key_name).eq(key_value),
+        Select='COUNT',
+        Limit=1
+    )
+    return response.get('Count', 0) > 0
+
+
+# userID never changes for an email, so wallet paths can skip the lookup on warm containers
+_USER_ID_CACHE = collections.OrderedDict()
+USER_ID_CACHE_SIZE = 5000
+
+
+def get_user_id_by_email(table_name, email):
+    user_id = _USER_ID_CACHE.get((table_name, email))
+    if user_id is not None:
+        return user_id
+
+    items = get_items_by_index(table_name, EMAIL_INDEX, 'email', email, limit=1, projection=['userID'])
+    if not items:
+        return None
+
+    user_id = items[0]['userID']
+    _USER_ID_CACHE[(table_name, email)] = user_id
+    if len(_USER_ID_CACHE) > USER_ID_CACHE_SIZE:
+        _USER_ID_CACHE.popitem(last=False)
+    return user_id
+
+
+def get_user_by_email_index(table_name, email, projection=None):
+    items = get_items_by_index(table_name, EMAIL_INDEX, 'email', email, limit=1, projection=projection)
+    if items:
+        return items[0]
+    else:
+        return None
+
+
+def get_user_id_by_phone(phone, table_name='powerstackUsers'):
+    items = get_items_by_index(table_name, PHONE_INDEX, 'phoneNumber', phone, limit=1, projection=['userID'])
     if items:
         return items[0]['userID']
     else:
         return None
     
 def check_value_in_table(table_name, attribute_name, attribute_value):
-    try:
-        # Create a scan operation with the filter expression
-        response = dynamodb.scan(
-            TableName=table_name,
-            FilterExpression=f"{attribute_name} = :value",
-            ExpressionAttributeValues={
-                ":value": {"S": attribute_value}  # Adjust the data type as per your attribute
-            }
-        )
-
-        # Check if any items match the filter expression
-        items = response.get('Items',[])
-        return len(items) > 0
-    except Exception as e:
-        error_format(e)
+    return check_item_exists(table_name, attribute_name, attribute_value)
 
 def check_item_exists(table_name, attribute_name, attribute_value):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
-
+    """
+    Scan based existence check for non-key attributes: pages only until the first match
+    and projects just the matched attribute. Prefer item_exists / check_item_exists_by_index.
+    """
     try:
-        response = table.scan(
+        items = scan_items(
+            table_name,
+            projection=[attribute_name],
             FilterExpression=Attr(attribute_name).eq(attribute_value)
         )
-        items = response.get('Items', [])
-        if len(items) > 0:
-            return True
-        else:
-            return False
+        return next(items, None) is not None
     except Exception as e:
         error_format(e)
 
 
 def update_table_item(table_name, primary_key_name, primary_key_value, attribute_name, new_value):
     try:
-        dynamodb_resource = boto3.resource('dynamodb')
-        table = dynamodb_resource.Table(table_name)
+        table = get_table(table_name)
 
         key = {
             primary_key_name: primary_key_value
@@ -138,10 +637,23 @@ def update_table_item(table_name, primary_key_name, primary_key_value, attribute
         error_format(e)
 
 
+def update_item_attributes(table_name, primary_key_name, primary_key_value, attributes):
+    """
+    SET several attributes in one UpdateItem (e.g. a display date and its epoch-ms twin).
+    """
+    names = {f'#a{i}': name for i, name in enumerate(attributes)}
+    values = {f':a{i}': value for i, value in enumerate(attributes.values())}
+    get_table(table_name).update_item(
+        Key={primary_key_name: primary_key_value},
+        UpdateExpression='SET ' + ', '.join(f'#a{i} = :a{i}' for i in range(len(attributes))),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+
 def add_item_to_list(table_name, primary_key_name, primary_key_value, attribute_name, items_to_add):
     try:
-        dynamodb_resoure = boto3.resource('dynamodb')
-        table = dynamodb_resoure.Table(table_name)
+        table = get_table(table_name)
 
         # Update values in the item
         key = {primary_key_name: primary_key_value}
@@ -159,11 +671,12 @@ def add_item_to_list(table_name, primary_key_name, primary_key_value, attribute_
 
 def remove_item_from_list(table_name, primary_key_name, primary_key_value, attribute_name, item_to_remove):
     try:
-        dynamodb_resource = boto3.resource('dynamodb')
-        table = dynamodb_resource.Table(table_name)
+        table = get_table(table_name)
 
-        # Get the existing list
-        response = table.get_item(Key={primary_key_name: primary_key_value})
+        # Get the existing list (only the list attribute)
+        response = table.get_item(
+            **with_projection({'Key': {primary_key_name: primary_key_value}, 'ConsistentRead': True}, [attribute_name])
+        )
         existing_list = response['Item'].get(attribute_name, [])
         logger.info(existing_list)
 
@@ -191,22 +704,592 @@ def remove_item_from_list(table_name, primary_key_name, primary_key_value, attri
         error_format(e)
     
     
-def get_item_count(table_name):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
+# ---------- BATCH OPERATIONS ----------
+"""
+    Bulk reads and writes chunked to the DynamoDB limits (100 keys per BatchGetItem,
+    25 requests per BatchWriteItem). Chunks run concurrently on the shared low-level client
+    and anything returned as Unprocessed is retried with backoff until it goes through.
+"""
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+MAX_BATCH_RETRIES = 8
+
+
+def serialize_item(item):
+    return {name: _SERIALIZER.serialize(value) for name, value in item.items()}
+
 
-    # Use the scan operation to get the count of items in the table
-    response = table.scan(Select='COUNT')
+def deserialize_item(item):
+    return {name: _DESERIALIZER.deserialize(value) for name, value in item.items()}
 
-    # The count is available in the 'Count' attribute of the response
-    item_count = response['Count']
 
-    return item_count
+def projection_kwargs(attributes):
+    """ ProjectionExpression (with name placeholders, so reserved words are safe) for a list of attributes. """
+    if not attributes:
+        return {}
+    names = {f'#p{position}': attribute for position, attribute in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
 
 
-def count_records_by_date_range(table_name, date_attribute, start_date, end_date):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
+def with_projection(request_kwargs, projection):
+    """ Adds a projection to request kwargs, keeping any ExpressionAttributeNames already there. """
+    extra = projection_kwargs(projection)
+    if not extra:
+        return request_kwargs
+    names = dict(request_kwargs.get('ExpressionAttributeNames', {}), **extra['ExpressionAttributeNames'])
+    return dict(request_kwargs, ProjectionExpression=extra['ProjectionExpression'], ExpressionAttributeNames=names)
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _run_chunks(worker, chunks):
+    if len(chunks) <= 1:
+        return [worker(chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(chunks))) as executor:
+        return list(executor.map(worker, chunks))
+
+
+def _retry_unprocessed(call, request_items, unprocessed_key):
+    """ Calls `call` until DynamoDB has processed every request, returns all responses. """
+    client = get_dynamodb_client()
+    responses = []
+
+    for attempt in range(MAX_BATCH_RETRIES + 1):
+        response = getattr(client, call)(RequestItems=request_items)
+        responses.append(response)
+        request_items = response.get(unprocessed_key)
+        if not request_items:
+            return responses
+        time.sleep(backoff_delay(attempt))
+
+    raise CustomException(
+        code='BatchIncomplete',
+        message=f'{call} still had unprocessed items after {MAX_BATCH_RETRIES} retries'
+    )
+
+
+def batch_get_items(table_name, keys, projection=None, consistent_read=False):
+    """
+    Reads many items by key.
+
+    Args:
+        table_name (string)
+        keys (list): key dicts, duplicates are dropped
+        projection (list): attributes to return, all if None
+        consistent_read (bool)
+
+    Returns:
+        list : items found, in no particular order (missing keys are skipped)
+    """
+    unique_keys = list({json.dumps(serialize_item(key), sort_keys=True): key for key in keys}.values())
+
+    def worker(chunk):
+        request = dict(projection_kwargs(projection), Keys=[serialize_item(key) for key in chunk], ConsistentRead=consistent_read)
+        responses = _retry_unprocessed('batch_get_item', {table_name: request}, 'UnprocessedKeys')
+        return [
+            deserialize_item(item)
+            for response in responses
+            for item in response.get('Responses', {}).get(table_name, [])
+        ]
+
+    return [item for items in _run_chunks(worker, _chunks(unique_keys, BATCH_GET_LIMIT)) for item in items]
+
+
+def batch_write_items(table_name, put_items=(), delete_keys=()):
+    """
+    Puts and deletes many items. Not transactional: each request lands on its own.
+
+    Returns:
+        int : number of write requests processed
+    """
+    requests = [{'PutRequest': {'Item': serialize_item(item)}} for item in put_items]
+    requests += [{'DeleteRequest': {'Key': serialize_item(key)}} for key in delete_keys]
+
+    def worker(chunk):
+        _retry_unprocessed('batch_write_item', {table_name: chunk}, 'UnprocessedItems')
+        return len(chunk)
+
+    return sum(_run_chunks(worker, _chunks(requests, BATCH_WRITE_LIMIT)))
+
+
+# ---------- WALLET ----------
+"""
+    Wallet balances change in a single conditional UpdateItem: ADD a signed delta and
+    return the new balance, so there is no read-modify-write window between concurrent
+    spends. Older rows hold walletBalance as a string, which ADD can't operate on. Those
+    are converted to a number once, conditionally, the first time they are touched.
+"""
+WALLET_ATTRIBUTE = 'walletBalance'
+
+
+def to_money(value):
+    return decimal.Decimal(str(value)).quantize(decimal.Decimal('0.01'), rounding=decimal.ROUND_HALF_UP)
+
+
+def _convert_wallet_to_number(table, key):
+    """ Converts a legacy string walletBalance to a number. Returns True if it did. """
+    item = table.get_item(Key=key, ConsistentRead=True, ProjectionExpression=WALLET_ATTRIBUTE).get('Item')
+    if item is None:
+        raise UserNotFoundException
+
+    balance = item.get(WALLET_ATTRIBUTE)
+    if not isinstance(balance, str):
+        return False
+
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression=f'SET {WALLET_ATTRIBUTE} = :number',
+            ConditionExpression=f'{WALLET_ATTRIBUTE} = :string',
+            ExpressionAttributeValues={':number': to_money(balance), ':string': balance}
+        )
+    except ClientError as e:
+        # Someone else converted or spent it first, either way it is no longer our string
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    return True
+
+
+def _update_wallet(table_name, primary_key_name, primary_key_value, delta, minimum_balance=None):
+    table = get_table(table_name)
+    key = {primary_key_name: primary_key_value}
+
+    update_kwargs = {
+        'Key': key,
+        'UpdateExpression': f'ADD {WALLET_ATTRIBUTE} :delta',
+        'ExpressionAttributeValues': {':delta': delta},
+        'ReturnValues': 'UPDATED_NEW'
+    }
+    if minimum_balance is None:
+        update_kwargs['ConditionExpression'] = f'attribute_exists({primary_key_name})'
+    else:
+        update_kwargs['ConditionExpression'] = f'{WALLET_ATTRIBUTE} >= :minimum'
+        update_kwargs['ExpressionAttributeValues'][':minimum'] = minimum_balance
+
+    for attempt in range(2):
+        try:
+            response = table.update_item(**update_kwargs)
+            return response['Attributes'][WALLET_ATTRIBUTE]
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            # A string balance fails ADD with a ValidationException and never satisfies >=
+            if code in ('ValidationException', 'ConditionalCheckFailedException') and attempt == 0:
+                if _convert_wallet_to_number(table, key):
+                    continue
+            if code == 'ConditionalCheckFailedException':
+                if minimum_balance is None:
+                    raise UserNotFoundException
+                raise InsufficientBalanceException
+            raise
+
+
+def credit_wallet(table_name, primary_key_name, primary_key_value, amount):
+    """
+    Adds amount to the wallet in one UpdateItem.
+
+    Returns:
+        Decimal : new wallet balance
+    """
+    return _update_wallet(table_name, primary_key_name, primary_key_value, to_money(amount))
+
+
+def _wallet_update_params(table_name, primary_key_name, primary_key_value, delta, minimum_balance):
+    return {
+        'TableName': table_name,
+        'Key': {primary_key_name: primary_key_value},
+        'UpdateExpression': f'ADD {WALLET_ATTRIBUTE} :delta',
+        'ConditionExpression': f'{WALLET_ATTRIBUTE} >= :minimum',
+        'ExpressionAttributeValues': {':delta': delta, ':minimum': minimum_balance}
+    }
+
+
+def debit_wallet(table_name, primary_key_name, primary_key_value, amount, commission=0):
+    """
+    Takes amount out of the wallet, less any merchant commission, in one conditional
+    UpdateItem. Raises InsufficientBalanceException if the balance is below amount.
+
+    Returns:
+        Decimal : new wallet balance
+    """
+    amount = to_money(amount)
+    delta = to_money(commission) - amount
+    return _update_wallet(table_name, primary_key_name, primary_key_value, delta, minimum_balance=amount)
+
+
+def transact_wallet_purchase(users_table, primary_key_name, primary_key_value, amount, purchase_table, purchase_item, commission=0):
+    """
+    Debits the wallet (less any merchant commission) and writes the purchase record in a
+    single TransactWriteItems call, so the balance is never debited without a purchase.
+    The purchase is only written if its purchaseID is new.
+
+    Args:
+        users_table (string), primary_key_name (string), primary_key_value : wallet owner
+        amount : amount to debit
+        purchase_table (string)
+        purchase_item (dict): full purchase record, written as given
+        commission : merchant commission credited back in the same update
+    """
+    amount = to_money(amount)
+    delta = to_money(commission) - amount
+    client = get_dynamodb_resource().meta.client # resource client, takes python types like Table does
+
+    transact_items = [
+        {'Update': _wallet_update_params(users_table, primary_key_name, primary_key_value, delta, amount)},
+        {'Put': {
+            'TableName': purchase_table,
+            'Item': purchase_item,
+            'ConditionExpression': 'attribute_not_exists(purchaseID)'
+        }}
+    ]
+
+    for attempt in range(2):
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+            return purchase_item
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            wallet_reason = reasons[0] if reasons else None
+
+            if wallet_reason in ('ConditionalCheckFailed', 'ValidationError') and attempt == 0:
+                table = get_table(users_table)
+                if _convert_wallet_to_number(table, {primary_key_name: primary_key_value}):
+                    continue
+            if wallet_reason == 'ConditionalCheckFailed':
+                raise InsufficientBalanceException
+            if len(reasons) > 1 and reasons[1] == 'ConditionalCheckFailed':
+                raise CustomException(
+                    code='DuplicateTransaction',
+                    message='Purchase ' + purchase_item['purchaseID'] + ' already exists'
+                )
+            raise
+
+
+def transact_confirm_purchase(purchase_table, purchase_item, users_table=None, primary_key_name=None, primary_key_value=None,
+                              credit=0):
+    """
+    Replaces an Initialized purchase with its confirmed record and, for wallet funding,
+    ADDs the credit to the wallet, in a single TransactWriteItems call. The purchase is only
+    written while it is still Initialized, so a payment confirmed twice (webhook redelivery,
+    or the webhook racing a poll) credits the wallet once.
+
+    Args:
+        purchase_table (string)
+        purchase_item (dict): full confirmed purchase record, written as given
+        users_table (string), primary_key_name (string), primary_key_value : wallet to credit, if any
+        credit : amount added to the wallet
+
+    Returns:
+        dict : the purchase as written, None if it was no longer Initialized and nothing was written
+    """
+    client = get_dynamodb_resource().meta.client # resource client, takes python types like Table does
+
+    transact_items = [{'Put': {
+        'TableName': purchase_table,
+        'Item': purchase_item,
+        'ConditionExpression': '#status = :initialized',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':initialized': 'Initialized'}
+    }}]
+    if users_table is not None:
+        transact_items.append({'Update': {
+            'TableName': users_table,
+            'Key': {primary_key_name: primary_key_value},
+            'UpdateExpression': f'ADD {WALLET_ATTRIBUTE} :credit',
+            'ConditionExpression': f'attribute_exists({primary_key_name})',
+            'ExpressionAttributeValues': {':credit': to_money(credit)}
+        }})
+
+    for attempt in range(2):
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+            return purchase_item
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if reasons and reasons[0] == 'ConditionalCheckFailed':
+                return None
+            wallet_reason = reasons[1] if len(reasons) > 1 else None
+
+            # A string balance fails ADD with a ValidationError
+            if wallet_reason == 'ValidationError' and attempt == 0:
+                table = get_table(users_table)
+                if _convert_wallet_to_number(table, {primary_key_name: primary_key_value}):
+                    continue
+            if wallet_reason == 'ConditionalCheckFailed':
+                raise UserNotFoundException
+            raise
+
+
+# ---------- SEQUENCES ----------
+"""
+    Counter-backed sequences: one item per counter in the counters table, advanced with an
+    atomic UpdateItem ADD, so every value is handed out exactly once across all containers.
+    With block_size > 1 a container reserves a block of values in one call and hands them
+    out locally; values left in a block when the container is recycled are skipped, never reused.
+    A counter created with a seed function starts after the highest value already in use.
+"""
+_SEQUENCE_BLOCKS = {}
+_SEQUENCE_LOCK = threading.Lock()
+
+
+def reserve_sequence_block(table_name, counter_name, block_size=1, must_exist=False):
+    """
+    Atomically reserves the next `block_size` values of a counter.
+
+    Args:
+        must_exist (bool): fail with ConditionalCheckFailedException instead of
+                           creating the counter at 0
+
+    Returns:
+        tuple : (first, last) value of the reserved block, inclusive
+    """
+    table = get_table(table_name)
+
+    update_kwargs = {
+        'Key': {'counterName': counter_name},
+        'UpdateExpression': 'ADD currentValue :block',
+        'ExpressionAttributeValues': {':block': block_size},
+        'ReturnValues': 'UPDATED_NEW'
+    }
+    if must_exist:
+        update_kwargs['ConditionExpression'] = 'attribute_exists(counterName)'
+    response = table.update_item(**update_kwargs)
+    last = int(response['Attributes']['currentValue'])
+    return last - block_size + 1, last
+
+
+def next_sequence_value(table_name, counter_name, block_size=1, seed=None):
+    """
+    Args:
+        seed (function): seed() -> highest value already in use; called once, when the
+                         counter doesn't exist yet, so numbering doesn't restart at 1
+    """
+    with _SEQUENCE_LOCK:
+        block_key = (table_name, counter_name)
+        next_value, last = _SEQUENCE_BLOCKS.get(block_key, (1, 0))
+        if next_value > last:
+            try:
+                next_value, last = reserve_sequence_block(table_name, counter_name, block_size, must_exist=seed is not None)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                seed_sequence(table_name, counter_name, seed())
+                next_value, last = reserve_sequence_block(table_name, counter_name, block_size)
+
+        _SEQUENCE_BLOCKS[block_key] = (next_value + 1, last)
+        return next_value
+
+
+def seed_sequence(table_name, counter_name, current_value):
+    """
+    Starts a counter at current_value (e.g. the highest ticket number already issued) so
+    the next value handed out is current_value + 1. Does nothing if the counter already
+    exists, so containers racing to seed it agree on one value.
+    """
+    table = get_table(table_name)
+
+    try:
+        table.put_item(
+            Item={'counterName': counter_name, 'currentValue': current_value},
+            ConditionExpression='attribute_not_exists(counterName)'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+# ---------- TIME-RANGE QUERIES ----------
+"""
+    Date windows over the display strings can only be a Scan filter (see time_utils). The
+    epoch-ms attributes are the range keys of the RANGE_INDEXES, so a date-range report is
+    a Query that reads only the rows inside the window.
+"""
+# display date attribute -> epoch-ms twin (see time_utils)
+EPOCH_ATTRIBUTES = {
+    'purchaseDate': 'purchaseEpochMs',
+    'lastLogin': 'lastLoginEpochMs',
+}
+
+
+def query_range(table_name, index_name, key_name, key_value, sort_key, start, end, projection=None, **query_kwargs):
+    """
+    Every item of one index partition whose sort key is between start and end (inclusive),
+    following LastEvaluatedKey.
+
+    Yields:
+        dict: items in sort key order
+    """
+    table = get_table(table_name)
+    query_kwargs['IndexName'] = index_name
+    query_kwargs['KeyConditionExpression'] = Key(key_name).eq(key_value) & Key(sort_key).between(start, end)
+    query_kwargs = with_projection(query_kwargs, projection)
+
+    while True:
+        response = table.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def count_range(table_name, index_name, key_name, key_value, sort_key, start, end):
+    table = get_table(table_name)
+    query_kwargs = {
+        'IndexName': index_name,
+        'KeyConditionExpression': Key(key_name).eq(key_value) & Key(sort_key).between(start, end),
+        'Select': 'COUNT'
+    }
+    count = 0
+    while True:
+        response = table.query(**query_kwargs)
+        count += response.get('Count', 0)
+        if 'LastEvaluatedKey' not in response:
+            return count
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def range_index_for(table_name, attribute_name, date_attribute):
+    return RANGE_INDEXES.get((table_name, attribute_name, date_attribute))
+
+
+# ---------- AGGREGATION ----------
+"""
+    Report totals computed in one pass over the matching rows: every metric and every
+    group is accumulated from the same stream, instead of one scan per metric. Only the
+    metric and group attributes are projected.
+"""
+# purchase attribute -> report field
+PURCHASE_METRICS = {
+    'amount': 'naira_amount',
+    'units': 'units_sold',
+    'commission': 'commission_paid_out',
+    'serviceFee': 'service_fees',
+    'platformFees': 'platform_fees',
+}
+COUNT_FIELD = 'purchase_count'
+UNGROUPED = 'all'
+
+
+def _metric_value(value):
+    try:
+        return decimal.Decimal(str(value))
+    except (decimal.InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def aggregate_items(items, group_by=None, metrics=PURCHASE_METRICS):
+    """
+    Count and sum `metrics` over an iterable of items, grouped by one attribute.
+
+    Args:
+        items (iterable): rows, consumed once
+        group_by (str): attribute to group on (txnType, paymentMethod, location, ...);
+                        None puts everything under UNGROUPED
+        metrics (dict): item attribute -> report field
+
+    Returns:
+        dict: {group: {COUNT_FIELD: int, <report field>: float, ...}}
+    """
+    totals = {}
+    for item in items:
+        _accumulate(totals, item, group_by, metrics)
+    return _finish_totals(totals)
+
+
+def _accumulate(totals, item, group_by, metrics):
+    """ Folds one item into running {group: {field: Decimal}} totals. """
+    group = str(item.get(group_by, 'Unknown')) if group_by else UNGROUPED
+    row = totals.get(group)
+    if row is None:
+        row = totals[group] = dict.fromkeys(metrics.values(), decimal.Decimal(0))
+        row[COUNT_FIELD] = 0
+    row[COUNT_FIELD] += 1
+    for attribute, field in metrics.items():
+        value = _metric_value(item.get(attribute)) if attribute in item else None
+        if value is not None:
+            row[field] += value
+
+
+def _finish_totals(totals):
+    return {
+        group: {field: value if field == COUNT_FIELD else float(value) for field, value in row.items()}
+        for group, row in totals.items()
+    }
+
+
+def range_items(table_name, date_attribute, windows, attribute_name=None, attribute_value=None,
+                projection=None, total_segments=None):
+    """
+    The rows inside any of the '%Y-%m-%d %H:%M' windows, optionally restricted to
+    attribute_name = attribute_value. Uses the range index when there is one for the pair
+    (one Query per window), otherwise a single parallel scan filtered on the epoch-ms
+    attribute, however many windows there are.
+
+    Args:
+        windows (list): (start_date, end_date) pairs that don't overlap
+
+    Yields:
+        dict: matching items, in no particular order
+    """
+    range_index = range_index_for(table_name, attribute_name, date_attribute)
+    if range_index and attribute_value is not None:
+        index_name, sort_key = range_index
+        for start_date, end_date in windows:
+            start, end = epoch_ms_range(start_date, end_date)
+            yield from query_range(table_name, index_name, attribute_name, attribute_value, sort_key, start, end, projection=projection)
+        return
+
+    epoch_attribute = EPOCH_ATTRIBUTES.get(date_attribute)
+    condition = None
+    for start_date, end_date in windows:
+        if epoch_attribute:
+            in_window = Attr(epoch_attribute).between(*epoch_ms_range(start_date, end_date))
+        else:
+            in_window = Attr(date_attribute).between(start_date, end_date)
+        condition = in_window if condition is None else condition | in_window
+    if attribute_name is not None:
+        condition = condition & Attr(attribute_name).eq(attribute_value)
+    yield from parallel_scan(table_name, total_segments=total_segments, **with_projection({'FilterExpression': condition}, projection))
+
+
+def aggregate_by_day(table_name, date_attribute, windows, group_by=None, attribute_name=None,
+                     attribute_value=None, metrics=PURCHASE_METRICS, total_segments=None):
+    """
+    One-pass totals for the rows of several windows (see range_items), split by UTC day,
+    so a report can be cached one day at a time without one scan per day.
+
+    Returns:
+        dict: {'YYYY-MM-DD': aggregate_items result} for the days that have rows
+    """
+    epoch_attribute = EPOCH_ATTRIBUTES.get(date_attribute)
+    projection = list(metrics) + ([group_by] if group_by else []) + [epoch_attribute or date_attribute]
+    items = range_items(table_name, date_attribute, windows, attribute_name, attribute_value,
+                        projection=projection, total_segments=total_segments)
+
+    # running totals per day; rows are folded in as they stream past, never kept
+    days = collections.defaultdict(dict)
+    for item in items:
+        if epoch_attribute:
+            day = epoch_ms_to_datetime(item[epoch_attribute]).strftime('%Y-%m-%d')
+        else:
+            day = str(item[date_attribute])[:10]
+        _accumulate(days[day], item, group_by, metrics)
+    return {day: _finish_totals(totals) for day, totals in days.items()}
+
+
+def count_records_by_date_range(table_name, date_attribute, start_date, end_date, attribute_name=None, attribute_value=None):
+    range_index = range_index_for(table_name, attribute_name, date_attribute)
+    if range_index and attribute_value is not None:
+        index_name, sort_key = range_index
+        return count_range(table_name, index_name, attribute_name, attribute_value, sort_key, *epoch_ms_range(start_date, end_date))
 
     start_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
     end_datetime = datetime.strptime(end_date, '%Y-%m-%d %H:%M')
@@ -218,15 +1301,14 @@ def count_records_by_date_range(table_name, date_attribute, start_date, end_date
         ":end_date": end_datetime.strftime('%Y-%m-%d %H:%M')
     }
 
-    response = table.scan(FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
+    if attribute_name is not None:
+        filter_expression += f" and {attribute_name} = :attribute_value"
+        expression_attribute_values[":attribute_value"] = attribute_value
 
-    return len(response['Items'])
+    return count_items(table_name, FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
 
 
 def sum_attribute_by_date_range(table_name, date_attribute, attribute_to_sum, start_date, end_date):
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(table_name)
-
     start_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
     end_datetime = datetime.strptime(end_date, '%Y-%m-%d %H:%M')
 
@@ -237,16 +1319,18 @@ def sum_attribute_by_date_range(table_name, date_attribute, attribute_to_sum, st
         ":end_date": end_datetime.strftime('%Y-%m-%d %H:%M')
     }
 
-    response = table.scan(FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
+    items = scan_items(table_name, FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
 
-    sum_result = sum(float(item[attribute_to_sum]) for item in response['Items']) if response['Items'] else 0
+    sum_result = sum(float(item.get(attribute_to_sum, 0)) for item in items)
 
     return sum_result
 
 
 def get_items_by_attribute_and_date_range(table_name, attribute_name, attribute_value, date_attribute, start_date, end_date):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
+    range_index = range_index_for(table_name, attribute_name, date_attribute)
+    if range_index:
+        index_name, sort_key = range_index
+        return list(query_range(table_name, index_name, attribute_name, attribute_value, sort_key, *epoch_ms_range(start_date, end_date)))
 
     # Convert string dates to datetime objects
     start_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
@@ -260,9 +1344,7 @@ def get_items_by_attribute_and_date_range(table_name, attribute_name, attribute_
         ":attribute_value": attribute_value
     }
     
-    response = table.scan(FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
-
-    items = response.get('Items', [])
+    items = list(scan_items(table_name, FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values))
     return items
 
 def generate_purchase_id():
@@ -281,22 +1363,14 @@ def convert_decimal_to_string(obj):
         return str(obj)
     return obj
 
-def analytics(table_name, attribute_name, attribute_value, date_attribute, start_date, end_date):
-    dynamodb_resource = boto3.resource('dynamodb')
-    table = dynamodb_resource.Table(table_name)
-
-    # Convert string dates to datetime objects
-    start_datetime = datetime.strptime(start_date, '%Y-%m-%d %H:%M')
-    end_datetime = datetime.strptime(end_date, '%Y-%m-%d %H:%M')
-
-    filter_expression = f"{date_attribute} BETWEEN :start_date AND :end_date and {attribute_name} = :attribute_value"
-
-    expression_attribute_values = {
-        ":start_date": start_datetime.strftime('%Y-%m-%d %H:%M'),
-        ":end_date": end_datetime.strftime('%Y-%m-%d %H:%M'),
-        ":attribute_value": attribute_value
-    }
-
-    response = table.scan(FilterExpression=filter_expression, ExpressionAttributeValues=expression_attribute_values)
-
-    return response
\ No newline at end of file
+def analytics(table_name, attribute_name, attribute_value, date_attribute, start_date, end_date, total_segments=None):
+    """
+    Every row of a '%Y-%m-%d %H:%M' window with attribute_name = attribute_value; with no
+    attribute_value (e.g. no `type` in the report request), every row of the window.
+    Indexed (attribute, date) pairs are a Query over the window instead of a full scan.
+    """
+    if attribute_value is None:
+        attribute_name = None
+    items = list(range_items(table_name, date_attribute, [(start_date, end_date)], attribute_name, attribute_value,
+                             total_segments=total_segments))
+    return {'Items': items, 'Count': len(items)}
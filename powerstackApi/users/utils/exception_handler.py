@@ -31,11 +31,23 @@ class IncompleteSignupException(CustomException):
 
 class InvalidReferenceException(CustomException):
     def __init__(self, message='The given transaction reference is invalid.'):
-        super().__init__(code='InvalidReference')
+        super().__init__(code='InvalidReference', message=message)
 
 class InsufficientBalanceException(CustomException):
     def __init__(self, message='Insufficient wallet balance, please fund wallet.'):
-        super().__init__(code='InsufficientBalance')
+        super().__init__(code='InsufficientBalance', message=message)
+
+class InvalidCursorException(CustomException):
+    def __init__(self, message='The given nextToken is invalid, start again from the first page.'):
+        super().__init__(code='InvalidCursor', message=message)
+
+class InvalidTokenException(CustomException):
+    def __init__(self, message='Invalid session token, log in again.'):
+        super().__init__(code='InvalidToken', message=message)
+
+class InvalidSignatureException(CustomException):
+    def __init__(self, message='Request signature does not match.'):
+        super().__init__(code='InvalidSignature', message=message)
 
 
 
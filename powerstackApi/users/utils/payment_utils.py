@@ -1,8 +1,17 @@
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import hashlib
 import logging
 import requests
-import json
+import threading
 
+from requests.adapters import HTTPAdapter
 from utils.exception_handler import *
+from utils.config_utils import *
 
 """
     - Functions needed:
@@ -28,19 +37,162 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # ---------- GLOBALS ----------
-FLUTTERWAVE_KEY = 'FLWPUBK_TEST-635b3e8a893d30ade9af302c854004b7-X'
-FLUTTERWAVE_SECRET_KEY = 'FLWSECK_TEST-73b65f61590836d70222e7720ec3a360-X'
+# Platform keys live in the PAYMENT_SECRET_NAME secret (see utils/config_utils.py)
 FLW_URL = 'https://api.flutterwave.com/v3/charges?type=bank_transfer'
 
-PAYSTACK_SECRET_KEY = 'sk_test_f87d18897addafe7af206da9192c1111c1163b2a'
+PST_BASE_URL = 'https://api.paystack.co'
 PST_INIT_URL = 'https://api.paystack.co/transaction/initialize'
 PST_CONFIRM_URL = 'https://api.paystack.co/transaction/verify/'
 
+# ---------- HTTP CLIENT ----------
+"""
+    One requests Session per container, so calls to the payment platforms reuse
+    keep-alive connections instead of paying a TCP + TLS handshake each time. Every call
+    has connect and read timeouts, so a slow platform fails the request instead of
+    holding the Lambda until it times out.
+
+    Idempotent calls (Paystack verify) are retried on timeouts, dropped connections and
+    429/5xx, up to PAYMENT_MAX_ATTEMPTS with full-jitter exponential backoff. Other calls
+    are only retried when the connection couldn't be opened, since nothing was sent.
+
+    Latency is recorded per endpoint (payment_metrics()) and, inside Lambda, also logged
+    in CloudWatch embedded metric format so it shows up as a metric without an API call.
+    The metric lines go through the 'powerstack.metrics' logger at PAYMENT_METRICS_LOG_LEVEL
+    (raise the logger's level, or set this below it, to drop them).
+"""
+PAYMENT_CONNECT_TIMEOUT = float(os.environ.get('PAYMENT_CONNECT_TIMEOUT', '3'))
+PAYMENT_READ_TIMEOUT = float(os.environ.get('PAYMENT_READ_TIMEOUT', '10'))
+PAYMENT_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_MAX_ATTEMPTS', '3'))
+PAYMENT_POOL_SIZE = int(os.environ.get('PAYMENT_POOL_SIZE', '10'))
+PAYMENT_RETRY_BASE_DELAY = 0.2
+PAYMENT_RETRY_MAX_DELAY = 2.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+EMIT_PAYMENT_METRICS = 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+PAYMENT_METRICS_LOG_LEVEL = getattr(logging, os.environ.get('PAYMENT_METRICS_LOG_LEVEL', 'INFO').upper(), logging.INFO)
+
+# bare JSON lines: the Lambda log prefix would stop CloudWatch parsing the metrics
+metrics_logger = logging.getLogger('powerstack.metrics')
+if not metrics_logger.handlers:
+    _metrics_handler = logging.StreamHandler(sys.stdout)
+    _metrics_handler.setFormatter(logging.Formatter('%(message)s'))
+    metrics_logger.addHandler(_metrics_handler)
+    metrics_logger.propagate = False
+
+_PAYMENT_SESSION = None
+_PAYMENT_SESSION_LOCK = threading.Lock()
+
+# endpoint -> {'calls', 'errors', 'retries', 'total_ms', 'max_ms'}
+_PAYMENT_METRICS = {}
+_PAYMENT_METRICS_LOCK = threading.Lock()
+
+
+def get_payment_session():
+    global _PAYMENT_SESSION
+    if _PAYMENT_SESSION is None:
+        with _PAYMENT_SESSION_LOCK:
+            if _PAYMENT_SESSION is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PAYMENT_POOL_SIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _PAYMENT_SESSION = session
+    return _PAYMENT_SESSION
+
+
+def record_payment_call(endpoint, elapsed_ms, outcome):
+    """
+    Args:
+        endpoint (string): e.g. 'paystack.verify'
+        outcome (string): 'ok', 'retry' (failed and sent again) or 'error'
+    """
+    with _PAYMENT_METRICS_LOCK:
+        stats = _PAYMENT_METRICS.setdefault(endpoint, {'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['calls'] += 1
+        stats['errors'] += outcome == 'error'
+        stats['retries'] += outcome == 'retry'
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+    if EMIT_PAYMENT_METRICS and metrics_logger.isEnabledFor(PAYMENT_METRICS_LOG_LEVEL):
+        metrics_logger.log(PAYMENT_METRICS_LOG_LEVEL, json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': 'Powerstack/Payments',
+                    'Dimensions': [['Endpoint'], ['Endpoint', 'Outcome']],
+                    'Metrics': [{'Name': 'Latency', 'Unit': 'Milliseconds'}]
+                }]
+            },
+            'Endpoint': endpoint,
+            'Outcome': outcome,
+            'Latency': round(elapsed_ms, 1)
+        }))
+
+
+def payment_metrics():
+    """
+    Returns:
+        dict : endpoint -> calls, errors, retries, total / avg / max latency in ms
+    """
+    with _PAYMENT_METRICS_LOCK:
+        return {
+            endpoint: dict(stats, avg_ms=round(stats['total_ms'] / stats['calls'], 1))
+            for endpoint, stats in _PAYMENT_METRICS.items()
+        }
+
+
+def _retry_delay(attempt):
+    return random.uniform(0, min(PAYMENT_RETRY_MAX_DELAY, PAYMENT_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def payment_request(method, url, endpoint, idempotent=False, **kwargs):
+    """
+    Sends a payment platform call through the shared session.
+
+    Args:
+        endpoint (string): name the latency is recorded under
+        idempotent (bool): safe to send twice, so retried on timeouts, dropped connections and 429/5xx
+
+    Returns:
+        requests.Response : the last response; a retryable status is returned once attempts run out
+    """
+    kwargs.setdefault('timeout', (PAYMENT_CONNECT_TIMEOUT, PAYMENT_READ_TIMEOUT))
+    for attempt in range(1, PAYMENT_MAX_ATTEMPTS + 1):
+        last_attempt = attempt == PAYMENT_MAX_ATTEMPTS
+        start = time.perf_counter()
+        try:
+            response = get_payment_session().request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # a call that may have reached the platform is only sent again when idempotent
+            retryable = isinstance(e, requests.exceptions.ConnectTimeout) or (
+                idempotent and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)))
+            if last_attempt or not retryable:
+                record_payment_call(endpoint, elapsed_ms, 'error')
+                raise
+            record_payment_call(endpoint, elapsed_ms, 'retry')
+            logger.info(f"{endpoint} attempt {attempt} failed: {e}, retrying")
+        else:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if last_attempt or not idempotent or response.status_code not in RETRYABLE_STATUS_CODES:
+                record_payment_call(endpoint, elapsed_ms, 'error' if response.status_code >= 500 else 'ok')
+                return response
+            record_payment_call(endpoint, elapsed_ms, 'retry')
+            logger.info(f"{endpoint} attempt {attempt} got HTTP {response.status_code}, retrying")
+        time.sleep(_retry_delay(attempt))
+
+
+def prewarm_payment_client(open_connections=False):
+    """ Builds the session; with open_connections also opens the Paystack connection. """
+    session = get_payment_session()
+    if open_connections:
+        session.head(PST_BASE_URL, timeout=(PAYMENT_CONNECT_TIMEOUT, PAYMENT_READ_TIMEOUT))
+
 # ---------- SECTION 1: FLUTTERWAVE ----------
 # Charges a 1.4% flat fee
 def flutterwave_init_payment(email, amount, tx_ref):
     header = {
-        'Authorization': f'Bearer: {FLUTTERWAVE_SECRET_KEY}',
+        'Authorization': f'Bearer {payment_key("flutterwave_secret_key")}',
         'content-type': 'application/json'
         }
     data = {
@@ -50,7 +202,7 @@ def flutterwave_init_payment(email, amount, tx_ref):
         "currency": "NGN"
     }
     try:
-        response = requests.post(FLW_URL,data,header)
+        response = payment_request('POST', FLW_URL, 'flutterwave.charge', json=data, headers=header)
         return f'{response}'
     except Exception as e:
         error_format(e)
@@ -60,7 +212,7 @@ def flutterwave_init_payment(email, amount, tx_ref):
 # Paystack Charges 1.5% on each transaction + 100 ( over 2500 )
 def paystack_init_payment(email, amount, tx_ref, metadata, callback_url):
     headers = {
-        'Authorization': f'Bearer {PAYSTACK_SECRET_KEY}',
+        'Authorization': f'Bearer {payment_key("paystack_secret_key")}',
         'content-type': 'application/json'
         }
     
@@ -74,7 +226,7 @@ def paystack_init_payment(email, amount, tx_ref, metadata, callback_url):
     }
 
     try:
-        response = requests.post(PST_INIT_URL,data=json.dumps(data),headers=headers).json()
+        response = payment_request('POST', PST_INIT_URL, 'paystack.initialize', data=json.dumps(data), headers=headers).json()
         logger.info(response)
         return {
             'authorization_url': response.get('data').get('authorization_url'),
@@ -86,16 +238,30 @@ def paystack_init_payment(email, amount, tx_ref, metadata, callback_url):
 def paystack_confirm_payment(tx_ref):
     try:
         headers = {
-            'Authorization': f'Bearer {PAYSTACK_SECRET_KEY}',
+            'Authorization': f'Bearer {payment_key("paystack_secret_key")}',
             'content-type': 'application/json'
             }
         
         
-        response = requests.get(PST_CONFIRM_URL + tx_ref, headers=headers).json()
+        response = payment_request('GET', PST_CONFIRM_URL + tx_ref, 'paystack.verify', idempotent=True, headers=headers).json()
         return response
     except Exception as e:
         error_format(e)
 
+
+def paystack_signature_valid(raw_body, signature):
+    """
+    Paystack signs webhook bodies with HMAC-SHA512 of the raw body, keyed with the secret key.
+
+    Args:
+        raw_body (bytes): body exactly as received
+        signature (string): the x-paystack-signature header
+    """
+    if not signature:
+        return False
+    expected = hmac.new(payment_key("paystack_secret_key").encode(), raw_body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
     
 # ---------- SECTION 3: ZAINPAY ----------
 
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import logging
+import importlib
+from decimal import Decimal
+
+from utils.exception_handler import *
+
+# ---------- LOGS ----------
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+"""
+    Table-driven routing for the API Gateway Lambdas.
+
+    Each app.py maps (httpMethod, path) to a route: the module and function that handle
+    it plus what the request needs (auth, a JSON body, query params). The route module is
+    imported the first time one of its routes is called, so a cold start only loads what
+    that request uses - /user/hello never imports boto3, requests or jwt. Token checks
+    (utils/token_utils.py) are likewise only loaded for routes with auth=True.
+
+    Handlers are called with, in order: the verified token claims (auth), the query
+    params (query), the parsed body (body), the API Gateway event itself (event - for
+    handlers that need the headers or the raw body, like signed webhooks).
+
+    Prewarming: with PREWARM_ON_INIT=true, app.py imports every route module and runs its
+    warmers (client builds, secret and signing-key loads) during Lambda init, so the
+    first request after a cold start or scale-out runs at warm-path latency. Leave it off
+    where cold starts are on-demand and mostly hit light routes. An event {"warmup": true}
+    (e.g. a scheduled rule) reruns the warmers without touching any business logic;
+    "connections": true (or PREWARM_CONNECTIONS=true) also opens the DynamoDB
+    connections with a throwaway read.
+"""
+
+# ---------- PREWARM CONFIG ----------
+PREWARM_ON_INIT = os.environ.get('PREWARM_ON_INIT', 'false').lower() == 'true'
+PREWARM_CONNECTIONS = os.environ.get('PREWARM_CONNECTIONS', 'false').lower() == 'true'
+
+# ---------- RESPONSES ----------
+CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+}
+JSON_HEADERS = dict(CORS_HEADERS, **{"Content-type": 'application/json'})
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+def api_response(status_code, body, headers=JSON_HEADERS):
+    return {
+        "statusCode": status_code,
+        "headers": headers,
+        "body": json.dumps(body, cls=DecimalEncoder)
+    }
+
+
+# ---------- ROUTES ----------
+
+def route(module, handler, auth=False, body=False, query=None, event=False):
+    """
+    Args:
+        module (string): module holding the handler, imported on first use
+        handler (string): handler function name
+        auth (bool): verify the Authorization token and pass its claims
+        body (bool): parse the JSON body and pass it
+        query (string): None, 'optional' (pass queryStringParameters or {}) or
+                        'required' (the path is unknown without them)
+        event (bool): pass the API Gateway event as received
+    """
+    return {'module': module, 'handler': handler, 'auth': auth, 'body': body, 'query': query, 'event': event}
+
+
+def static_route(message):
+    """ A route that always answers with the same message and loads nothing. """
+    return {'message': message, 'auth': False, 'body': False, 'query': None, 'event': False}
+
+
+def resolve_route(routes, event):
+    found = routes.get((event.get('httpMethod'), event.get('path')))
+    if found is None or (found['query'] == 'required' and not event.get('queryStringParameters')):
+        return None
+    return found
+
+
+def load_handler(found):
+    handler = found.get('function')
+    if handler is None:
+        handler = getattr(importlib.import_module(found['module']), found['handler'])
+        found['function'] = handler
+    return handler
+
+
+def request_claims(event):
+    """
+    Returns:
+        dict : verified token claims, or "Expired"
+    """
+    authorization = (event.get('headers') or {}).get('Authorization') or ''
+    if not authorization.split():
+        raise InvalidTokenException('Missing session token, log in first.')
+    from utils.token_utils import decode_token
+    return decode_token(authorization.split()[-1])
+
+
+def handle_request(routes, event, wrap_message=False):
+    """
+    Runs the route for an API Gateway event and builds the response.
+
+    Args:
+        routes (dict): (httpMethod, path) -> route
+        wrap_message (bool): answer {'message': result} instead of the bare result
+    """
+    if "httpMethod" not in event:
+        logger.error("httpMethod not present in request.")
+        return api_response(400, {"error": "httpMethod not present in request."})
+
+    if event["httpMethod"] == "OPTIONS":
+        return api_response(200, 'Options, PASS.', headers=CORS_HEADERS)
+
+    try:
+        found = resolve_route(routes, event)
+        if found is None:
+            return api_response(404, {'code': 'InvalidPath', 'message': f'Invalid path: {event.get("path")}'})
+
+        if 'message' in found:
+            message = found['message']
+        else:
+            args = []
+            if found['auth']:
+                claims = request_claims(event)
+                if claims == "Expired":
+                    return api_response(403, {'code': 'ExpiredToken', 'message': 'Session expired, log in again'})
+                args.append(claims)
+            if found['query']:
+                args.append(event.get('queryStringParameters') or {})
+            if found['body']:
+                args.append(json.loads(event.get('body') or '{}'))
+            if found['event']:
+                args.append(event)
+            message = load_handler(found)(*args)
+
+        logging.info(message)
+        return api_response(200, {'message': message} if wrap_message else message)
+
+    except CustomException as e:
+        # Handle your custom exception and return the custom error response
+        logger.error(f"Custom Exception {e}")
+        return api_response(400, {"code": e.code, "message": e.message})
+
+    except Exception as e:
+        logger.error(f"Unhandled Exception {e}")
+        return api_response(400, {"error": str(e)})
+
+
+# ---------- PREWARM ----------
+
+def is_warm_ping(event):
+    return isinstance(event, dict) and bool(event.get('warmup'))
+
+
+def prewarm(routes, warmers, open_connections=PREWARM_CONNECTIONS):
+    """
+    Imports every route module, then runs each warmer. Failures are logged and skipped:
+    prewarming must never fail init or a ping.
+
+    Args:
+        routes (dict): the app's route table
+        warmers (list): (module, function) pairs, called with open_connections
+
+    Returns:
+        dict : step -> milliseconds
+    """
+    timings = {}
+
+    def timed(step, work):
+        start = time.perf_counter()
+        try:
+            work()
+        except Exception as e:
+            logger.error(f"Prewarm step {step} failed: {e}")
+        timings[step] = round((time.perf_counter() - start) * 1000, 1)
+
+    for module in dict.fromkeys(found['module'] for found in routes.values() if 'module' in found):
+        timed(f'import {module}', lambda: importlib.import_module(module))
+    timed('resolve handlers', lambda: [load_handler(found) for found in routes.values()
+                                       if 'module' in found and found['module'] in sys.modules])
+
+    for module, function in warmers:
+        timed(f'{module}.{function}', lambda: getattr(importlib.import_module(module), function)(open_connections=open_connections))
+
+    logger.info(f"Prewarmed {timings}")
+    return timings
+
+
+def warm_ping_response(routes, warmers, event):
+    open_connections = bool(event.get('connections', PREWARM_CONNECTIONS))
+    return {'warm': True, 'prewarmed': prewarm(routes, warmers, open_connections=open_connections)}
@@ -0,0 +1,73 @@
+import time
+import decimal
+
+from datetime import datetime, timezone
+from functools import lru_cache
+
+"""
+    Canonical timestamps.
+
+    Display strings (purchaseDate, lastLogin) come in two formats: Paystack's ISO
+    transaction_date and format_date_time's '%Y-%m-%d %H:%M'. Neither compares correctly
+    against the other, so every row also stores the same instant as UTC epoch milliseconds
+    (purchaseEpochMs, lastLoginEpochMs). Range queries, indexes and rollups use only the
+    numeric field.
+
+    format_date_time() localizes the Lambda clock (UTC) without converting it, so legacy
+    '%Y-%m-%d %H:%M' strings are UTC wall-clock time despite the Africa/Lagos label.
+"""
+
+LEGACY_DATE_FORMAT = '%Y-%m-%d %H:%M'
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+
+def epoch_ms_now():
+    return int(time.time() * 1000)
+
+
+@lru_cache(maxsize=4096)
+def _parse_epoch_ms(value):
+    try:
+        moment = datetime.strptime(value, LEGACY_DATE_FORMAT)
+    except ValueError:
+        try:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def to_epoch_ms(value):
+    """
+    UTC epoch milliseconds for a datetime, a stored number, an ISO-8601 timestamp or a
+    legacy '%Y-%m-%d %H:%M' string. String parses are cached since the same report
+    bounds and display dates come round repeatedly.
+
+    Returns:
+        int, or None when the value can't be read.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return int(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return _parse_epoch_ms(str(value))
+
+
+def epoch_ms_range(start_date, end_date):
+    """
+    Inclusive epoch-ms bounds for a '%Y-%m-%d %H:%M' report window. The end minute is
+    included in full, matching the old BETWEEN on minute-precision strings.
+    """
+    return to_epoch_ms(start_date), to_epoch_ms(end_date) + MINUTE_MS - 1
+
+
+def epoch_ms_to_datetime(epoch_ms):
+    return datetime.fromtimestamp(int(epoch_ms) / 1000, tz=timezone.utc)